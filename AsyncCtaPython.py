@@ -0,0 +1,206 @@
+"""
+     Spirent TestCenter Conformance Test Application - asyncio front-end
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    This module provides awaitable versions of the CtaPython methods, for use
+    from asyncio applications (Python 3 only).
+
+    The Tcl interpreter runs on the worker thread of a threaded CtaPython object,
+    so a long stc::perform never blocks the event loop.
+"""
+
+import asyncio
+
+from CtaPython import CtaPython
+
+class AsyncCtaPython(object):
+
+    def __init__(self, api_path=None, log_path=None, log_level="DEBUG", max_in_flight=16, timeout=None, cta=None):
+        """
+        Load the Conformance API in a threaded CtaPython object.
+
+        'api_path', 'log_path' and 'log_level' are passed to CtaPython.
+        'max_in_flight' optionally limits the number of calls that are queued or running at once.
+        'timeout' optionally specifies the default timeout, in seconds, for each call.
+        'cta' optionally specifies an existing CtaPython object (created with threaded=True) to use.
+
+        Creating the CtaPython object blocks while the package loads. Use
+        "await AsyncCtaPython.open(...)" to create it without blocking the event loop.
+
+        Returns None.
+        """
+        if cta is None:
+            cta = CtaPython(api_path=api_path, log_path=log_path, log_level=log_level, threaded=True)
+        elif cta.worker is None:
+            raise ValueError("the CtaPython object must be created with threaded=True")
+
+        self.cta = cta
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+
+        # Created on first use, so that it belongs to the running event loop.
+        self.semaphore = None
+
+        return
+
+    @classmethod
+    async def open(cls, *args, **kwargs):
+        """
+        Create an AsyncCtaPython object without blocking the event loop.
+        Takes the same arguments as AsyncCtaPython().
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, lambda: cls(*args, **kwargs))
+
+    async def close(self):
+        """
+        Stop the worker thread of the CtaPython object, once the queued calls are complete.
+        """
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.cta.close)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+        return False
+
+    ###############################################################################
+    ####
+    ####    Public Methods
+    ####
+    ###############################################################################
+
+    async def config(self, objecthandle, **kwargs):
+        """
+        Awaitable CtaPython.config.
+        """
+        return await self.call("config", objecthandle, **kwargs)
+
+    async def get(self, objecthandle, *args):
+        """
+        Awaitable CtaPython.get.
+        """
+        return await self.call("get", objecthandle, *args)
+
+    async def get_many(self, handles, attributes=None, numpy=False):
+        """
+        Awaitable CtaPython.get_many.
+        """
+        return await self.call("get_many", handles, attributes, numpy)
+
+    async def perform(self, command, **kwargs):
+        """
+        Awaitable CtaPython.perform.
+        """
+        return await self.call("perform", command, **kwargs)
+
+    async def connect(self, ipAddress):
+        """
+        Awaitable CtaPython.connect.
+        """
+        return await self.call("connect", ipAddress)
+
+    async def connect_many(self, ipAddresses, strict=True):
+        """
+        Awaitable CtaPython.connect_many.
+        """
+        return await self.call("connect_many", ipAddresses, strict)
+
+    async def create(self, objecttype, under, **kwargs):
+        """
+        Awaitable CtaPython.create.
+        """
+        return await self.call("create", objecttype, under, **kwargs)
+
+    async def delete(self, handle):
+        """
+        Awaitable CtaPython.delete.
+        """
+        return await self.call("delete", handle)
+
+    async def disconnect(self, ipAddress):
+        """
+        Awaitable CtaPython.disconnect.
+        """
+        return await self.call("disconnect", ipAddress)
+
+    async def release(self, location):
+        """
+        Awaitable CtaPython.release.
+        """
+        return await self.call("release", location)
+
+    async def release_many(self, locations=None, strict=True):
+        """
+        Awaitable CtaPython.release_many.
+        """
+        return await self.call("release_many", locations, strict)
+
+    async def reserve(self, location):
+        """
+        Awaitable CtaPython.reserve.
+        """
+        return await self.call("reserve", location)
+
+    async def reserve_many(self, locations, skip_held=True, strict=True):
+        """
+        Awaitable CtaPython.reserve_many.
+        """
+        return await self.call("reserve_many", locations, skip_held, strict)
+
+    async def subscribe(self, side, viewAttributesList):
+        """
+        Awaitable CtaPython.subscribe.
+        """
+        return await self.call("subscribe", side, viewAttributesList)
+
+    async def unsubscribe(self, handle):
+        """
+        Awaitable CtaPython.unsubscribe.
+        """
+        return await self.call("unsubscribe", handle)
+
+    #==============================================================================
+    async def call(self, method, *args, call_timeout=None, **kwargs):
+        """
+        Description
+            Calls a CtaPython method on the worker thread and waits for the result.
+
+        Syntax
+            await cta.call(<methodName>, [<argument>, ...], [call_timeout=<seconds>])
+
+        Comments
+            At most 'max_in_flight' calls are queued or running at once. Other calls
+            wait their turn without blocking the event loop.
+            -If the call is cancelled, or the timeout expires, before the worker
+             thread starts it, the call is never sent to Tcl. A call that has
+             already started cannot be interrupted: it runs to completion on
+             the worker thread and its result is discarded.
+            -'call_timeout' overrides the default timeout of this object. It has
+             its own name, so that an stc attribute named "timeout" is passed on
+             to the method: the other methods (eg: perform) have no timeout
+             argument, so use call() to give them one.
+
+        Return Value
+            The result of the CtaPython method.
+            Raises asyncio.TimeoutError if the timeout expires.
+
+        Example
+            result = await cta.call("perform", "CtsRunTest", session=session, call_timeout=600)
+        """
+        timeout = call_timeout
+        if timeout is None:
+            timeout = self.timeout
+
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_in_flight)
+
+        async with self.semaphore:
+            # Cancelling the asyncio future also cancels the queued call.
+            future = asyncio.wrap_future(self.cta.submit(method, *args, **kwargs))
+            if timeout is None:
+                return await future
+
+            return await asyncio.wait_for(future, timeout)
@@ -0,0 +1,388 @@
+"""
+     Spirent TestCenter Conformance Test Application - process pool
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    This module runs independent test sessions in parallel. Each worker is a
+    separate process with its own CtaPython object (and so its own Tcl
+    interpreter, stc:: session and log directory).
+
+    A job is a picklable, module-level function that takes the worker's CtaPython
+    object as its first argument and returns a picklable result (normally a dict):
+
+        def run_suite(cta, suite):
+            cta.connect("10.1.1.10")
+            test_suite = cta.perform("CtsLoadTestSuite", testSuiteName=suite)
+            return {"suite": suite, "session": test_suite["Session"]}
+
+        if __name__ == "__main__":
+            with CtaPool(workers=4, api_path=api_path) as pool:
+                results = pool.map(run_suite, ["ELINE", "ELAN", "ETREE"])
+
+    Worker processes are started with the "spawn" method, so scripts that create
+    a pool must use the 'if __name__ == "__main__":' guard.
+"""
+
+import os
+import time
+import logging
+import threading
+import traceback
+import multiprocessing
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+from concurrent.futures import Future
+
+class CtaPoolError(RuntimeError):
+    """
+    Raised (through the job's Future) when a job fails, or its worker process crashes.
+    """
+    def __init__(self, message, details=""):
+        RuntimeError.__init__(self, message)
+        # The formatted traceback from the worker process, if there is one.
+        self.details = details
+
+###############################################################################
+####
+####    Worker process
+####
+###############################################################################
+
+def _worker_main(index, api_path, log_path, log_level, connection):
+    # Runs in the worker process: load the API, then run jobs until told to stop.
+    try:
+        from CtaPython import CtaPython
+        cta = CtaPython(api_path=api_path, log_path=log_path, log_level=log_level)
+    except Exception:
+        connection.send(("failed", None, traceback.format_exc()))
+        return
+
+    connection.send(("ready", None, os.getpid()))
+
+    while True:
+        try:
+            message = connection.recv()
+        except EOFError:
+            return
+
+        kind, jobid, payload = message
+        if kind == "stop":
+            return
+        elif kind == "ping":
+            # The health check evaluates a Tcl command, so that a hung interpreter is detected.
+            try:
+                cta.Exec("info patchlevel")
+                connection.send(("pong", jobid, None))
+            except Exception:
+                connection.send(("pong", jobid, traceback.format_exc()))
+        elif kind == "job":
+            function, args, kwargs = payload
+            try:
+                result = function(cta, *args, **kwargs)
+                connection.send(("result", jobid, result))
+            except Exception as errmsg:
+                connection.send(("error", jobid, (str(errmsg), traceback.format_exc())))
+
+###############################################################################
+####
+####    Pool
+####
+###############################################################################
+
+class CtaPoolWorker(threading.Thread):
+    """
+    Manages one worker process: sends it jobs from the pool's queue, checks its
+    health while it is idle, and restarts it when it crashes or stops responding.
+    """
+    def __init__(self, pool, index, api_path, log_path):
+        threading.Thread.__init__(self, name="CtaPoolWorker" + str(index))
+        self.daemon = True
+
+        self.pool = pool
+        self.index = index
+        self.api_path = api_path
+        self.log_path = log_path
+
+        self.process = None
+        self.connection = None
+        self.pid = None
+        self.busy = False
+        self.jobs = 0
+        self.failures = 0
+        self.restarts = 0
+        self.last_health_check = None
+        self.last_error = ""
+
+    #==============================================================================
+    def run(self):
+        try:
+            self.StartProcess()
+        except Exception as errmsg:
+            # Try again on the first job or health check.
+            self.last_error = str(errmsg)
+            logging.error("CtaPool worker %d could not be started: %s", self.index, errmsg)
+
+        while True:
+            try:
+                item = self.pool.jobs.get(timeout=self.pool.health_interval)
+            except queue.Empty:
+                self.HealthCheck()
+                continue
+
+            if item is None:
+                self.StopProcess()
+                return
+
+            future, function, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+
+            self.busy = True
+            try:
+                self.RunJob(future, function, args, kwargs)
+            finally:
+                self.busy = False
+
+    def RunJob(self, future, function, args, kwargs):
+        jobid = self.jobs
+        self.jobs += 1
+
+        try:
+            if self.process is None:
+                self.StartProcess()
+
+            self.connection.send(("job", jobid, (function, args, kwargs)))
+            kind, _, payload = self.Receive(self.pool.job_timeout)
+
+        except Exception as errmsg:
+            # The process crashed (or hung) while running the job.
+            self.failures += 1
+            self.last_error = str(errmsg)
+            logging.error("CtaPool worker %d failed while running %s: %s", self.index, getattr(function, "__name__", function), errmsg)
+            self.Restart()
+            future.set_exception(CtaPoolError("worker " + str(self.index) + " failed while running the job: " + str(errmsg)))
+            return
+
+        if kind == "result":
+            future.set_result(payload)
+        else:
+            message, details = payload
+            future.set_exception(CtaPoolError(message, details))
+
+    def HealthCheck(self):
+        # Pings the (idle) worker process, and restarts it if it does not answer.
+        self.last_health_check = time.time()
+        try:
+            if self.process is None:
+                self.StartProcess()
+
+            self.connection.send(("ping", None, None))
+            _, _, error = self.Receive(self.pool.health_timeout)
+            if error:
+                raise CtaPoolError("the Tcl interpreter is not responding", error)
+
+        except Exception as errmsg:
+            self.failures += 1
+            self.last_error = str(errmsg)
+            logging.error("CtaPool worker %d failed its health check: %s", self.index, errmsg)
+            self.Restart()
+
+    #==============================================================================
+    def StartProcess(self):
+        parent, child = multiprocessing.Pipe()
+        process = self.pool.context.Process(target=_worker_main, name="CtaPoolProcess" + str(self.index),
+                                            args=(self.index, self.api_path, self.log_path, self.pool.log_level, child))
+        process.daemon = True
+        process.start()
+        child.close()
+
+        self.process = process
+        self.connection = parent
+
+        try:
+            kind, _, payload = self.Receive(self.pool.start_timeout)
+        except Exception:
+            self.StopProcess()
+            raise
+
+        if kind != "ready":
+            self.StopProcess()
+            raise CtaPoolError("worker " + str(self.index) + " failed to load the API", payload)
+
+        self.pid = payload
+        logging.info("CtaPool worker %d started (PID %d)", self.index, self.pid)
+
+    def StopProcess(self):
+        if self.process is None:
+            return
+
+        try:
+            self.connection.send(("stop", None, None))
+        except Exception:
+            pass
+
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+
+        self.connection.close()
+        self.process = None
+        self.connection = None
+
+    def Restart(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join()
+            self.connection.close()
+            self.process = None
+            self.connection = None
+
+        self.restarts += 1
+        try:
+            self.StartProcess()
+        except Exception as errmsg:
+            # Try again on the next job or health check.
+            self.last_error = str(errmsg)
+            logging.error("CtaPool worker %d could not be restarted: %s", self.index, errmsg)
+
+    def Receive(self, timeout):
+        # Waits for the next message from the process, checking that it is still alive.
+        start = time.time()
+        while not self.connection.poll(0.1):
+            if not self.process.is_alive():
+                raise CtaPoolError("the worker process exited with code " + str(self.process.exitcode))
+            if timeout is not None and time.time() - start > timeout:
+                raise CtaPoolError("the worker process did not respond within " + str(timeout) + " seconds")
+
+        try:
+            return self.connection.recv()
+        except EOFError:
+            self.process.join(5)
+            raise CtaPoolError("the worker process exited with code " + str(self.process.exitcode))
+
+#==============================================================================
+class CtaPool(object):
+
+    def __init__(self, workers=None, api_path=None, log_path=None, log_level="INFO",
+                 health_interval=10.0, health_timeout=30.0, start_timeout=300.0, job_timeout=None):
+        """
+        Start the worker processes.
+
+        'workers' optionally specifies the number of worker processes (default: number of CPUs).
+        'api_path' specifies the Conformance Application API installation. It may also be a list,
+                   with one path for each worker.
+        'log_path' optionally specifies a directory. Each worker logs to its own "worker<N>"
+                   subdirectory. By default each worker uses the CtaPython default log path.
+        'log_level' specifies the CtaPython log level of the workers.
+        'health_interval' specifies how long (seconds) a worker may be idle before it is health checked.
+        'health_timeout' specifies how long (seconds) a health check may take before the worker is restarted.
+        'start_timeout' specifies how long (seconds) a worker may take to load the API.
+        'job_timeout' optionally specifies how long (seconds) a job may run before its worker is restarted.
+
+        Returns None.
+        """
+        if workers is None:
+            workers = len(api_path) if isinstance(api_path, (list, tuple)) else multiprocessing.cpu_count()
+
+        if isinstance(api_path, (list, tuple)):
+            if len(api_path) != workers:
+                raise ValueError("api_path must have one path for each worker")
+            api_paths = list(api_path)
+        else:
+            api_paths = [api_path] * workers
+
+        self.log_level = log_level
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.start_timeout = start_timeout
+        self.job_timeout = job_timeout
+
+        self.context = multiprocessing.get_context("spawn")
+        self.jobs = queue.Queue()
+        self.workers = []
+
+        for index in range(workers):
+            worker_log_path = os.path.join(log_path, "worker" + str(index)) if log_path else None
+            worker = CtaPoolWorker(self, index, api_paths[index], worker_log_path)
+            self.workers.append(worker)
+            worker.start()
+
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    ###############################################################################
+    ####
+    ####    Public Methods
+    ####
+    ###############################################################################
+
+    def submit(self, job, *args, **kwargs):
+        """
+        Description
+            Queues a job for the next free worker.
+
+        Syntax
+            pool.submit(<job>, [<argument>, ...])
+
+        Comments
+            The job is called in the worker process as job(cta, *args, **kwargs), where
+            cta is the worker's CtaPython object. The job, its arguments and its result
+            must be picklable.
+
+        Return Value
+            concurrent.futures.Future for the job's result. If the job raises an exception,
+            or its worker crashes, the Future raises CtaPoolError.
+
+        Example
+            future = pool.submit(run_suite, "ELINE")
+            print(future.result())
+        """
+        future = Future()
+        self.jobs.put((future, job, args, kwargs))
+        return future
+
+    def map(self, job, *iterables):
+        """
+        Runs job(cta, *arguments) for each set of arguments, and returns the list of results (in order).
+        """
+        futures = [self.submit(job, *args) for args in zip(*iterables)]
+        return [future.result() for future in futures]
+
+    def health(self):
+        """
+        Returns a list with the status of each worker, as dictionaries.
+        """
+        status = []
+        for worker in self.workers:
+            status.append({"worker": worker.index,
+                           "pid": worker.pid,
+                           "alive": worker.process is not None and worker.process.is_alive(),
+                           "busy": worker.busy,
+                           "jobs": worker.jobs,
+                           "failures": worker.failures,
+                           "restarts": worker.restarts,
+                           "last_health_check": worker.last_health_check,
+                           "last_error": worker.last_error})
+        return status
+
+    def close(self):
+        """
+        Stops the workers once the queued jobs are complete.
+        """
+        for worker in self.workers:
+            self.jobs.put(None)
+
+        for worker in self.workers:
+            worker.join()
+
+        return
@@ -23,30 +23,682 @@ __version__ = "0.0.1"
     
 import sys
 import os
-import ast              # Used to convert strings to dict.
+import re
 import datetime
 import logging
 import getpass
-import inspect
+import time
+import json
+import errno
+import bisect
+import shutil
+import logging.handlers
+import fnmatch
+import contextlib
+import difflib
+import signal
+import gzip
+import io
+import csv
+import atexit
+import weakref
+import threading
 
 if sys.hexversion >= 0x03000000:
    from tkinter import *
+   import queue
 else:
    from Tkinter import *
+   import Queue as queue
 
-#from shutil import copyfile     # Used for copying files.
+if sys.hexversion >= 0x03030000:
+    _monotonic = time.monotonic
+    _perf_counter = time.perf_counter
+else:
+    _monotonic = time.time
+    _perf_counter = time.time
+
+from collections import OrderedDict, deque
+
+try:
+    # Python 2 needs the "futures" backport for threaded mode.
+    from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+except ImportError:
+    Future = None
+    FutureTimeoutError = None
+
+
+# Numeric formats accepted by the Tcl "expr" command. Tcl2Python uses the group
+# that matched to convert an attribute value into an int or float:
+#   1 = decimal integer, 2 = floating point, 3 = hex/octal/binary integer.
+_NUMBER_PATTERN = re.compile(r"[-+]?(?:([0-9]+)|((?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][-+]?[0-9]+)?)|(0(?:[xX][0-9a-fA-F]+|[oO][0-7]+|[bB][01]+)))\Z")
+_NUMBER_START   = frozenset("+-.0123456789")
+
+# One element of a DDN path: an object type with an optional index (eg: "userprofile(2)").
+_DDN_ELEMENT_PATTERN = re.compile(r"([A-Za-z_][\w:]*)(?:\((\d+)\))?\Z")
+
+# The digits at the end of a handle (the object type is the rest, eg: "port" for "port12").
+_HANDLE_COUNTER_PATTERN = re.compile(r"\d+\Z")
+
+# An attribute in the stc::help description of an object type
+# (eg: "-Mode (Type: enum, Default: Fast, Possible Values: Fast Slow)").
+_METADATA_PATTERN = re.compile(r"^\s*-([\w.]+)\s*\(\s*Type:\s*([\w]+)[^)\n]*?(?:Possible Values:\s*([^)\n]*))?\)", re.IGNORECASE | re.MULTILINE)
+
+# Characters that prevent a value from being used as a bare Tcl word.
+_TCL_SPECIAL_PATTERN = re.compile(r'[\s"\\$\[\]{};#]')
+_TCL_ESCAPES         = {"\n": "\\n", "\r": "\\r", "\t": "\\t"}
+
+# Tcl procedures that are loaded into the interpreter once, at startup.
+_TCL_HELPERS = """
+namespace eval ::cta {
+    variable batch
+
+    # The asynchronous requests that have not completed yet (see ::cta::checkrequests),
+    # the requests that have completed since the last ::cta::waitrequests, and the
+    # "after" timer of the next check.
+    variable requests
+    variable completed {}
+    variable timer ""
+    variable wakeup 0
+    array set requests {}
+
+    # The number of commands that failed in the last replay.
+    variable replayerrors 0
+}
+
+# Called by a recorded journal (see CtaRecorder) when one of its commands fails.
+proc ::cta::replayerror { stoponerror index message } {
+    variable replayerrors
+    incr replayerrors
+    if { $stoponerror } {
+        return -code error "journal command $index failed: $message"
+    }
+}
+
+# Runs the commands of a CtaBatch and returns a flat list of "code result" pairs,
+# one pair for each command that was run. Each command is a list of words.
+#
+# The result of command N is kept in batch(N), so that later commands can refer
+# to it (eg: the handle returned by stc::create). 'substitutions' has a list of
+# "position reference value" triples for each command: the word at 'position' is
+# replaced by the result of command 'reference' followed by 'value' or, when the
+# reference is -1, by the Tcl substitution of 'value' (a TclExpr).
+proc ::cta::batch { commands substitutions stoponerror } {
+    variable batch
+    array unset batch
+
+    set results {}
+    set index   0
+    foreach command $commands substitution $substitutions {
+        set code [catch {
+            foreach { position reference value } $substitution {
+                if { $reference < 0 } {
+                    lset command $position [uplevel #0 [list subst $value]]
+                } else {
+                    lset command $position $batch($reference)$value
+                }
+            }
+            uplevel #0 $command
+        } result]
+
+        set batch($index) $result
+        lappend results $code $result
+        if { $code == 1 && $stoponerror } {
+            break
+        }
+        incr index
+    }
+    return $results
+}
+
+# Returns the stc::help description of an object type, or "" when the API
+# cannot describe it (no stc::help command, or an unknown object type).
+proc ::cta::describe { objecttype } {
+    if { [info commands ::stc::help] eq "" || [catch { ::stc::help $objecttype } result] } {
+        return ""
+    }
+    return $result
+}
+
+# Adds (or removes) an asynchronous request to the requests that are checked
+# for completion.
+proc ::cta::watch { request } {
+    variable requests
+    set requests($request) 1
+    return
+}
+
+proc ::cta::unwatch { request } {
+    variable requests
+    unset -nocomplain requests($request)
+    return
+}
+
+# Reads the State of every watched request in one pass. Requests that are no
+# longer active are moved to the completed list, which wakes up the vwait in
+# ::cta::waitrequests. The check is repeated every 'interval' ms, from the
+# event loop, while there are watched requests.
+proc ::cta::checkrequests { interval activestates } {
+    variable requests
+    variable completed
+    variable timer
+    variable wakeup
+
+    set timer ""
+    set found 0
+    foreach request [array names requests] {
+        if { [catch { uplevel #0 [list stc::get $request -State] } state]
+             || [string toupper $state] ni $activestates } {
+            lappend completed $request
+            unset requests($request)
+            set found 1
+        }
+    }
+
+    if { $found } {
+        set wakeup 1
+    }
+    if { [array size requests] } {
+        set timer [after $interval [list ::cta::checkrequests $interval $activestates]]
+    }
+    return
+}
+
+# Runs the Tcl event loop until a watched request completes, or 'timeout' ms
+# have passed, and returns the list of requests that have completed.
+proc ::cta::waitrequests { timeout interval activestates } {
+    variable completed
+    variable timer
+
+    if { $timer eq "" } {
+        checkrequests $interval $activestates
+    }
+
+    if { ![llength $completed] && $timeout > 0 } {
+        set deadline [after $timeout [list set ::cta::wakeup 0]]
+        vwait ::cta::wakeup
+        after cancel $deadline
+    }
+
+    set result $completed
+    set completed {}
+    return $result
+}
+
+# Resolves a DDN path to a handle. 'elements' is a flat list of "type index"
+# pairs, which select the index'th (from 1) child of that type, in turn.
+proc ::cta::resolve { handle elements } {
+    foreach { type index } $elements {
+        set children [uplevel #0 [list stc::get $handle -children-$type]]
+        if { $index < 1 || $index > [llength $children] } {
+            return -code error "there is no $type\($index\) under $handle"
+        }
+        set handle [lindex $children [expr { $index - 1 }]]
+    }
+    return $handle
+}
+
+# Returns a list of "attribute value" pairs for the 'attributes' that the object has.
+proc ::cta::values { handle attributes } {
+    set values {}
+    foreach attribute $attributes {
+        if { ![catch { uplevel #0 [list stc::get $handle -$attribute] } value] } {
+            lappend values $attribute $value
+        }
+    }
+    return $values
+}
+
+# Walks the object tree under 'root' (breadth first) and returns a flat list of
+# "handle parent values" triples, where 'values' is a list of "attribute value"
+# pairs for the 'attributes' that the object has.
+proc ::cta::tree { root attributes } {
+    set result {}
+    set queue  [list $root [uplevel #0 [list stc::get $root -parent]]]
+    for { set index 0 } { $index < [llength $queue] } { incr index 2 } {
+        set handle [lindex $queue $index]
+        lappend result $handle [lindex $queue [expr { $index + 1 }]] [values $handle $attributes]
+        foreach child [uplevel #0 [list stc::get $handle -children]] {
+            lappend queue $child $handle
+        }
+    }
+    return $result
+}
+
+# Walks the object tree under 'root' (breadth first) and returns a flat list of
+# "handle parent values" triples, where 'values' is the result of stc::get
+# (all of the attributes of the object).
+proc ::cta::snapshot { root } {
+    set result {}
+    set queue  [list $root {}]
+    for { set index 0 } { $index < [llength $queue] } { incr index 2 } {
+        set handle [lindex $queue $index]
+        lappend result $handle [lindex $queue [expr { $index + 1 }]] [uplevel #0 [list stc::get $handle]]
+        foreach child [uplevel #0 [list stc::get $handle -children]] {
+            lappend queue $child $handle
+        }
+    }
+    return $result
+}
+
+# Runs "<command> <item>" for each item, and returns a flat list of "code result
+# errorCode" triples, one triple for each item.
+proc ::cta::each { command items } {
+    set results {}
+    foreach item $items {
+        set code [catch { uplevel #0 [list {*}$command $item] } result options]
+        if { $code == 1 } {
+            lappend results $code $result [dict get $options -errorcode]
+        } else {
+            lappend results $code $result {}
+        }
+    }
+    return $results
+}
+
+# Runs stc::get for each handle, with the same attributes, and returns a flat
+# list of "code result" pairs, one pair for each handle.
+proc ::cta::getmany { handles attributes } {
+    set results {}
+    foreach handle $handles {
+        set code [catch { uplevel #0 [list stc::get $handle {*}$attributes] } result]
+        lappend results $code $result
+    }
+    return $results
+}
+"""
+
+# Returns "name version script" for each loaded package, with the "package ifneeded"
+# script that loaded it (packages built into Tcl have no script, and are skipped).
+_TCL_LOADED_PACKAGES = """
+set result {}
+foreach name [package names] {
+    if { ![catch { package present $name } version] } {
+        set script [package ifneeded $name $version]
+        if { $script ne "" } {
+            lappend result $name $version $script
+        }
+    }
+}
+set result
+"""
+
+# The QueueListener that writes the log file (when the log_queue argument is used).
+_log_listener = None
+
+def _stop_log_listener():
+    """
+    Write the queued log messages, and stop the log writer thread.
+    """
+    global _log_listener
+    if _log_listener is not None:
+        listener = _log_listener
+        _log_listener = None
+        listener.stop()
+
+# Log directories created with the default log path (eg: 2021-05-19-14-05-56_PID1234).
+_LOG_DIRECTORY_PATTERN = re.compile(r"\d{4}-\d\d-\d\d-\d\d-\d\d-\d\d_PID(\d+)\Z")
+
+# A spill file: <session>-<number>.txt, where the session is named like a log directory.
+_SPILL_FILE_PATTERN = re.compile(r"(\d{4}-\d\d-\d\d-\d\d-\d\d-\d\d_PID\d+)-\d+\.txt\Z")
+
+def _prune_log_directories(parent, current, keep, max_age):
+    """
+    Delete the log directories in 'parent' beyond the 'keep' most recent ones, and
+    those older than 'max_age' days. The current log directory, and the directories
+    of processes that are still running, are never deleted.
+    """
+    try:
+        names = sorted([name for name in os.listdir(parent) if _LOG_DIRECTORY_PATTERN.match(name)], reverse=True)
+    except OSError as errmsg:
+        logging.warning("Unable to read the log directories in " + parent + ": " + str(errmsg))
+        return
+
+    now = time.time()
+    kept = 0
+    for name in names:
+        path = os.path.join(parent, name)
+        if os.path.abspath(path) == os.path.abspath(current):
+            kept += 1
+            continue
+
+        expired = max_age is not None and now - os.path.getmtime(path) > max_age * 86400
+        if not expired and (keep is None or kept < keep):
+            kept += 1
+            continue
+
+        if _process_exists(int(_LOG_DIRECTORY_PATTERN.match(name).group(1))):
+            continue
+
+        try:
+            shutil.rmtree(path)
+            logging.info("Deleted the old log directory " + path)
+        except OSError as errmsg:
+            logging.warning("Unable to delete the old log directory " + path + ": " + str(errmsg))
+
+def _prune_spill_files(directory, current, keep, max_age):
+    """
+    Delete the spill files in 'directory' of the sessions beyond the 'keep' most recent
+    ones (other than the 'current' session), and those older than 'max_age' days.
+    """
+    try:
+        names = [name for name in os.listdir(directory) if _SPILL_FILE_PATTERN.match(name)]
+    except OSError:
+        # There are no spill files yet.
+        return
+
+    sessions = sorted(set([_SPILL_FILE_PATTERN.match(name).group(1) for name in names]) - set([current]), reverse=True)
+    kept = set(sessions[:keep])
+
+    now = time.time()
+    for name in names:
+        session = _SPILL_FILE_PATTERN.match(name).group(1)
+        if session == current:
+            continue
+
+        path = os.path.join(directory, name)
+        try:
+            if session not in kept or (max_age is not None and now - os.path.getmtime(path) > max_age * 86400):
+                os.remove(path)
+        except OSError as errmsg:
+            logging.warning("Unable to delete the old spill file " + path + ": " + str(errmsg))
+
+def _process_exists(pid):
+    """
+    Return True if a process with this PID is running (POSIX only; False elsewhere).
+    """
+    if pid == os.getpid():
+        return True
+    if os.name != "posix":
+        return False
+
+    try:
+        os.kill(pid, 0)
+    except OSError as errmsg:
+        # EPERM: the process exists, but belongs to another user.
+        return errmsg.errno == errno.EPERM
+    return True
+
+# Serializes the start of the interpreter by threads other than the worker thread.
+_startup_lock = threading.Lock()
+
+def _read_json_cache(path):
+    """
+    Return the entries of a cache file (eg: api_path -> entry), or {} if there are none.
+    """
+    try:
+        with open(path) as cachefile:
+            entries = json.load(cachefile)
+    except (IOError, OSError, ValueError):
+        return {}
+
+    if not isinstance(entries, dict):
+        return {}
+    return entries
+
+def _write_json_cache(path, entries):
+    """
+    Write the entries of a cache file. Other processes may be reading the file, so it
+    is replaced in one step. Errors are logged, since the cache is only an optimization.
+    """
+    try:
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        temporary = path + "." + str(os.getpid())
+        with open(temporary, "w") as cachefile:
+            json.dump(entries, cachefile, indent=2, sort_keys=True)
+
+        if sys.hexversion >= 0x03030000:
+            os.replace(temporary, path)
+        else:
+            if os.path.exists(path):
+                os.remove(path)
+            os.rename(temporary, path)
+
+    except (IOError, OSError) as errmsg:
+        logging.warning("Unable to write the cache file " + path + ": " + str(errmsg))
+
+def _tcl_escape(value):
+    """
+    Backslash-escape the characters that are special to the Tcl parser.
+    """
+    return _TCL_SPECIAL_PATTERN.sub(lambda match: _TCL_ESCAPES.get(match.group(0), "\\" + match.group(0)), value)
+
+def _tcl_quote(value):
+    """
+    Return 'value' (a string) quoted so that Tcl parses it as a single word.
+    """
+    if not value:
+        return "{}"
+
+    if not _TCL_SPECIAL_PATTERN.search(value):
+        return value
+
+    # Braces are the most readable, but only work for balanced braces and no backslashes.
+    if "\\" not in value:
+        if "{" not in value and "}" not in value:
+            return "{" + value + "}"
+
+        depth = 0
+        for character in value:
+            if character == "{":
+                depth += 1
+            elif character == "}":
+                depth -= 1
+                if depth < 0:
+                    break
+
+        if depth == 0:
+            return "{" + value + "}"
+
+    return _tcl_escape(value)
+
+class TclExpr(object):
+    """
+    A raw Tcl script, substituted when the command runs (eg: TclExpr("[NULL]")).
+
+    CtaPython quotes all argument values, so they are always passed literally.
+    Wrap a value in TclExpr to have Tcl evaluate it instead.
+    """
+    def __init__(self, script):
+        self.script = script
+
+    def __str__(self):
+        return self.script
+
+    def __repr__(self):
+        return "TclExpr(" + repr(self.script) + ")"
+
+def _tcl_value(value):
+    """
+    Convert a Python argument into the value passed to Tcl by CtaPython.Exec.
+    Lists and tuples become Tcl lists, dicts become flat "key value" lists, and
+    booleans become "true"/"false". TclExpr objects are returned unchanged.
+    """
+    cls = value.__class__
+    if cls is str or cls is int:
+        # The common cases first.
+        return value
+    elif isinstance(value, (str, TclExpr)):
+        return value
+    elif isinstance(value, bool):
+        return "true" if value else "false"
+    elif isinstance(value, (int, float)):
+        return value
+    elif isinstance(value, (list, tuple)):
+        return tuple([_tcl_value(item) for item in value])
+    elif isinstance(value, dict):
+        items = []
+        for key in value:
+            items.append(str(key))
+            items.append(_tcl_value(value[key]))
+        return tuple(items)
+    elif value is None:
+        return ""
+
+    return str(value)
+
+def _tcl_format(value):
+    """
+    Return the Tcl source for a Python argument (the script form of _tcl_value).
+    """
+    value = _tcl_value(value)
+    if isinstance(value, str):
+        return _tcl_quote(value)
+    elif isinstance(value, TclExpr):
+        return value.script
+    elif isinstance(value, tuple):
+        return _tcl_quote(" ".join([_tcl_format(item) for item in value]))
+
+    return str(value)
+
+# The logging level is checked on this logger before any debug message is built.
+_root_logger = logging.getLogger()
+
+def _command(method):
+    """
+    Decorator for the public methods.
+
+    Logs the method call (with its arguments) and its result at the DEBUG level.
+    The messages are only built when DEBUG is enabled, so otherwise the cost is
+    a single level check.
+    """
+    methodname = method.__name__
+    argnames = method.__code__.co_varnames[1:method.__code__.co_argcount]
+
+    def wrapper(self, *args, **kwargs):
+        worker = self.worker
+        if worker is not None and worker is not threading.current_thread():
+            # Threaded mode: run the method on the interpreter's thread.
+            future = worker.Submit(methodname, wrapper, self, args, kwargs)
+            if self.retries is not None:
+                return self.RetryCall(future, methodname, wrapper, args, kwargs)
+            if self.timeout is None and self.call_timeouts is None:
+                return future.result()
+            return self.WaitResult(future, worker, methodname, args)
+
+        if self.metrics is not None:
+            return self.metrics.Measure(self, methodname, argnames, method, args, kwargs)
+
+        if not _root_logger.isEnabledFor(logging.DEBUG):
+            return method(self, *args, **kwargs)
+
+        self.LogCommand(methodname, argnames, args, kwargs)
+        result = method(self, *args, **kwargs)
+        logging.debug(" - Python result  - %s", self.LogText(result))
+        return result
+
+    wrapper.__name__ = methodname
+    wrapper.__doc__ = method.__doc__
+    wrapper.__wrapped__ = method
+    return wrapper
 
 class CtaPython:
 
-    def __init__(self, api_path=None, log_path=None, log_level="DEBUG"):
+    # The CtaWorker thread that owns the Tcl interpreter (threaded mode only).
+    worker = None
+
+    # The CtaAttributeCache used by get (see enable_cache).
+    cache = None
+
+    # The CtaMetrics that time the calls (see enable_metrics).
+    metrics = None
+
+    # The CtaRecorder that records the Tcl commands (see record).
+    recorder = None
+
+    # Truncation of the logged commands and results (see the 'log_result_limit' argument),
+    # and the number of spill files written.
+    log_result_limit = None
+    log_spill = False
+    log_spills = 0
+
+    # The default timeout (seconds) of each call, and what to do when it expires
+    # (threaded mode only, see the 'timeout' argument).
+    timeout = None
+    on_timeout = "respawn"
+
+    # Per-thread timeouts (see timeout_after).
+    call_timeouts = None
+
+    # The CtaWatchdog that reports stuck calls (see enable_watchdog).
+    watchdog = None
+
+    # The CtaSchema used to check the attributes of config and create (see load_schema).
+    schema = None
+
+    # The CtaRetry policies by error class (see enable_retries), and whether a
+    # failed command is being retried.
+    retries = None
+    retrying = False
+
+    # Startup state (see start and startup_report).
+    lazy_start = False
+    startup = None
+    startup_error = None
+    package_cache_status = "disabled"
+
+    # Objects notified (by NotifyListeners) when a call may have changed the data model.
+    listeners = ()
+
+    # The CtaStatPoller thread that polls the streaming subscriptions (threaded mode only).
+    poller = None
+
+    # The CtaScheduler of the asynchronous commands (see perform_async).
+    scheduler = None
+
+    # The CtaPathCache of resolved DDN paths (see object).
+    paths = None
+
+    def __init__(self, api_path=None, log_path=None, log_level="DEBUG", threaded=False, lazy=False, package_cache=True,
+                 log_queue=False, log_max_bytes=None, log_backup_count=5, log_result_limit=None, log_spill=False,
+                 log_spill_count=100, log_spill_max_bytes=100 * 1024 * 1024,
+                 log_keep=None, log_max_age=None, timeout=None, on_timeout="respawn"):
         """
         Load the Conformance  API and initialize the Python environment.
 
         'api_path' optionally specifies the location of the Spirent TestCenter Conformance Test Application API installation.
         'log_path' optionally specifies the location where the logs are to be stored.
+        'threaded' optionally creates the Tcl interpreter on a dedicated worker thread. The public 
+                   methods can then be called from any thread, and the submit methods return
+                   concurrent.futures.Future objects.
+        'lazy' optionally delays loading the API: True loads it the first time it is used, and
+               "background" loads it on the worker thread while the script continues (threaded
+               mode only). Call start() to wait until the API is loaded.
+        'package_cache' specifies whether the "package ifneeded" scripts that load the API are 
+                        cached (by api_path) for later runs, so that Tcl does not search for the 
+                        package again. It may also be the path of the cache file. The default 
+                        file is ~/Spirent/CTA/Cache/package_index.json, or package_index.json in
+                        the CTA_CACHE_DIRECTORY environment variable.
+        'log_queue' optionally writes the log file from a background thread, so that calls 
+                    never wait for the disk (Python 3 only).
+        'log_max_bytes' optionally rotates the log file when it reaches this size, keeping
+                        'log_backup_count' older files (cta_python.log.1, ...).
+        'log_result_limit' optionally truncates logged commands and results to this number of
+                           characters. If 'log_spill' is True, the full text is written to a
+                           file in the "spill" subdirectory, and the log refers to the file.
+        'log_spill_count' and 'log_spill_max_bytes' limit the number and total size of the spill
+                          files of the session: the oldest files are deleted first. The spill files
+                          are named after the session (<date>-<time>_PID<pid>-<number>.txt), and
+                          those of the 'log_backup_count' most recent earlier sessions are kept
+                          (unless they are older than 'log_max_age' days).
+        'log_keep' optionally deletes all but this number of the most recent log directories
+                   (named <date>-<time>_PID<pid>) next to the log path.
+        'log_max_age' optionally deletes those log directories when they are older than this 
+                      number of days.
+        'timeout' optionally specifies how long (seconds) each call may take before it raises
+                  CtaTimeoutError (threaded mode only). See also timeout_after().
+        'on_timeout' specifies what to do with the interpreter when a call times out: "respawn"
+                     replaces it with a new interpreter (the objects and handles of the stuck 
+                     session are lost), and "raise" only raises CtaTimeoutError, leaving the 
+                     later calls queued behind the stuck call.
 
         Returns None.
         """
+        self.startup_times = OrderedDict()
+        start = _perf_counter()
 
         # Construct the log path.            
         if log_path:
@@ -69,8 +721,16 @@ class CtaPython:
         if not os.path.exists(self.log_path):
             os.makedirs(self.log_path)
 
-        # NOTE: Consider limiting the number of log directories that are created.
-        #       It would mean deleting older directories.
+        self.log_result_limit = log_result_limit
+        self.log_spill = log_spill
+        self.log_spills = 0
+        if log_spill:
+            self.log_spill_count = log_spill_count
+            self.log_spill_max_bytes = log_spill_max_bytes
+            self.log_spill_session = datetime.datetime.now().strftime("%Y-%m-%d-%H-%M-%S") + "_PID" + str(os.getpid())
+            # The (path, size) of the spill files of this session, oldest first.
+            self.log_spill_files = deque()
+            self.log_spill_bytes = 0
 
         #16/05/18 11:03:53.717 INFO  3078268608 - user.scripting       - stc::get automationoptions -suppressTclErrors
         #16/05/18 11:03:53.717 INFO  3078268608 - user.scripting       - return  false
@@ -89,7 +749,7 @@ class CtaPython:
             # DEBUG is the default log level.
             log_level = logging.DEBUG        
             
-        logging.basicConfig(filename=self.logfile, filemode="w", level=log_level, format="%(asctime)s %(levelname)s %(message)s")
+        self.SetupLogging(log_level, log_queue, log_max_bytes, log_backup_count)
         #logging.Formatter(fmt='%(asctime)s.%(msecs)03d',datefmt='%Y/%m/%d %H:%M:%S')
         # Add timestamps to each log message.
         #logging.basicConfig()
@@ -103,16 +763,346 @@ class CtaPython:
         logging.info("Current Path = " + os.path.abspath(os.getcwd()))   
         logging.info("Log Path     = " + self.log_path)
 
-        # Instantiate the Tcl interpreter.
-        self.tcl = Tcl()
+        if log_keep is not None or log_max_age is not None:
+            _prune_log_directories(os.path.dirname(self.log_path), self.log_path, log_keep, log_max_age)
+
+        if log_spill:
+            _prune_spill_files(os.path.join(self.log_path, "spill"), self.log_spill_session, log_backup_count, log_max_age)
+
+        self.api_path = api_path
+
+        if package_cache is True:
+            cache_path = os.getenv("CTA_CACHE_DIRECTORY", os.path.expanduser("~/Spirent/CTA/Cache"))
+            self.package_cache = os.path.join(cache_path, "package_index.json")
+        else:
+            self.package_cache = package_cache or None
+
+        if lazy == "background" and not threaded:
+            raise ValueError("lazy=\"background\" requires threaded=True")
+
+        if timeout is not None and not threaded:
+            # A Tcl evaluation cannot be interrupted by the thread that is running it.
+            raise ValueError("timeout requires threaded=True")
+
+        if on_timeout not in ("respawn", "raise"):
+            raise ValueError("on_timeout must be \"respawn\" or \"raise\"")
+
+        self.timeout = timeout
+        self.on_timeout = on_timeout
+
+        # The chassis and ports held by this session.
+        self.ledger = CtaLedger()
+
+        self.startup_times["logging"] = _perf_counter() - start
+
+        if threaded:
+            if Future is None:
+                raise ImportError("threaded mode requires the concurrent.futures module")
+
+            # The interpreter may only be used by the thread that created it.
+            self.worker = CtaWorker()
+            self.worker.start()
+
+            # The interpreter must also be deleted by the worker thread.
+            atexit.register(_close_at_exit, weakref.ref(self))
+
+        if lazy == "background":
+            self.lazy_start = True
+            self.startup = self.worker.Submit("StartInterpreter", CtaPython.StartInterpreter, self, (), {})
+        elif lazy:
+            self.lazy_start = True
+        else:
+            self.start()
+
+        return
+
+    def __getattr__(self, name):
+        # Only called for attributes that have not been set. In lazy mode, the
+        # interpreter is started the first time that it is needed.
+        if name == "tcl" and self.__dict__.get("lazy_start"):
+            self.start()
+            return self.__dict__["tcl"]
+
+        raise AttributeError(name)
+
+    #==============================================================================
+    def start(self):
+        """
+        Description
+            Loads the API, if it has not been loaded yet (see the 'lazy' argument).
+
+        Syntax
+            cta.start()
+
+        Comments
+            In lazy mode, the API is loaded by the first call that needs it. start()
+            loads it now, or waits until the background load is complete. If the
+            load failed, the error is raised.
+
+        Return Value
+            None.
+
+        Example
+            cta = CtaPython(api_path, threaded=True, lazy="background")
+            ...
+            cta.start()
+        """
+        worker = self.worker
+        if worker is not None and worker is not threading.current_thread():
+            with _startup_lock:
+                if self.startup is None or (self.startup.done() and self.startup.exception() is not None):
+                    self.startup = worker.Submit("StartInterpreter", CtaPython.StartInterpreter, self, (), {})
+                startup = self.startup
+            startup.result()
+        else:
+            self.StartInterpreter()
+
+        return
+
+    def startup_report(self):
+        """
+        Description
+            Returns the time taken by each step of the startup.
+
+        Syntax
+            cta.startup_report()
+
+        Comments
+            The steps are "logging" (the log directory and log file), "interpreter"
+            (creating the Tcl interpreter), "package" (package require) and "helpers"
+            (the Tcl procedures used by CtaPython), in seconds. "package_cache" is 
+            "hit" if the package was loaded with the cached package index, "miss" if
+            it was not, "enabled (not yet used)" if the package has not been loaded
+            yet (lazy start), and "disabled" if there is no cache. "state" is 
+            "started", "not started" or "failed".
+
+        Return Value
+            Dictionary.
+
+        Example
+            print(cta.startup_report())
+        """
+        report = dict(self.startup_times)
+        if "tcl" in self.__dict__ and not self.__dict__.get("lazy_start"):
+            report["state"] = "started"
+        elif self.startup_error is not None:
+            report["state"] = "failed"
+        else:
+            report["state"] = "not started"
+        if self.package_cache is not None and "package_cache_status" not in self.__dict__:
+            # The package has not been loaded yet.
+            report["package_cache"] = "enabled (not yet used)"
+        else:
+            report["package_cache"] = self.package_cache_status
+        report["total"] = sum([value for value in self.startup_times.values()])
+        return report
+
+    #==============================================================================
+    def StartInterpreter(self):
+        """
+        Create the Tcl interpreter and load the Conformance Application package.
+        """
+        if "tcl" in self.__dict__ and not self.__dict__.get("lazy_start"):
+            # Already started.
+            return
+
+        api_path = self.api_path
+
+        start = _perf_counter()
+
+        # Instantiate the Tcl interpreter. Command results are always returned as strings.
+        tcl = Tcl()
+        tcl.tk.wantobjects(False)
+        self.tcl = tcl
+
+        if self.worker is not None:
+            # The worker keeps its own reference, so that the interpreter is never
+            # deleted by another thread.
+            self.worker.tcl = self.tcl
+
+        try:
+            self.tcl.eval("lappend ::auto_path {" + api_path + "}")
+            self.startup_times["interpreter"] = _perf_counter() - start
+
+            logging.info("Tcl Version  = " + self.tcl.eval("info patchlevel"))
+            logging.info("Tcl ::auto_path = " + self.tcl.eval('set ::auto_path'))
+            logging.info("Loading the Spirent TestCenter Conformance Application in the Tcl interpreter...")
+
+            start = _perf_counter()
+            self.LoadPackage()
+            self.startup_times["package"] = _perf_counter() - start
+
+            start = _perf_counter()
+            self.tcl.eval(_TCL_HELPERS)
+            self.startup_times["helpers"] = _perf_counter() - start
+
+        except Exception as errmsg:
+            # Start again from the beginning the next time the interpreter is needed.
+            self.startup_error = errmsg
+            del self.tcl
+            raise
+
+        self.startup_error = None
+        self.lazy_start = False
+
+        report = self.startup_report()
+        logging.info("Startup      = %.3f s (logging %.3f s, interpreter %.3f s, package %.3f s, helpers %.3f s, package cache %s)",
+                     report["total"], report.get("logging", 0.0), report.get("interpreter", 0.0), report.get("package", 0.0),
+                     report.get("helpers", 0.0), report["package_cache"])
+
+        return
+
+    #==============================================================================
+    def SetupLogging(self, log_level, log_queue, log_max_bytes, log_backup_count):
+        # Configures the root logger, like logging.basicConfig: nothing is changed if
+        # the root logger already has handlers (eg: from another CtaPython object).
+        global _log_listener
+
+        if _root_logger.handlers:
+            return
+
+        if log_max_bytes:
+            handler = logging.handlers.RotatingFileHandler(self.logfile, mode="a", maxBytes=log_max_bytes, backupCount=log_backup_count)
+            # Start with an empty file, as for filemode="w".
+            handler.doRollover()
+        else:
+            handler = logging.FileHandler(self.logfile, mode="w")
+
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s"))
 
-        self.tcl.eval("lappend ::auto_path {" + api_path + "}")
+        if log_queue:
+            if not hasattr(logging.handlers, "QueueListener"):
+                raise ImportError("log_queue requires Python 3.2 or later")
 
-        logging.info("Tcl Version  = " + self.tcl.eval("info patchlevel"))
-        logging.info("Tcl ::auto_path = " + self.tcl.eval('set ::auto_path'))
-        logging.info("Loading the Spirent TestCenter Conformance Application in the Tcl interpreter...")
+            # The messages are formatted by the listener thread. Calls only queue the record.
+            records = queue.Queue()
+            _log_listener = logging.handlers.QueueListener(records, handler)
+            _log_listener.start()
+            atexit.register(_stop_log_listener)
+            handler = CtaQueueHandler(records)
+
+        _root_logger.addHandler(handler)
+        _root_logger.setLevel(log_level)
+
+    def LogText(self, value):
+        # Returns the value to log for a command or result: unchanged, or truncated to
+        # log_result_limit characters (with the full text spilled to a file).
+        limit = self.log_result_limit
+        if limit is None:
+            return value
+
+        text = str(value)
+        if len(text) <= limit:
+            return text
+
+        message = text[:limit] + "... [" + str(len(text) - limit) + " more characters"
+        if self.log_spill:
+            if self.log_spill_max_bytes is not None and len(text) > self.log_spill_max_bytes:
+                return message + ", too long to spill]"
+
+            spillpath = None
+            while spillpath is None or os.path.exists(spillpath):
+                # Another CtaPython object of this process may have started in the same second.
+                self.log_spills += 1
+                spillpath = os.path.join(self.log_path, "spill", self.log_spill_session + "-%06d.txt" % self.log_spills)
+            try:
+                if not os.path.exists(os.path.dirname(spillpath)):
+                    os.makedirs(os.path.dirname(spillpath))
+                with open(spillpath, "w") as spillfile:
+                    spillfile.write(text)
+                message += " in " + spillpath
+            except (IOError, OSError) as errmsg:
+                message += ", unable to write " + spillpath + ": " + str(errmsg)
+            else:
+                self.RotateSpillFiles(spillpath)
+
+        return message + "]"
+
+    def RotateSpillFiles(self, spillpath):
+        # Deletes the oldest spill files of the session, beyond log_spill_count files
+        # or log_spill_max_bytes bytes.
+        size = os.path.getsize(spillpath)
+        self.log_spill_files.append((spillpath, size))
+        self.log_spill_bytes += size
+
+        files = self.log_spill_files
+        while len(files) > 1 and (len(files) > self.log_spill_count or
+                                  (self.log_spill_max_bytes is not None and self.log_spill_bytes > self.log_spill_max_bytes)):
+            path, size = files.popleft()
+            self.log_spill_bytes -= size
+            try:
+                os.remove(path)
+            except OSError as errmsg:
+                logging.warning("Unable to delete the spill file " + path + ": " + str(errmsg))
+
+    #==============================================================================
+    def LoadPackage(self):
+        # Runs "package require SpirentTestCenterConformance". When the package cache
+        # has the "package ifneeded" scripts for this api_path, they are registered
+        # first, so that Tcl does not need to search ::auto_path for the package index.
+        if self.package_cache is None:
+            self.package_cache_status = "disabled"
+            self.Exec("package require SpirentTestCenterConformance")
+            return
+
+        key = os.path.abspath(self.api_path)
+        stamp = self.PackageStamp()
+        entries = _read_json_cache(self.package_cache)
+        entry = entries.get(key)
+
+        if entry is not None and entry.get("stamp") == stamp:
+            for name, version, script in entry["packages"]:
+                self.tcl.call("package", "ifneeded", name, version, script)
+
+            try:
+                self.Exec("package require SpirentTestCenterConformance")
+                self.package_cache_status = "hit"
+                return
+            except TclError as errmsg:
+                logging.warning("Unable to load the package with the cached package index (" + str(errmsg) + "). Searching for it again...")
+                for name, version, script in entry["packages"]:
+                    self.tcl.call("package", "forget", name)
+
+        self.package_cache_status = "miss"
         self.Exec("package require SpirentTestCenterConformance")
 
+        # Remember how each of the packages that are now loaded was loaded.
+        items = self.tcl.splitlist(self.tcl.eval(_TCL_LOADED_PACKAGES))
+        packages = [list(items[index:index + 3]) for index in range(0, len(items), 3)]
+        entries[key] = {"stamp": stamp, "packages": packages}
+        _write_json_cache(self.package_cache, entries)
+
+    def PackageStamp(self):
+        # Identifies the api_path installation, so that an outdated cache entry is not used.
+        stamp = [self.tcl.eval("info patchlevel")]
+        for path in (self.api_path, os.path.join(self.api_path, "pkgIndex.tcl")):
+            try:
+                stamp.append(os.path.getmtime(path))
+            except OSError:
+                stamp.append(None)
+        return stamp
+
+    #==============================================================================
+    def close(self):
+        """
+        Stops the worker thread (threaded mode only). Queued calls are completed first.
+        """
+        if self.poller is not None:
+            poller = self.poller
+            self.poller = None
+            poller.Stop()
+
+        if self.worker is not None:
+            worker = self.worker
+            self.worker = None
+            self.tcl = None
+            worker.Stop()
+
+        if _log_listener is not None:
+            # Write the queued log messages (the listener is restarted if more are logged).
+            _log_listener.stop()
+            _log_listener.start()
+
         return
 
 
@@ -122,6 +1112,7 @@ class CtaPython:
     ####
     ###############################################################################
 
+    @_command
     def config(self, objecthandle, **kwargs):
         """ 
         Description
@@ -152,6 +1143,10 @@ class CtaPython:
              In both DDN and DAN paths, an object type name may have an index suffix (an integer in 
              parentheses) to reference one of multiple children of the same type.
              For more information about these notations, see Referencing Objects: Object Paths. 
+            -Values are passed to Tcl as they are, without any Tcl substitution. Python lists and 
+             tuples are passed as Tcl lists, dicts as "key value" lists, and booleans as true/false.
+             Wrap a value in TclExpr to have Tcl evaluate it (eg: TclExpr("[NULL]")). For backwards 
+             compatibility, a string value that starts with "[" is also evaluated by Tcl.
 
         Return Value
             None. Errors are raised as exceptions, encoded as string values that describe the error condition.
@@ -160,24 +1155,34 @@ class CtaPython:
             cta.config("userprofile1", dnsRetries=10)
             cta.config("userprofile1", cifsng.cifsngDataRandomization=true)
             cta.config(project + ".test.userprofile", sipng.firstRTPPort=1026)
+            cta.config("userprofile1", someHandle=TclExpr("[NULL]"))
         """
-        self.LogCommand()
-        tclcode = 'stc::config ' + objecthandle + ' '
+        if self.schema is not None:
+            kwargs = self.schema.Check("stc::config", objecthandle, None, kwargs)
+
+        args = [objecthandle]
 
         for key in kwargs:
-            #tclcode = tclcode + ' ' + '-' + key + ' "' + str(kwargs[key]) + '"'
-            reg = re.compile("\[")
-            if reg.match(str(kwargs[key])):
+            value = kwargs[key]
+            if isinstance(value, str) and value[:1] == "[":
                 # This is a Tcl command (eg: [NULL]).
-                tclcode = tclcode + ' ' + '-' + key + " " + str(kwargs[key])
-            else:
-                tclcode = tclcode + ' ' + '-' + key + ' {' + str(kwargs[key]) + '}'
+                value = TclExpr(value)
+
+            args.append("-" + key)
+            args.append(_tcl_value(value))
+
+        failed = True
+        try:
+            result = self.Exec("stc::config", *args)
+            failed = False
+        finally:
+            if self.listeners:
+                self.NotifyListeners("config", objecthandle, {"attributes": kwargs, "failed": failed})
 
-        result = self.Exec(tclcode)
-        logging.debug(" - Python result  - " + str(result))                    
         return result
 
     #==============================================================================
+    @_command
     def get(self, objecthandle, *args):
         """
         Description:
@@ -246,22 +1251,109 @@ class CtaPython:
             cta.get(test, "netrworkprofile.tcpoptions.tcptimeout")
             cta.get(project + "userprofile(2)", "nfs.dataRandomization")
         """
-        self.LogCommand()
-        tclcode = "stc::get " + objecthandle
+        cache = self.cache
+        if cache is not None:
+            hit, result = cache.Lookup(objecthandle, args)
+            if hit:
+                return result
 
-        for key in args:
-            tclcode += " -" + key
-
-        result = self.Exec(tclcode)
+        result = self.Exec("stc::get", objecthandle, *["-" + key for key in args])
 
         # Determine if we need to return a dictionary or just the result of the command.
         if len(args) == 0:
             result = self.List2Dict(result)
 
-        logging.debug(" - Python result  - " + str(result))
+        if cache is not None:
+            cache.Store(objecthandle, args, result)
+
         return result
 
     #==============================================================================
+    @_command
+    def get_many(self, handles, attributes=None, numpy=False):
+        """
+        Description
+            Returns the values of the same attributes for many objects, in columns.
+
+        Syntax
+            cta.get_many(<handles>, [<attributes>], [numpy=False])
+
+        Comments
+            The stc::get commands for all of the handles are sent to the interpreter
+            in one call. 'attributes' is a list of attribute names (or DAN paths). If
+            it is not specified, all of the attributes of each object are returned.
+            -The result has a "handle" column, an "error" column and a column for each
+             attribute. Each column is a list with one value per handle, in the order
+             of 'handles'. Numeric values are converted to int or float.
+            -If stc::get fails for a handle, its "error" value is the error message and
+             its attribute values are None. Otherwise, its "error" value is None. When 
+             all attributes are returned, attributes that an object does not have are None.
+            -If 'numpy' is True, the attribute columns that only have numbers are returned
+             as NumPy arrays (float arrays, with NaN for failed handles, when a column has
+             a float or a failed handle). Requires the numpy package.
+
+        Return Value
+            Dictionary of lists (columns).
+
+        Example
+            ports = cta.get(project, "children-port").split()
+            columns = cta.get_many(ports, ["location", "online"])
+            for handle, location in zip(columns["handle"], columns["location"]):
+                print(handle, location)
+        """
+        handles = [str(handle) for handle in handles]
+        if attributes is not None:
+            attributes = list(attributes)
+            arguments = ["-" + attribute for attribute in attributes]
+        else:
+            arguments = []
+
+        result = self.Exec("::cta::getmany", tuple(handles), tuple(arguments))
+        items = self.tcl.splitlist(result)
+
+        convert = self.Tcl2Python
+        errors = []
+        rows = []
+        for code, result in zip(items[0::2], items[1::2]):
+            if code == "1":
+                errors.append(result)
+                rows.append(None)
+            elif attributes is None:
+                errors.append(None)
+                rows.append(self.List2Dict(result))
+            elif len(attributes) == 1:
+                # stc::get returns the value of a single attribute on its own.
+                errors.append(None)
+                rows.append([convert(result)])
+            else:
+                # The values are taken by position, since the API may return the
+                # attribute names in another case.
+                errors.append(None)
+                rows.append([convert(value) for value in self.tcl.splitlist(result)[1::2]])
+
+        if attributes is None:
+            # The union of the attributes of the objects, in the order they were found.
+            attributes = []
+            found = set()
+            for row in rows:
+                for key in row or ():
+                    if key not in found:
+                        found.add(key)
+                        attributes.append(key)
+
+            rows = [None if row is None else [row.get(key) for key in attributes] for row in rows]
+
+        columns = {"handle": handles, "error": errors}
+        for index, attribute in enumerate(attributes):
+            column = [None if row is None else row[index] for row in rows]
+            if numpy:
+                column = self.NumericColumn(column)
+            columns[attribute] = column
+
+        return columns
+
+    #==============================================================================
+    @_command
     def perform(self, command, **kwargs):
         """        
         Description
@@ -283,20 +1375,26 @@ class CtaPython:
             cta.perform("AttachPorts")
             cta.perform("CtsLoadTestParams", session=session, fileName=filename)
         """
-        self.LogCommand()
 
-        tclcode = "stc::perform " + command
+        args = [command]
 
         for key in kwargs:
-            #tclcode = tclcode + " " + "-" + key + ' "' + str(kwargs[key]) + '"'
-            tclcode = tclcode + " " + "-" + key + r" {" + str(kwargs[key]) + r"}"
+            args.append("-" + key)
+            args.append(_tcl_value(kwargs[key]))
+
+        failed = True
+        try:
+            result = self.Exec("stc::perform", *args)
+            failed = False
+        finally:
+            if self.listeners:
+                self.NotifyListeners("perform", None, {"command": command, "arguments": kwargs, "failed": failed})
 
-        result = self.Exec(tclcode)
         result_dict = self.List2Dict(result)
-        logging.debug(" - Python result  - " + str(result_dict))
         return result_dict
 
     #==============================================================================
+    @_command
     def connect(self, ipAddress):
         """
         Description
@@ -317,14 +1415,12 @@ class CtaPython:
         Example        
             cta.connect("10.72.55.80")
         """
-        self.LogCommand()
-        tclcode = "stc::connect " + ipAddress
-
-        result = self.Exec(tclcode)
-        logging.debug(" - Python result  - " + str(result))
+        result = self.Exec("stc::connect", ipAddress)
+        self.ledger.Connected(ipAddress, result)
         return result
 
     #==============================================================================
+    @_command
     def create(self, objecttype, under, **kwargs):
         """
         Description
@@ -362,17 +1458,24 @@ class CtaPython:
             test = cta.create("tests", under=project, name="Test1", testType="deviceComplex")
             sp = cta.create("ServerProfiles", under=project, name="ServerProfile", applicationProtocol="HTTP", http.keepAlive="on")        
         """
-        self.LogCommand()
-        tclcode = "stc::create " + objecttype + " -under " + under
+        if self.schema is not None:
+            kwargs = self.schema.Check("stc::create", None, objecttype, kwargs)
+
+        args = [objecttype, "-under", under]
 
         for key in kwargs:
-            tclcode = tclcode + " " + "-" + key + " " + str(kwargs[key])
+            args.append("-" + key)
+            args.append(_tcl_value(kwargs[key]))
+
+        objecthandle = self.Exec("stc::create", *args)
+
+        if self.listeners:
+            self.NotifyListeners("create", objecthandle, {"type": objecttype, "parent": under, "attributes": kwargs, "failed": False})
 
-        objecthandle = self.Exec(tclcode)
-        logging.debug(" - Python result  - " + str(objecthandle))
         return objecthandle        
 
     #==============================================================================
+    @_command
     def delete(self, handle):
         """
         Description
@@ -395,14 +1498,18 @@ class CtaPython:
         Example            
             cta.delete(projectHandle)
         """
-        self.LogCommand()
-        tclcode = "stc::delete " + handle
+        failed = True
+        try:
+            result = self.Exec("stc::delete", handle)
+            failed = False
+        finally:
+            if self.listeners:
+                self.NotifyListeners("delete", handle, {"failed": failed})
 
-        result = self.Exec(tclcode)
-        logging.debug(" - Python result  - " + str(result))
         return result
 
     #==============================================================================
+    @_command
     def disconnect(self, ipAddress):
         """
         Description
@@ -422,14 +1529,13 @@ class CtaPython:
         Example
             cta.disconnect("10.50.20.77")
         """
-        self.LogCommand()
-        tclcode = "stc::disconnect " + ipAddress
-        result = self.Exec(tclcode)
-        logging.debug(" - Python result  - " + str(result))
+        result = self.Exec("stc::disconnect", ipAddress)
+        self.ledger.Disconnected(ipAddress)
         return result
 
 
     #==============================================================================
+    @_command
     def release(self, location):
         """
         Description
@@ -450,14 +1556,12 @@ class CtaPython:
         Example
             cta.release("10.50.70.82/1/1")
         """       
-        self.LogCommand()     
-        tclcode = "stc::release " + location
-
-        result = self.Exec(tclcode)         
-        logging.debug(" - Python result  - " + str(result))
+        result = self.Exec("stc::release", location)
+        self.ledger.Released(location)
         return result
 
     #==============================================================================
+    @_command
     def reserve(self, location):
         """
         Description
@@ -481,206 +1585,4170 @@ class CtaPython:
         Example
             cta.reserve("10.50.70.82/2/1")
         """
-        self.LogCommand()
-        tclcode = "stc::reserve " + location
-
-        porthandle = self.Exec(tclcode)         
-        logging.debug(" - Python result  - " + str(porthandle))
+        porthandle = self.Exec("stc::reserve", location)
+        self.ledger.Reserved(location, porthandle)
         return porthandle
 
-    # #==============================================================================
-    # def subscribe(self, side, viewAttributesList):
-    #     """
-    #     Description
-    #         Subscribes to view the list of runtime statistics that users specify.
-            
-    #     Syntax
-    #         cta.subscribe(<side>, <viewAttributesList>)
-            
-    #     Comments
-    #         Subscribes to view runtime statistics for those that user specifies as 
-    #         viewAttributesList. The attribute names should be one of the supported 
-    #         statistics names, for example, http,successfulConns or http,attemptedConns. 
-    #         Wildcards are also supported, such as http*. Please refer to Appendix A. 
-    #         List of Runtime Statistics for full list of runtime statistics.
-        
-    #     Return Value
-    #         Returns the handle to the ResultDataSet object, which consists of the 
-    #         ResultDataObject with statistics values. By default, the returned 
-    #         ResultDataSet will only contain the latest actual values. In order to 
-    #         obtain the values from a specific point in time during the test run, user
-    #         must add the 'all' keyword to the list of viewAttributesList. See Runtime 
-    #         statistics for more information.
-
-    #     Example            
-    #         cta.subscribe("client", ["http,successfulConns", "http,attemptedConns"])
-    #         cta.subscribe("server", "http*")
-    #     """      
-    #     self.LogCommand()
-    #     tclcode = "stc::subscribe " + side + " [list " + " ".join(viewAttributesList) + "]"
-
-    #     resultdataset = self.Exec(tclcode)         
-    #     logging.debug(" - Python result  - " + str(resultdataset))
-    #     return resultdataset
-
-    # #==============================================================================
-    # def unsubscribe(self, handle):
-    #     """
-    #     Description
-    #         Removes a subscription for the specified ResultDataSet.
-            
-    #     Syntax
-    #         cta.unsubscribe(<handle>)
-            
-    #     Comments
-    #         The cta.unsubscribe command removes a subscription for the specified handle 
-    #         of the ResultDataSet object that was returned by the subscribe function.
-            
-    #     Return Value
-    #         None. Errors are raised as exceptions, encoded as string values that 
-    #         describe the error condition.
-            
-    #    Example
-    #         cta.unsubscribe(rdsHandle)
-    #     """
-    #     self.LogCommand()
-    #     tclcode = "stc::unsubscribe " + handle
-
-    #     result = self.Exec(tclcode)         
-    #     logging.debug(" - Python result  - " + str(result))
-    #     return result
-    
-    # #==============================================================================
-    # def waitUntilDone(self):
-    #     """
-    #     Description
-    #         Waits until the command specified by the request id is complete.
-            
-    #     Syntax
-    #         cta.waitUntilCommandIsDone(<requestId>)
-            
-    #     Comments
-    #         This function waits until the command, specified by request id, is out 
-    #         of the PENDING state and completes its job. This is useful for asynchronous 
-    #         commands. If the requestId is not specified, then it waits until any 
-    #         command is completed.
-            
-    #     Return Value
-    #         Result of an asynchronous command.
-    #         Errors are raised as exceptions, encoded as string values that describe the error condition.
-        
-    #     Example
-    #         cta.waitUntilCommandIsDone(cta.connect("10.50.70.82", executesynchronous=False))
+    #==============================================================================
+    @_command
+    def connect_many(self, ipAddresses, strict=True):
+        """
+        Description
+            Connects to several devices, in one call.
 
-    #         CAUTION: "cta.waitUntilCommandIsDone" will time out if the command it waits for does
-    #         not complete in a certain time.        
-    #     """
-    #     self.LogCommand()
-    #     tclcode = "stc::waitUntilCommandIsDone"
+        Syntax
+            cta.connect_many(<ipAddresses>, [strict=True])
 
+        Comments
+            stc::connect is run for each address in a single Tcl evaluation, so the
+            addresses are connected in one round trip. Each address is connected
+            even if another one fails.
+            -If 'strict' is True and any address fails, CtaBulkError is raised once 
+             all of the addresses have been tried. Its 'results' are the results of
+             all of the addresses.
 
-    #     # NOTE: Not yet tested!
+        Return Value
+            Ordered dictionary of "address: result", where the result of an address
+            that failed is its CtaError.
 
+        Example
+            cta.connect_many(["10.72.55.80", "10.72.55.81"])
+        """
+        results = self.Each("stc::connect", ipAddresses)
+        for address in results:
+            if not isinstance(results[address], CtaError):
+                self.ledger.Connected(address, results[address])
+        return self.CheckResults("stc::connect", results, strict)
 
-    #     if requestId != "":
-    #          tclcode += " " + requestId
+    @_command
+    def disconnect_many(self, ipAddresses=None, strict=True):
+        """
+        Description
+            Disconnects from several devices (by default, all of the devices that this
+            session has connected to), in one call. See connect_many.
+
+        Syntax
+            cta.disconnect_many([ipAddresses=<addresses>], [strict=True])
+
+        Return Value
+            Ordered dictionary of "address: result" (the CtaError of an address that failed).
+
+        Example
+            cta.disconnect_many()
+        """
+        if ipAddresses is None:
+            ipAddresses = list(self.ledger.chassis)
+
+        results = self.Each("stc::disconnect", ipAddresses)
+        for address in results:
+            if not isinstance(results[address], CtaError):
+                self.ledger.Disconnected(address)
+        return self.CheckResults("stc::disconnect", results, strict)
+
+    @_command
+    def reserve_many(self, locations, skip_held=True, strict=True):
+        """
+        Description
+            Reserves several ports, in one call.
+
+        Syntax
+            cta.reserve_many(<locations>, [skip_held=True], [strict=True])
+
+        Comments
+            stc::reserve is run for each location in a single Tcl evaluation. Each 
+            port is reserved even if another one fails (see connect_many for 'strict').
+            -If 'skip_held' is True, the ports that this session has already reserved
+             are not reserved again, and their handles are returned. So reserve_many
+             can be called again to reserve the ports that failed.
+
+        Return Value
+            Ordered dictionary of "location: port handle" (the CtaError of a port that 
+            failed).
+
+        Example
+            ports = cta.reserve_many(["//10.50.70.82/1/1", "//10.50.70.82/1/2"])
+        """
+        locations = list(locations)
+        held = {}
+        if skip_held:
+            held = dict([(location, self.ledger.ports[location]) for location in locations if location in self.ledger.ports])
+
+        results = self.Each("stc::reserve", [location for location in locations if location not in held])
+        for location in results:
+            if not isinstance(results[location], CtaError):
+                self.ledger.Reserved(location, results[location])
+
+        ordered = OrderedDict()
+        for location in locations:
+            ordered[location] = held[location] if location in held else results[location]
+        return self.CheckResults("stc::reserve", ordered, strict)
+
+    @_command
+    def release_many(self, locations=None, strict=True):
+        """
+        Description
+            Releases several ports (by default, all of the ports that this session has
+            reserved), in one call. See reserve_many.
+
+        Syntax
+            cta.release_many([locations=<locations>], [strict=True])
+
+        Return Value
+            Ordered dictionary of "location: result" (the CtaError of a port that failed).
+
+        Example
+            cta.release_many()
+        """
+        if locations is None:
+            locations = list(self.ledger.ports)
+
+        results = self.Each("stc::release", locations)
+        for location in results:
+            if not isinstance(results[location], CtaError):
+                self.ledger.Released(location)
+        return self.CheckResults("stc::release", results, strict)
+
+    def held(self):
+        """
+        Returns the chassis that this session is connected to and the ports that it
+        has reserved, as {"chassis": {address: handle}, "ports": {location: handle}}.
+        """
+        return self.ledger.Snapshot()
+
+    def auto_release(self, disconnect=True, signals=None):
+        """
+        Description
+            Returns a context manager that releases all of the ports held by the 
+            session (and disconnects all of its chassis) when the block exits.
+
+        Syntax
+            with cta.auto_release([disconnect=True], [signals=<signal numbers>]):
+
+        Comments
+            The ports are released however the block exits: normally, with an 
+            exception, or on a termination signal. 'signals' are the signals that 
+            are turned into a SystemExit while the block runs (by default SIGTERM 
+            and SIGHUP; SIGINT already raises KeyboardInterrupt). Signal handlers 
+            can only be set from the main thread; in other threads, only the normal
+            exit and exceptions are handled.
+            -Everything in the session's ledger is released, including the ports
+             reserved before the block.
+
+        Return Value
+            CtaAutoRelease object.
+
+        Example
+            with cta.auto_release():
+                cta.connect_many(chassis)
+                cta.reserve_many(locations)
+                ...
+        """
+        return CtaAutoRelease(self, disconnect, signals)
+
+    #==============================================================================
+    def Each(self, command, items):
+        # Runs "<command> <item>" for each item in one evaluation, and returns the
+        # ordered dictionary of results (CtaError objects for the items that failed).
+        items = [str(item) for item in items]
+        results = OrderedDict()
+        if not items:
+            return results
+
+        values = self.tcl.splitlist(self.Exec("::cta::each", command, tuple(items)))
+        for index, item in enumerate(items):
+            code, result, error_code = values[3 * index:3 * index + 3]
+            if code == "1":
+                results[item] = _classify_error(result, command + " " + _tcl_format(item), self.tcl.splitlist(error_code))
+            else:
+                results[item] = result
+
+        return results
+
+    def CheckResults(self, command, results, strict):
+        failures = OrderedDict([(item, results[item]) for item in results if isinstance(results[item], CtaError)])
+        for item in failures:
+            logging.error(failures[item])
+
+        if strict and failures:
+            raise CtaBulkError(command, results, failures)
+
+        return results
+
+    #==============================================================================
+    def object(self, handle):
+        """
+        Description
+            Returns a CtaObject proxy for a handle or DDN path.
+
+        Syntax
+            cta.object(<handle>)
+
+        Comments
+            A CtaObject is a lightweight reference to an object. Nothing is sent to 
+            the interpreter until a value is read or changed.
+            -Reading an attribute of the proxy (eg: project.test) returns the proxy of
+             the first child of that type. Call it with an index to select another
+             child (eg: project.test(2)). proxy + ".test(2)" also works.
+            -proxy["attribute"] reads an attribute (or DAN path), and
+             proxy["attribute"] = value changes it. get, config, create, delete
+             and children are also available as proxy methods (use proxy + ".get"
+             for an object type that has the name of a proxy method).
+            -The DDN path of a proxy is resolved to a concrete handle the first time 
+             it is used, and the handle is remembered until an object is created or
+             deleted (or a command is performed). str(proxy) is the handle, so a
+             proxy can be passed to any CtaPython method.
+
+        Return Value
+            CtaObject object.
+
+        Example
+            project = cta.object("project1")
+            profile = project.test(2).userprofile
+            profile["dnsRetries"] = 10
+            print(profile["nfs.dataRandomization"])
+        """
+        if self.paths is None:
+            self.paths = CtaPathCache()
+            self.listeners = list(self.listeners) + [self.paths]
+
+        return CtaObject(self, str(handle))
+
+    #==============================================================================
+    def index(self, root="project1", attributes=(), mutating_commands=None):
+        """
+        Description
+            Returns an index of the objects under 'root', for fast queries by type, 
+            name and attribute values.
+
+        Syntax
+            cta.index([root="project1"], [attributes=<names>], [mutating_commands=<commands>])
+
+        Comments
+            The object tree is read in one call, which walks the tree in Tcl. The
+            index keeps the type (from the handle), parent, children and name of
+            each object, and the values of the other 'attributes'.
+            -The index is kept up to date by create, delete and config calls made 
+             through this CtaPython object: a created object's subtree is read, a 
+             deleted object's subtree is removed, and changed attributes are read
+             again.
+            -perform and batches may change the tree in ways the index cannot follow,
+             so the tree is read again on the next query. If 'mutating_commands' is
+             given, only the listed commands do this.
+            -Call index.close() to stop updating the index.
+
+        Return Value
+            CtaObjectIndex object.
+
+        Example
+            index = cta.index("project1", attributes=["dnsRetries"])
+            profiles = index.find("userprofile", name="Profile 1")
+            tests = index.find("test", under="project1")
+        """
+        objectindex = CtaObjectIndex(self, str(root), attributes, mutating_commands)
+        self.listeners = list(self.listeners) + [objectindex]
+        return objectindex
+
+    #==============================================================================
+    @_command
+    def snapshot(self, root="project1", exclude_attributes=None):
+        """
+        Description
+            Reads the attributes of all of the objects under 'root', in one call.
+
+        Syntax
+            cta.snapshot([root="project1"], [exclude_attributes=<patterns>])
+
+        Comments
+            Objects are identified by their DDN path relative to the root (eg: 
+            "test(1).userprofile(1)"), so a snapshot can be applied to another
+            session, where the handles are numbered differently.
+            -'exclude_attributes' is a list of (case-insensitive) fnmatch patterns
+             for attributes that are not kept, such as read-only attributes. The
+             parent and children attributes are never kept.
+            -Save the snapshot with snapshot.save(<file>) and read it back with
+             CtaSnapshot.load(<file>).
+
+        Return Value
+            CtaSnapshot object.
+
+        Example
+            baseline = cta.snapshot("project1")
+            baseline.save("baseline.json.gz")
+        """
+        snapshot = CtaSnapshot(str(root), exclude_attributes)
+        snapshot.Read(self)
+        return snapshot
+
+    @_command
+    def apply_snapshot(self, snapshot, root=None, delete=True, dry_run=False):
+        """
+        Description
+            Changes the objects under 'root' to match a snapshot, with as few calls
+            as possible.
+
+        Syntax
+            cta.apply_snapshot(<snapshot>, [root=<handle>], [delete=True], [dry_run=False])
+
+        Comments
+            The current objects are read (see snapshot) and compared with 'snapshot':
+            -Missing objects are created, with all of their attributes.
+            -Existing objects are configured with the attributes that differ.
+            -Objects that are not in the snapshot are deleted (unless 'delete' is 
+             False).
+            The calls are sent in a single batch. 'root' defaults to the root of the
+            snapshot. If 'dry_run' is True, nothing is changed.
+
+        Return Value
+            List of the changes, as tuples:
+                ("create", <path>, <objectType>, <attributes>)
+                ("config", <path>, <attributes>)
+                ("delete", <path>)
+            where <path> is relative to the root, and <attributes> is a dictionary.
+            Raises CtaBatchError if any of the calls fail.
+
+        Example
+            cta.apply_snapshot(CtaSnapshot.load("baseline.json.gz"))
+        """
+        if root is None:
+            root = snapshot.root
+
+        current = CtaSnapshot(str(root), snapshot.exclude_attributes)
+        current.Read(self)
+        changes = current.diff(snapshot, delete)
+
+        if dry_run or not changes:
+            return changes
+
+        # Handles (or batch operations) by path.
+        handles = dict(current.handles)
+        with self.batch() as batch:
+            for change in changes:
+                path = change[1]
+                if change[0] == "create":
+                    parent = path.rsplit(".", 1)[0] if "." in path else ""
+                    words = ["stc::create", change[2], "-under", handles[parent]]
+                    for key in change[3]:
+                        words += ["-" + key, change[3][key]]
+                    handles[path] = batch.Queue(words, None)
+                elif change[0] == "config":
+                    words = ["stc::config", handles[path]]
+                    for key in change[2]:
+                        words += ["-" + key, change[2][key]]
+                    batch.Queue(words, None)
+                else:
+                    batch.Queue(["stc::delete", handles[path]], None)
+
+        return changes
+
+    #==============================================================================
+    def export(self, path, format=None, schema=None, append=False, chunk_size=10000):
+        """
+        Description
+            Opens a file to which results are streamed in chunks, as CSV, Arrow IPC
+            or Parquet.
+
+        Syntax
+            cta.export(<path>, [format=<format>], [schema=<columns>], [append=False], [chunk_size=10000])
+
+        Comments
+            'format' is "csv", "arrow" or "parquet". By default it is taken from the
+            extension of 'path' (.csv, .arrow/.feather/.ipc or .parquet).
+            -'schema' is a list of (column, type) pairs, where type is "str", "int",
+             "float" or "bool". Values are converted to the column type (values that
+             cannot be converted are written as empty/null). If no schema is given,
+             the columns and types are taken from the first chunk.
+            -Rows are kept in memory only until 'chunk_size' rows are buffered, then
+             written as one chunk (a Parquet row group or an Arrow record batch).
+            -If 'append' is True, a CSV file is appended to. Arrow and Parquet files 
+             cannot be appended to, so 'path' is then a directory, and each export
+             writes the next "part-<N>" file in it. The directory can be read as one
+             dataset (eg: pyarrow.dataset.dataset(path)).
+            -Arrow and Parquet require the pyarrow package.
+
+        Return Value
+            CtaExporter object. Use its write(), write_objects() and write_samples() 
+            methods, and close() it (or use it in a "with" statement).
+
+        Example
+            with cta.export("results.parquet") as exporter:
+                exporter.write_objects(cta.get(project, "children-resultdataset").split(), ["rxframes", "txframes"])
+
+            with cta.export("stats.csv", append=True) as exporter:
+                exporter.write_samples(subscription.samples())
+        """
+        return CtaExporter(self, path, format, schema, append, chunk_size)
+
+    #==============================================================================
+    @contextlib.contextmanager
+    def timeout_after(self, seconds):
+        """
+        Description
+            Sets the timeout of the calls made by this thread, in a "with" block.
+
+        Syntax
+            with cta.timeout_after(<seconds>):
+
+        Comments
+            Overrides the 'timeout' argument of CtaPython for the calls made in the
+            block (None for no timeout). Requires threaded mode.
+            -When a call times out, CtaTimeoutError is raised. If the call was still
+             queued, it is cancelled. If it was running, the interpreter is replaced 
+             (unless on_timeout="raise"), since a Tcl evaluation cannot be stopped.
+
+        Return Value
+            None.
+
+        Example
+            with cta.timeout_after(600):
+                cta.perform("CtsRunTest", session=session)
+        """
+        if self.worker is None:
+            raise ValueError("timeouts require threaded=True")
+
+        with _startup_lock:
+            if self.call_timeouts is None:
+                self.call_timeouts = threading.local()
+
+        previous = getattr(self.call_timeouts, "timeout", self.timeout)
+        self.call_timeouts.timeout = seconds
+        try:
+            yield
+        finally:
+            self.call_timeouts.timeout = previous
+
+    def enable_watchdog(self, threshold=60.0, interval=None):
+        """
+        Description
+            Starts a thread that reports the Tcl commands that take longer than 
+            'threshold' seconds.
+
+        Syntax
+            cta.enable_watchdog([threshold=60.0], [interval=<seconds>])
+
+        Comments
+            A stuck command is logged as a warning (with the command text) when it 
+            has run for 'threshold' seconds, and again every 'threshold' seconds
+            while it is still running. The reports are also kept, see 
+            watchdog_reports(). 'interval' is how often the watchdog checks (by
+            default, a tenth of the threshold).
+
+        Return Value
+            None.
+
+        Example
+            cta.enable_watchdog(threshold=300)
+        """
+        self.disable_watchdog()
+        watchdog = CtaWatchdog(self, threshold, interval)
+        self.watchdog = watchdog
+        watchdog.start()
+
+    def disable_watchdog(self):
+        """
+        Stops the watchdog thread.
+        """
+        if self.watchdog is not None:
+            watchdog = self.watchdog
+            self.watchdog = None
+            watchdog.Stop()
+        return
+
+    def watchdog_reports(self):
+        """
+        Returns the reports of stuck commands (the most recent 100), as dictionaries
+        with the "time" of the report, the "command" and how many "seconds" it had run.
+        """
+        if self.watchdog is None:
+            return []
+        return list(self.watchdog.reports)
+
+    #==============================================================================
+    def enable_retries(self, policies=None):
+        """
+        Description
+            Retries the Tcl commands that fail with the given error classes.
+
+        Syntax
+            cta.enable_retries([policies=<dictionary>])
+
+        Comments
+            Failed commands raise a subclass of CtaError, chosen from the Tcl 
+            ::errorCode (or, if it has no class, the error message). 'policies' is a
+            dictionary of "error class: CtaRetry". A failed command is retried 
+            with the policy of the most specific class that has one. Errors
+            without a policy are raised at once.
+            -By default, the transient errors (CtaChassisUnreachableError and
+             CtaPortBusyError) are retried 3 times, with a delay of 1 second that
+             doubles after each attempt.
+            -Without a worker thread, only the failed Tcl command is sent again.
+             In threaded mode, the whole method call is queued again, and the
+             delay is spent on the calling thread: the worker thread runs other
+             calls meanwhile, and each attempt has its own timeout. Calls queued
+             with submit() are not retried in threaded mode.
+            -A failure that will be retried is logged as a warning. The error is
+             logged once the retries are exhausted.
+
+        Return Value
+            None.
+
+        Example
+            cta.enable_retries({CtaChassisUnreachableError: CtaRetry(attempts=5, delay=2.0),
+                                CtaPortBusyError: CtaRetry(attempts=10, delay=5.0, backoff=1.0)})
+        """
+        if policies is None:
+            policies = dict([(errorclass, CtaRetry()) for errorclass in _TRANSIENT_ERRORS])
+
+        self.retries = dict(policies)
+
+    def disable_retries(self):
+        """
+        Stops retrying failed commands.
+        """
+        self.retries = None
+
+    #==============================================================================
+    @_command
+    def load_schema(self, roots=("system1",), refresh=False, cache=True, strict=False):
+        """
+        Description
+            Loads the object types and attributes of the data model, so that config
+            and create check their attributes before anything is sent to the API.
+
+        Syntax
+            cta.load_schema([roots=("system1",)], [refresh=False], [cache=True], [strict=False])
+
+        Comments
+            The first time, the schema is harvested from the objects under 'roots'
+            (one call that reads every object): the attributes of each object type,
+            and the kind of value ("int", "float", "bool" or "string") seen for each.
+            The first time config or create is called for an object type, its
+            attributes, their types and the values of its enumerations are also
+            read from the API's metadata (stc::help), when the API can describe it.
+            The schema is cached on disk, by api_path and API version, in schema.json
+            (in ~/Spirent/CTA/Cache, or CTA_CACHE_DIRECTORY), and saved again when
+            it learns an object type or schema.define() is called. 'cache' may also
+            be the path of the cache file, or False. 'refresh' harvests it again.
+            -config and create (also in batches) raise CtaInvalidAttributeError for
+             an attribute that is not in the API's metadata of the object type,
+             with the closest names as suggestions.
+            -An attribute that was only not seen on the harvested objects may still
+             be valid, so it is logged as a warning (once) and passed through, unless
+             'strict' is True. Object types that are not in the schema, and DAN
+             paths, are not checked.
+            -The values of the attributes read from the metadata, and of those added
+             with schema.define() (which may also list the allowed values of
+             enumerations), are checked. The kinds of values seen on harvested
+             objects are only a guide. Values are converted to the canonical case
+             of the enumeration.
+
+        Return Value
+            CtaSchema object.
+
+        Example
+            schema = cta.load_schema(strict=True)
+            schema.define("test", "testType", values=["deviceComplex", "deviceSimple"])
+            cta.create("test", under=project, nmae="Test1")   # CtaInvalidAttributeError
+        """
+        if cache is True:
+            cache_path = os.getenv("CTA_CACHE_DIRECTORY", os.path.expanduser("~/Spirent/CTA/Cache"))
+            cache = os.path.join(cache_path, "schema.json")
+
+        key = os.path.abspath(self.api_path)
+        version = [self.Exec("package", "present", "SpirentTestCenterConformance")] + self.PackageStamp()
+
+        schema = None
+        if cache and not refresh:
+            entry = _read_json_cache(cache).get(key)
+            if entry is not None and entry.get("format") == CtaSchema.FORMAT and entry.get("version") == version:
+                schema = CtaSchema(entry["types"], entry.get("described"))
+                logging.info("Loaded the schema of %d object types from %s", len(schema.types), cache)
+
+        if schema is None:
+            schema = CtaSchema()
+            for root in roots:
+                items = self.tcl.splitlist(self.Exec("::cta::snapshot", root))
+                for index in range(0, len(items), 3):
+                    schema.Learn(_HANDLE_COUNTER_PATTERN.sub("", items[index]).lower(), self.tcl.splitlist(items[index + 2]))
+            logging.info("Harvested the schema of %d object types", len(schema.types))
+
+        schema.strict = strict
+        schema.describe = self.DescribeType
+        if cache:
+            schema.cache = cache
+            schema.key = key
+            schema.version = version
+            if refresh or schema.modified:
+                schema.save()
+
+        self.schema = schema
+        return schema
+
+    def unload_schema(self):
+        """
+        Stops checking the attributes of config and create.
+        """
+        self.schema = None
+
+    def DescribeType(self, objecttype):
+        # The API's description of an object type ("" if it cannot describe it).
+        return self.Exec("::cta::describe", objecttype)
+
+    #==============================================================================
+    def enable_cache(self, maxsize=10000, ttl=None, exclude_attributes=(), exclude_handles=(), mutating_commands=None):
+        """
+        Description
+            Caches the results of get, with write-through invalidation.
+
+        Syntax
+            cta.enable_cache([maxsize=10000], [ttl=<seconds>], [exclude_attributes=<patterns>],
+                             [exclude_handles=<patterns>], [mutating_commands=<commands>])
+
+        Comments
+            Results are cached by handle (or DDN path) and attribute names. When the cache 
+            is full, the least recently used result is evicted. 'ttl' optionally limits 
+            how long (in seconds) a result may be served from the cache.
+            -'exclude_attributes' and 'exclude_handles' are lists of (case-insensitive)
+             fnmatch patterns for results that must never be cached, such as live 
+             statistics (eg: ["*stats*", "resultdataset*"]).
+            -config, create and delete invalidate the results for the object and its DDN 
+             subtree and ancestors. Results that were retrieved with a DDN path or a DAN 
+             attribute path are also invalidated by every change, since they may refer to 
+             the changed object by another name. delete, and config with a DDN path
+             or a DAN attribute (which may change an object under another name),
+             clear the whole cache.
+            -perform clears the whole cache, unless 'mutating_commands' is given. In that 
+             case, only the listed commands clear the cache.
+            -Calling enable_cache again replaces the cache (and its statistics).
+
+        Return Value
+            None.
+
+        Example
+            cta.enable_cache(maxsize=5000, exclude_attributes=["*stat*"], mutating_commands=["CtsLoadTestSuite"])
+        """
+        self.disable_cache()
+        self.cache = CtaAttributeCache(maxsize, ttl, exclude_attributes, exclude_handles, mutating_commands)
+        self.listeners = list(self.listeners) + [self.cache]
+        return
+
+    def disable_cache(self):
+        """
+        Stops caching the results of get, and discards the cache.
+        """
+        if self.cache is not None:
+            self.listeners = [listener for listener in self.listeners if listener is not self.cache]
+            self.cache = None
+        return
+
+    def invalidate(self, handle=None):
+        """
+        Discards the cached results for the handle (or DDN path) and its subtree, or
+        the whole cache if no handle is specified.
+        """
+        if self.cache is not None:
+            if handle is None:
+                self.cache.Clear()
+            else:
+                self.cache.Invalidate(handle)
+        return
+
+    def cache_stats(self):
+        """
+        Returns a dictionary of cache statistics: size, hits, misses, stores, evictions,
+        expirations and invalidations. Returns None if the cache is not enabled.
+        """
+        if self.cache is None:
+            return None
+        return self.cache.Statistics()
+
+    #==============================================================================
+    def record(self, path, reads=True):
+        """
+        Description
+            Records the Tcl commands sent to the interpreter as a Tcl script (journal),
+            which replay() can run again.
+
+        Syntax
+            cta.record(<path>, [reads=True])
+
+        Comments
+            Every command that Exec evaluates is written to the journal, until 
+            stop_recording() is called (or the "with" block exits).
+            -Handles returned by the commands (eg: by stc::create, stc::reserve, 
+             or in the result of stc::perform) are replaced by Tcl variables in the
+             later commands, so that the journal also works when the handles are 
+             numbered differently.
+            -Commands that failed while recording are replayed inside "catch", so
+             they do not stop the replay.
+            -If 'reads' is False, the commands that only read values (stc::get) are
+             not recorded.
+            -The journal is a single Tcl procedure, so it is compiled once and runs
+             without any Python overhead.
+
+        Return Value
+            CtaRecorder object.
+
+        Example
+            with cta.record("session.tcl"):
+                test = cta.create("test", under=project)
+                cta.config(test, name="Test1")
+        """
+        self.stop_recording()
+        self.recorder = CtaRecorder(self, path, reads)
+        return self.recorder
+
+    def stop_recording(self):
+        """
+        Stops recording, and completes the journal file.
+        """
+        if self.recorder is not None:
+            recorder = self.recorder
+            self.recorder = None
+            recorder.Close()
+        return
+
+    @_command
+    def replay(self, path, stop_on_error=True):
+        """
+        Description
+            Runs a journal recorded by record(), in one evaluation.
+
+        Syntax
+            cta.replay(<path>, [stop_on_error=True])
+
+        Comments
+            If 'stop_on_error' is True, the replay stops at the first command that
+            fails (other than those that also failed while recording), and the
+            error is raised. Otherwise the failures are counted.
+            -Use benchmarks/replay.py to replay a journal against the stand-in
+             package, for timing analysis.
+
+        Return Value
+            Dictionary with the number of "commands", the number of "errors" and
+            the time taken in "seconds".
+
+        Example
+            print(cta.replay("session.tcl"))
+        """
+        self.Exec("source", path)
+        self.Exec("set", "::cta::replayerrors", "0")
+
+        start = _perf_counter()
+        commands = self.Exec("::cta::journal", int(bool(stop_on_error)))
+        seconds = _perf_counter() - start
+
+        return {"commands": int(commands), "errors": int(self.Exec("set", "::cta::replayerrors")), "seconds": seconds}
+
+    #==============================================================================
+    def enable_metrics(self, slow_threshold=None, buckets=None):
+        """
+        Description
+            Records the time taken by each call, split by phase.
+
+        Syntax
+            cta.enable_metrics([slow_threshold=<seconds>], [buckets=<seconds>])
+
+        Comments
+            The public methods are timed by method name and, for perform and 
+            perform_async, by command name. Each call is split into phases:
+                encode - building the Tcl arguments, before the first Tcl evaluation
+                eval   - Tcl evaluation (the stc:: commands)
+                decode - converting the results (eg: List2Dict), after the evaluation
+                log    - writing the DEBUG log messages
+            The Tcl evaluations are also timed by Tcl command (eg: stc::get, or
+            ::cta::batch for a batch).
+            -Times are kept in histograms with the 'buckets' upper bounds (seconds).
+            -Calls that take longer than 'slow_threshold' seconds are logged as 
+             warnings, with their phase times.
+            -When metrics are not enabled, the cost is one attribute check per call.
+             Calling enable_metrics again discards the recorded metrics.
+
+        Return Value
+            None.
+
+        Example
+            cta.enable_metrics(slow_threshold=5)
+            ...
+            print(cta.metrics_snapshot("prometheus"))
+        """
+        self.metrics = CtaMetrics(slow_threshold, buckets)
+        return
+
+    def disable_metrics(self):
+        """
+        Stops recording metrics, and discards the recorded metrics.
+        """
+        self.metrics = None
+        return
+
+    def metrics_snapshot(self, format="dict"):
+        """
+        Description
+            Returns the recorded metrics.
+
+        Syntax
+            cta.metrics_snapshot([format="dict"])
+
+        Comments
+            'format' is "dict", "json" or "prometheus" (the Prometheus text exposition
+            format, with cta_call_duration_seconds and cta_tcl_eval_seconds histograms
+            and a cta_call_errors_total counter).
+
+        Return Value
+            Dictionary, or a string for "json" and "prometheus". None if metrics are
+            not enabled.
+
+        Example
+            open("metrics.prom", "w").write(cta.metrics_snapshot("prometheus"))
+        """
+        if self.metrics is None:
+            return None
+
+        if format == "dict":
+            return self.metrics.Snapshot()
+        elif format == "json":
+            return json.dumps(self.metrics.Snapshot(), indent=2, sort_keys=True)
+        elif format == "prometheus":
+            return self.metrics.Prometheus()
+        else:
+            raise ValueError("unknown metrics format: " + str(format))
+
+    #==============================================================================
+    def submit(self, method, *args, **kwargs):
+        """
+        Description
+            Queues a call to a public method and returns a Future for its result.
+
+        Syntax
+            cta.submit(<methodName>, [<argument>, ...])
+
+        Comments
+            In threaded mode, the call is queued for the worker thread and submit 
+            returns immediately. Otherwise, the call is made before submit returns.
+            The submit_<method> methods (eg: submit_get) are shortcuts for submit.
+            -Calls that are queued together may be coalesced by the worker thread:
+             identical get calls are made once and share the result, and consecutive 
+             config calls on the same handle are sent as one stc::config. If the 
+             combined config fails, the calls are retried one at a time so that 
+             each Future gets its own result.
+
+        Return Value
+            concurrent.futures.Future
+
+        Example
+            future = cta.submit("get", port, "status")
+            future = cta.submit_perform("CtsRunTest", session=session)
+            result = future.result()
+        """
+        function = getattr(CtaPython, method)
+        if self.worker is not None:
+            return self.worker.Submit(method, function, self, args, kwargs)
+
+        future = Future()
+        future.set_running_or_notify_cancel()
+        try:
+            future.set_result(function(self, *args, **kwargs))
+        except Exception as errmsg:
+            future.set_exception(errmsg)
+
+        return future
+
+    def submit_config(self, objecthandle, **kwargs):
+        return self.submit("config", objecthandle, **kwargs)
+
+    def submit_get(self, objecthandle, *args):
+        return self.submit("get", objecthandle, *args)
+
+    def submit_get_many(self, handles, attributes=None, numpy=False):
+        return self.submit("get_many", handles, attributes, numpy)
+
+    def submit_perform(self, command, **kwargs):
+        return self.submit("perform", command, **kwargs)
+
+    def submit_connect(self, ipAddress):
+        return self.submit("connect", ipAddress)
+
+    def submit_create(self, objecttype, under, **kwargs):
+        return self.submit("create", objecttype, under, **kwargs)
+
+    def submit_delete(self, handle):
+        return self.submit("delete", handle)
+
+    def submit_disconnect(self, ipAddress):
+        return self.submit("disconnect", ipAddress)
+
+    def submit_release(self, location):
+        return self.submit("release", location)
+
+    def submit_reserve(self, location):
+        return self.submit("reserve", location)
+
+    #==============================================================================
+    def batch(self, stop_on_error=True):
+        """
+        Description
+            Returns a batch that queues config, create, delete, perform and get calls,
+            and sends them to the Tcl interpreter as a single script.
+
+        Syntax
+            cta.batch([stop_on_error=True])
+
+        Comments
+            The batch methods have the same arguments as the CtaPython methods, but
+            return a CtaBatchOperation instead of the result. The result is available
+            from the operation (op.result) once the batch has been executed.
+            -Used as a context manager, the batch is executed when the "with" block
+             exits without an exception. Otherwise, call batch.execute().
+            -An operation can be passed as the handle, parent or attribute value of a
+             later operation in the same batch. It is replaced by the result of the
+             earlier operation when the script runs. DDN paths can be built with "+".
+            -When an operation fails, a CtaBatchError is raised that identifies the
+             failed operation. If 'stop_on_error' is True (the default), the following
+             operations are not executed.
+
+        Return Value
+            CtaBatch object.
+
+        Example
+            with cta.batch() as b:
+                test = b.create("tests", under=project, name="Test1")
+                b.config(test + ".userprofile", dnsRetries=10)
+            print(test.result)
+        """
+        return CtaBatch(self, stop_on_error)
+
+    #==============================================================================
+    @_command
+    def subscribe(self, side, viewAttributesList):
+        """
+        Description
+            Subscribes to view the list of runtime statistics that users specify.
+            
+        Syntax
+            cta.subscribe(<side>, <viewAttributesList>)
+            
+        Comments
+            Subscribes to view runtime statistics for those that user specifies as 
+            viewAttributesList. The attribute names should be one of the supported 
+            statistics names, for example, http,successfulConns or http,attemptedConns. 
+            Wildcards are also supported, such as http*. Please refer to Appendix A. 
+            List of Runtime Statistics for full list of runtime statistics.
+            -Use cta.stream to receive the statistics as they change.
+        
+        Return Value
+            Returns the handle to the ResultDataSet object, which consists of the 
+            ResultDataObject with statistics values. By default, the returned 
+            ResultDataSet will only contain the latest actual values. In order to 
+            obtain the values from a specific point in time during the test run, user
+            must add the 'all' keyword to the list of viewAttributesList. See Runtime 
+            statistics for more information.
+
+        Example            
+            cta.subscribe("client", ["http,successfulConns", "http,attemptedConns"])
+            cta.subscribe("server", "http*")
+        """      
+        if isinstance(viewAttributesList, str):
+            viewAttributesList = [viewAttributesList]
+
+        resultdataset = self.Exec("stc::subscribe", side, tuple(viewAttributesList))
+        return resultdataset
+
+    #==============================================================================
+    @_command
+    def unsubscribe(self, handle):
+        """
+        Description
+            Removes a subscription for the specified ResultDataSet.
+            
+        Syntax
+            cta.unsubscribe(<handle>)
+            
+        Comments
+            The cta.unsubscribe command removes a subscription for the specified handle 
+            of the ResultDataSet object that was returned by the subscribe function.
+            
+        Return Value
+            None. Errors are raised as exceptions, encoded as string values that 
+            describe the error condition.
+            
+        Example
+            cta.unsubscribe(rdsHandle)
+        """
+        result = self.Exec("stc::unsubscribe", handle)
+        return result
+
+    #==============================================================================
+    def stream(self, side, viewAttributesList, interval=1.0, buffer_size=10000, deltas_only=True):
+        """
+        Description
+            Subscribes to runtime statistics, and returns an iterator over the
+            statistics samples as they are polled.
+
+        Syntax
+            cta.stream(<side>, <viewAttributesList>, [interval=1.0], [buffer_size=10000], [deltas_only=True])
+
+        Comments
+            The ResultDataObjects of the subscription are read (with get_many) every 
+            'interval' seconds. Each statistic is returned as a CtaStatSample, with
+            the time of the poll, the ResultDataObject handle, the statistic name and
+            its value (int, float or string).
+            -If 'deltas_only' is True (the default), a statistic is only returned when
+             its value has changed since the previous poll.
+            -In threaded mode, one background thread polls all of the subscriptions, 
+             and the samples wait in a ring buffer of 'buffer_size' samples until they 
+             are read. When the buffer is full, the oldest samples are dropped (and 
+             counted in the 'dropped' attribute). Otherwise, the subscription is 
+             polled when the iterator needs more samples.
+            -Iterating blocks until samples are available. Use samples() to read the
+             samples that are already buffered without waiting.
+            -The subscription is removed by close(), or when the "with" block exits.
+
+        Return Value
+            CtaSubscription object.
+
+        Example
+            with cta.stream("client", ["http*"], interval=5) as stats:
+                for sample in stats:
+                    print(sample.time, sample.attribute, sample.value)
+                    if done():
+                        break
+        """
+        subscription = CtaSubscription(self, side, viewAttributesList, interval, buffer_size, deltas_only)
+
+        if self.worker is not None:
+            if self.poller is None:
+                self.poller = CtaStatPoller()
+                self.poller.start()
+            self.poller.Add(subscription)
+
+        return subscription
+
+    #==============================================================================
+    @_command
+    def waitUntilCommandIsDone(self, requestId=""):
+        """
+        Description
+            Waits until the command specified by the request id is complete.
+            
+        Syntax
+            cta.waitUntilCommandIsDone(<requestId>)
+            
+        Comments
+            This function waits until the command, specified by request id, is out 
+            of the PENDING state and completes its job. This is useful for asynchronous 
+            commands. If the requestId is not specified, then it waits until any 
+            command is completed.
+            -This blocks until the command is complete. Use perform_async and 
+             wait_any/wait_all to wait for many commands at once.
+            
+        Return Value
+            Result of an asynchronous command.
+            Errors are raised as exceptions, encoded as string values that describe the error condition.
+        
+        Example
+            cta.waitUntilCommandIsDone(cta.connect("10.50.70.82", executesynchronous=False))
+
+            CAUTION: "cta.waitUntilCommandIsDone" will time out if the command it waits for does
+            not complete in a certain time.        
+        """
+        if requestId != "":
+            result = self.Exec("stc::waitUntilCommandIsDone", requestId)
+        else:
+            result = self.Exec("stc::waitUntilCommandIsDone")
+
+        return result
+
+    #==============================================================================
+    @_command
+    def perform_async(self, command, timeout=None, **kwargs):
+        """
+        Description
+            Starts a command asynchronously, and returns a Future for its result.
+
+        Syntax
+            cta.perform_async(<command>, [timeout=<seconds>], [[<argument>], [...])
+
+        Comments
+            The command is performed with ExecuteSynchronous=False. The returned 
+            Future has the request id of the command in its 'request_id' attribute.
+            -The requests are completed by wait_any and wait_all, which run the Tcl
+             event loop and check the State of all pending requests in one pass, 
+             every 'poll_interval' seconds (see CtaScheduler). The Future's callbacks
+             (add_done_callback) run on the thread that called wait_any or wait_all.
+            -Call wait_any or wait_all before Future.result(), which only waits for
+             the result and does not run the event loop itself.
+            -If the command has not completed after 'timeout' seconds, the Future 
+             raises CtaRequestTimeout. The command itself is not stopped.
+            -The result is the dictionary that perform returns for the command.
+             Use perform to pass an stc attribute named "timeout".
+
+        Return Value
+            concurrent.futures.Future
+
+        Example
+            tests = [cta.perform_async("CtsRunTest", session=session, timeout=3600) for session in sessions]
+            done, pending = cta.wait_all(tests)
+            for test in done:
+                print(test.request_id, test.result())
+        """
+        if Future is None:
+            raise ImportError("perform_async requires the concurrent.futures module")
+
+        args = [command, "-ExecuteSynchronous", "false"]
+        for key in kwargs:
+            args.append("-" + key)
+            args.append(_tcl_value(kwargs[key]))
+
+        failed = True
+        try:
+            requestid = self.Exec("stc::perform", *args)
+            failed = False
+        finally:
+            if self.listeners:
+                self.NotifyListeners("perform", None, {"command": command, "arguments": kwargs, "failed": failed})
+
+        if self.scheduler is None:
+            self.scheduler = CtaScheduler(self)
+
+        return self.scheduler.Add(requestid, command, timeout)
+
+    def wait_any(self, futures, timeout=None):
+        """
+        Description
+            Waits until at least one of the asynchronous commands is complete.
+
+        Syntax
+            cta.wait_any(<futures>, [timeout=<seconds>])
+
+        Comments
+            'futures' are Futures returned by perform_async. The Tcl event loop runs
+            while waiting, and every pending request (including those that are not
+            in 'futures') is completed as soon as its command is done.
+
+        Return Value
+            A (done, pending) tuple of sets of Futures, like concurrent.futures.wait.
+
+        Example
+            done, pending = cta.wait_any(tests, timeout=60)
+        """
+        return self.WaitRequests(futures, timeout, False)
+
+    def wait_all(self, futures, timeout=None):
+        """
+        Description
+            Waits until all of the asynchronous commands are complete.
+
+        Syntax
+            cta.wait_all(<futures>, [timeout=<seconds>])
+
+        Comments
+            See wait_any.
+
+        Return Value
+            A (done, pending) tuple of sets of Futures, like concurrent.futures.wait.
+            'pending' is empty unless the timeout expired.
+
+        Example
+            done, pending = cta.wait_all(tests)
+        """
+        return self.WaitRequests(futures, timeout, True)
+
+    ###############################################################################
+    ####
+    ####    Private Methods
+    ####
+    ###############################################################################
+
+    def Exec(self, command, *args):
+        # Evaluates the Tcl script 'command'. When 'args' are given, 'command' is a
+        # Tcl command name that is called with 'args' as its arguments. The arguments
+        # are passed as Tcl objects, so they are never parsed or substituted (unless
+        # they are TclExpr objects).
+        worker = self.worker
+        if worker is not None and worker is not threading.current_thread():
+            future = worker.Submit("Exec", CtaPython.Exec, self, (command,) + args, {})
+            if self.timeout is None and self.call_timeouts is None:
+                return future.result()
+            return self.WaitResult(future, worker, "Exec", (command,) + args)
+
+        debug = _root_logger.isEnabledFor(logging.DEBUG)
+        metrics = self.metrics
+
+        if args:
+            for arg in args:
+                if isinstance(arg, TclExpr):
+                    # Raw Tcl must be substituted, so fall back to evaluating a script.
+                    command = command + " " + " ".join([_tcl_format(arg) for arg in args])
+                    args = ()
+                    break
+
+        if debug:
+            if metrics is not None:
+                start = _perf_counter()
+
+            if args:
+                logging.debug(" - Tcl command - %s", self.LogText(command + " " + " ".join([_tcl_format(arg) for arg in args])))
+            else:
+                logging.debug(" - Tcl command - %s", self.LogText(command))
+
+            if metrics is not None:
+                metrics.AddLog(start)
+
+        if metrics is not None:
+            start = metrics.StartEval()
+
+        watchdog = self.watchdog
+        if watchdog is not None:
+            watchdog.running = (command, args, _monotonic())
+
+        try:
+            if args:
+                result = self.tcl.call(command, *args)
+            else:
+                result = self.tcl.eval(command)
+
+        except Exception as errmsg:
+            if watchdog is not None:
+                watchdog.running = None
+            if metrics is not None:
+                metrics.EndEval(command, start)
+            if self.recorder is not None:
+                self.recorder.Record(command, args, None, errmsg)
+
+            error = self.ClassifyError(errmsg, command, args)
+            if self.retries is not None and self.RetryDelay(error, 0) is not None:
+                # It will be retried: Retry and RetryCall log the final failure as an error.
+                logging.warning(error)
+            else:
+                logging.error(error)
+            if error is errmsg:
+                raise
+            if self.retries is not None and not self.retrying and self.worker is None:
+                return self.Retry(error, command, args)
+            raise error
+
+        if watchdog is not None:
+            watchdog.running = None
+        if metrics is not None:
+            metrics.EndEval(command, start)
+        if self.recorder is not None:
+            self.recorder.Record(command, args, result, None)
+
+        if debug:
+            if metrics is not None:
+                start = _perf_counter()
+
+            logging.debug(" - Tcl result  - %s", self.LogText(result))
+
+            if metrics is not None:
+                metrics.AddLog(start)
+
+        return result
+
+    #==============================================================================
+    def List2Dict(self, result):
+        # Converts a Tcl list of "-key value" pairs into a Python dictionary.
+        # The list is split natively by the Tcl library, so values containing
+        # quotes, braces or brackets are returned exactly as Tcl holds them.
+        items = self.tcl.splitlist(result)
+
+        if len(items) % 2:
+            # Tcl's "foreach {key value}" pads a missing final value with "".
+            items = items + ("",)
+
+        convert = self.Tcl2Python
+        result_dict = {}
+        for index in range(0, len(items), 2):
+            key = items[index]
+            if key[:1] == "-":
+                key = key[1:]
+
+            result_dict[key] = convert(items[index + 1])
+
+        return result_dict
+
+    #==============================================================================
+    def Tcl2Python(self, value):
+        # Converts a single Tcl value (string) into an int or float if it is
+        # numeric, otherwise the string is returned unchanged.
+        if not value or value[0] not in _NUMBER_START:
+            return value
+
+        match = _NUMBER_PATTERN.match(value)
+        if match is None:
+            return value
+        elif match.lastindex == 1:
+            # Leading zeros are decimal, not octal (eg: "007" is 7).
+            return int(value, 10)
+        elif match.lastindex == 2:
+            return float(value)
+        else:
+            return int(value, 0)
+
+    #==============================================================================
+    def NumericColumn(self, column):
+        # Converts a get_many column to a NumPy array if all of its values (except
+        # the None values of failed handles) are numbers. Otherwise, the column is
+        # returned unchanged.
+        import numpy
+
+        values = [value for value in column if value is not None]
+        if not values:
+            return column
+
+        for value in values:
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                return column
+
+        if len(values) == len(column) and all([isinstance(value, int) for value in values]):
+            try:
+                return numpy.array(column, dtype=numpy.int64)
+            except OverflowError:
+                # Counters beyond the int64 range (eg: 64-bit unsigned).
+                pass
+
+        return numpy.array([numpy.nan if value is None else value for value in column], dtype=numpy.float64)
+
+    #==============================================================================
+    def LogCommand(self, methodname, argnames, args, kwargs):
+        """
+        Log the calling method to the log, including its arguments.
+        Only called (by the _command decorator) when DEBUG logging is enabled.
+        """        
+        # Output the command in a format that looks like normal Python syntax.
+        named = list(zip(argnames, args))
+        if len(args) > len(argnames):
+            # The extra positional arguments (*args) are logged as a tuple.
+            named.append(("args", args[len(argnames):]))
+
+        arguments = []
+        for key, value in named + list(kwargs.items()):
+            if value == "":
+                value = '""'
+
+            arguments.append(key + "=\"" + str(value) + "\"")
+
+        logging.debug(" - Python command - %s", self.LogText(methodname + "(" + ", ".join(arguments) + ")"))
+        return                
+
+    #==============================================================================
+    def WaitRequests(self, futures, timeout, all_completed):
+        # Runs the scheduler until one (or all) of the futures are done, or the timeout expires.
+        futures = set(futures)
+        deadline = None if timeout is None else _monotonic() + timeout
+
+        while True:
+            done = set([future for future in futures if future.done()])
+            pending = futures - done
+            if not pending or (done and not all_completed):
+                return done, pending
+
+            if deadline is None:
+                remaining = None
+            else:
+                remaining = deadline - _monotonic()
+                if remaining <= 0:
+                    return done, pending
+
+            self.scheduler.RunOnce(remaining)
+
+    #==============================================================================
+    def ResolvePath(self, path):
+        # Returns the handle of a DDN path (eg: "project1.test(2).userprofile"), resolving
+        # the path with one ::cta::resolve call the first time it is used.
+        if "." not in path:
+            return path
+
+        paths = self.paths
+        key = path.lower()
+        handle = paths.handles.get(key) if paths is not None else None
+        if handle is not None:
+            return handle
+
+        elements = path.split(".")
+        arguments = []
+        for element in elements[1:]:
+            match = _DDN_ELEMENT_PATTERN.match(element)
+            if match is None:
+                # Not a DDN path that can be resolved here. Let the API resolve it.
+                return path
+            arguments += [match.group(1), int(match.group(2) or 1)]
+
+        handle = self.Exec("::cta::resolve", elements[0], tuple(arguments))
+        if paths is not None:
+            paths.resolutions += 1
+            paths.handles[key] = handle
+
+        return handle
+
+    #==============================================================================
+    def ClassifyError(self, errmsg, command, args):
+        # Returns the CtaError for a Tcl error, with the ::errorCode and ::errorInfo
+        # of the failed command. Other exceptions are returned unchanged.
+        if not isinstance(errmsg, TclError) or isinstance(errmsg, CtaError):
+            return errmsg
+
+        message = str(errmsg)
+        try:
+            error_code = self.tcl.splitlist(self.tcl.getvar("::errorCode"))
+            error_info = self.tcl.getvar("::errorInfo")
+        except Exception:
+            error_code = ()
+            error_info = None
+
+        if args:
+            command = command + " " + " ".join([_tcl_format(arg) for arg in args])
+
+        return _classify_error(message, command, error_code, error_info)
+
+    def Retry(self, error, command, args):
+        # Sends a failed command again, as the retry policy for its error allows.
+        # In threaded mode, RetryCall retries the whole call instead.
+        self.retrying = True
+        try:
+            attempt = 0
+            while True:
+                delay = self.RetryDelay(error, attempt)
+                if delay is None:
+                    if attempt:
+                        logging.error("Failed after %d retries: %s", attempt, error)
+                    raise error
+
+                attempt += 1
+                logging.warning("Retrying in %.2f s (retry %d): %s", delay, attempt, error)
+                time.sleep(delay)
+                try:
+                    return self.Exec(command, *args)
+                except CtaError as errmsg:
+                    error = errmsg
+        finally:
+            self.retrying = False
+
+    def RetryCall(self, future, methodname, function, args, kwargs):
+        # Threaded mode: waits for a call, and queues it again if it fails with an
+        # error that its retry policy allows. The delay is spent on the calling
+        # thread, so the worker thread runs the other calls meanwhile, and each
+        # attempt has its own call timeout.
+        attempt = 0
+        while True:
+            try:
+                return self.WaitResult(future, self.worker, methodname, args)
+            except CtaTimeoutError:
+                raise
+            except CtaError as error:
+                delay = self.RetryDelay(error, attempt) if self.retries is not None else None
+                if delay is None:
+                    if attempt:
+                        logging.error("Failed after %d retries: %s", attempt, error)
+                    raise
+
+                attempt += 1
+                logging.warning("Retrying %s in %.2f s (retry %d): %s", methodname, delay, attempt, error)
+                time.sleep(delay)
+                future = self.worker.Submit(methodname, function, self, args, kwargs)
+
+    def RetryDelay(self, error, attempt):
+        # Returns the delay before retry number 'attempt' + 1, or None if the error
+        # must not be retried (again).
+        for errorclass in type(error).__mro__:
+            policy = self.retries.get(errorclass)
+            if policy is not None:
+                if attempt >= policy.attempts:
+                    return None
+                return min(policy.delay * policy.backoff ** attempt, policy.max_delay)
+
+        return None
+
+    def WaitResult(self, future, worker, methodname, args):
+        # Waits for a call queued for the worker thread, for at most the call timeout.
+        timeout = self.timeout
+        if self.call_timeouts is not None:
+            timeout = getattr(self.call_timeouts, "timeout", timeout)
+
+        if timeout is None:
+            return future.result()
+
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            pass
+
+        call = methodname + "(" + ", ".join([repr(arg) for arg in args]) + ")"
+        current = worker.current
+        if future.cancel():
+            # Still queued behind another call, which is stuck if it has also run
+            # for longer than the timeout.
+            command = None
+            stuck = current is not None and _monotonic() - current[1] >= timeout
+        elif future.done():
+            return future.result()
+        else:
+            command = call
+            stuck = True
+            watchdog = self.watchdog
+            running = watchdog.running if watchdog is not None else None
+            if running is not None:
+                command = running[0] + " " + " ".join([_tcl_format(arg) for arg in running[1]])
+
+        respawned = False
+        if stuck and self.on_timeout == "respawn":
+            respawned = self.Respawn(worker, current[0].methodname if current is not None else methodname)
+
+        raise CtaTimeoutError(call, timeout, command, respawned)
+
+    def Respawn(self, worker, methodname):
+        # Replaces a stuck worker thread and its interpreter. The stuck call is left
+        # to finish (or not) on the old thread. Returns False if another caller has
+        # already replaced it.
+        with _startup_lock:
+            if self.worker is not worker:
+                return False
+
+            logging.error("The Tcl interpreter is stuck in %s. Starting a new interpreter...", methodname)
+            replacement = CtaWorker()
+            replacement.start()
+            worker.Abandon(replacement)
+
+            self.worker = replacement
+            self.__dict__.pop("tcl", None)
+            self.startup = None
+
+            scheduler = self.scheduler
+            self.scheduler = None
+
+        if scheduler is not None:
+            scheduler.Abandon(CtaTimeoutError("the interpreter was replaced", None, None, True))
+
+        if self.listeners:
+            # Everything that the listeners know about the old session is gone.
+            self.NotifyListeners("batch", None, {"commands": [], "failed": True})
+
+        self.start()
+        return True
+
+    def NotifyListeners(self, event, handle, details):
+        """
+        Tell the listeners (eg: the attribute cache) that a call may have changed the data model.
+
+        'event' is "config", "create", "delete", "perform" or "batch". 'handle' is the object that
+        was changed (or created), and 'details' is a dictionary with the other arguments of the call.
+        details["failed"] is True if the call raised an exception (it may still have changed something).
+        """
+        for listener in self.listeners:
+            listener.ObjectChanged(event, handle, details)
+        return
+
+###############################################################################
+####
+####    Errors
+####
+###############################################################################
+
+class CtaError(TclError):
+    """
+    Raised when a Tcl command fails. The subclasses identify the kind of error.
+
+    'command' is the Tcl command that failed, 'error_code' the Tcl ::errorCode
+    (as a tuple) and 'error_info' the Tcl ::errorInfo (stack trace). 'details' are
+    the fields of an "STC <CLASS> ..." error code after the class (eg: the handle).
+    'transient' is True for errors that may succeed if the command is retried.
+    """
+    transient = False
+
+    def __init__(self, message, command=None, error_code=(), error_info=None):
+        TclError.__init__(self, message)
+        self.command = command
+        self.error_code = tuple(error_code)
+        self.error_info = error_info
+
+    @property
+    def details(self):
+        if len(self.error_code) > 1 and self.error_code[0] in ("STC", "CTA"):
+            return self.error_code[2:]
+        return ()
+
+class CtaInvalidHandleError(CtaError):
+    """
+    The handle (or DDN path) does not refer to an object.
+    """
+
+class CtaInvalidAttributeError(CtaError):
+    """
+    The object has no attribute with this name (or DAN path).
+    """
+
+class CtaInvalidValueError(CtaError):
+    """
+    The value is not valid for the attribute, or is missing.
+    """
+
+class CtaUnknownCommandError(CtaError):
+    """
+    The command (or object type) does not exist.
+    """
+
+class CtaLicenseError(CtaError):
+    """
+    A license is missing or has expired.
+    """
+
+class CtaChassisUnreachableError(CtaError):
+    """
+    The chassis did not respond (or refused the connection).
+    """
+    transient = True
+
+class CtaNotConnectedError(CtaError):
+    """
+    The session is not connected to the chassis.
+    """
+
+class CtaPortBusyError(CtaError):
+    """
+    The port is reserved by another session.
+    """
+    transient = True
+
+class CtaPortNotReservedError(CtaError):
+    """
+    The port is not reserved by this session.
+    """
+
+class CtaCommandFailedError(CtaError):
+    """
+    A command (eg: run by stc::perform) ran, but ended in failure.
+    """
+
+class CtaTimeoutError(CtaError):
+    """
+    Raised when a call does not complete within its timeout (see the 'timeout'
+    argument of CtaPython).
+
+    'call' is the call that timed out, 'timeout' the timeout in seconds, 'command'
+    the Tcl command that was running (None if the call was cancelled while still 
+    queued) and 'respawned' whether the interpreter was replaced.
+    """
+    def __init__(self, call, timeout, command, respawned):
+        if timeout is None:
+            message = call
+        else:
+            message = call + " did not complete within " + str(timeout) + " seconds"
+        if command is not None and command != call:
+            message += " (running: " + command + ")"
+        if respawned:
+            message += "; the interpreter was replaced"
+
+        CtaError.__init__(self, message, command=command)
+        self.call = call
+        self.timeout = timeout
+        self.respawned = respawned
+
+# The error classes by "STC <CLASS> ..." error code, and the patterns of the error
+# messages that identify them when there is no such error code. The patterns are
+# tried in this order.
+_ERROR_CLASSES = (
+    ("INVALID_HANDLE", CtaInvalidHandleError, r"invalid handle|invalid object|no such object|object .* does not exist"),
+    ("INVALID_ATTRIBUTE", CtaInvalidAttributeError, r"invalid attribute|unknown attribute|no such attribute|attribute .* does not exist"),
+    ("INVALID_VALUE", CtaInvalidValueError, r"invalid value|missing value|expected (?:integer|boolean|floating)|out of range|invalid port location"),
+    ("UNKNOWN_COMMAND", CtaUnknownCommandError, r"invalid command name|unknown command|invalid object type|unknown object type"),
+    ("LICENSE", CtaLicenseError, r"licen[cs]e"),
+    ("CHASSIS_UNREACHABLE", CtaChassisUnreachableError, r"unreachable|connection (?:refused|timed out|reset)|(?:unable|failed) to connect"),
+    ("NOT_CONNECTED", CtaNotConnectedError, r"not connected"),
+    ("PORT_BUSY", CtaPortBusyError, r"already reserved|reserved by|port .* (?:busy|in use)"),
+    ("PORT_NOT_RESERVED", CtaPortNotReservedError, r"not reserved"),
+    ("COMMAND_FAILED", CtaCommandFailedError, r"command failed"),
+)
+
+_ERROR_CODES = dict([(code, errorclass) for code, errorclass, pattern in _ERROR_CLASSES])
+_ERROR_PATTERN = re.compile("|".join(["(?P<" + code + ">" + pattern + ")" for code, errorclass, pattern in _ERROR_CLASSES]), re.IGNORECASE)
+
+def _classify_error(message, command, error_code, error_info=None):
+    # Returns the CtaError (subclass) for the message and ::errorCode of a Tcl error.
+    errorclass = None
+    if len(error_code) > 1 and error_code[0] in ("STC", "CTA"):
+        errorclass = _ERROR_CODES.get(error_code[1])
+    if errorclass is None:
+        match = _ERROR_PATTERN.search(message)
+        errorclass = _ERROR_CODES[match.lastgroup] if match is not None else CtaError
+
+    return errorclass(message, command, error_code, error_info)
+
+# The errors that enable_retries retries by default.
+_TRANSIENT_ERRORS = [errorclass for code, errorclass, pattern in _ERROR_CLASSES if errorclass.transient]
+
+#==============================================================================
+class CtaRetry(object):
+    """
+    A retry policy (see CtaPython.enable_retries): a failed command is retried up
+    to 'attempts' times, after 'delay' seconds, multiplied by 'backoff' after
+    each retry (up to 'max_delay').
+    """
+    def __init__(self, attempts=3, delay=1.0, backoff=2.0, max_delay=60.0):
+        self.attempts = attempts
+        self.delay = delay
+        self.backoff = backoff
+        self.max_delay = max_delay
+
+    def __repr__(self):
+        return "CtaRetry(attempts=" + str(self.attempts) + ", delay=" + str(self.delay) + ", backoff=" + str(self.backoff) + ", max_delay=" + str(self.max_delay) + ")"
+
+###############################################################################
+####
+####    Threaded Mode
+####
+###############################################################################
+
+def _close_at_exit(reference):
+    # Stops the worker thread of a threaded CtaPython object (if it still exists).
+    cta = reference()
+    if cta is not None:
+        cta.close()
+
+#==============================================================================
+class CtaWorkItem(object):
+    """
+    A call queued for the CtaWorker thread, and the Future(s) waiting for its result.
+    """
+    __slots__ = ("methodname", "function", "cta", "args", "kwargs", "futures", "merged", "running")
+
+    def __init__(self, methodname, function, cta, args, kwargs, future):
+        self.methodname = methodname
+        self.function = function
+        self.cta = cta
+        self.args = args
+        self.kwargs = kwargs
+        self.futures = [future]
+        # The original items of a coalesced config call.
+        self.merged = None
+        # True once the cancelled callers are dropped and the others' Futures are running.
+        self.running = False
+
+#==============================================================================
+class CtaWorker(threading.Thread):
+    """
+    The thread that owns the Tcl interpreter of a CtaPython object in threaded mode.
+    Calls are queued from any thread and run in order on this thread.
+    """
+    def __init__(self):
+        threading.Thread.__init__(self, name="CtaWorker")
+        self.daemon = True
+        self.queue = queue.Queue()
+        self.tcl = None
+
+        # The item that is running, and when it started.
+        self.current = None
+        # The worker that took over when this one got stuck (see Abandon).
+        self.replacement = None
+
+    def Submit(self, methodname, function, cta, args, kwargs):
+        """
+        Queues function(cta, *args, **kwargs) and returns its Future.
+        """
+        if self.replacement is not None:
+            return self.replacement.Submit(methodname, function, cta, args, kwargs)
+
+        future = Future()
+        self.queue.put(CtaWorkItem(methodname, function, cta, args, kwargs, future))
+        return future
+
+    def Abandon(self, replacement):
+        """
+        Hands the queued calls to 'replacement'. This thread exits (and deletes its
+        interpreter) when its current call returns.
+        """
+        self.replacement = replacement
+        self.queue.put(None)
+
+    def Stop(self):
+        """
+        Stops the thread once the calls already queued are complete.
+        """
+        self.queue.put(None)
+        if self is not threading.current_thread():
+            self.join()
+
+    #==============================================================================
+    def run(self):
+        while True:
+            items = [self.queue.get()]
+
+            # Take everything else that is already queued, so that it can be coalesced.
+            while True:
+                try:
+                    items.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in items
+            for item in self.Coalesce([item for item in items if item is not None]):
+                if self.replacement is not None:
+                    self.replacement.queue.put(item)
+                    continue
+                self.Run(item)
+
+            if self.replacement is not None:
+                # Anything queued after the items above.
+                while True:
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not None:
+                        self.replacement.queue.put(item)
+
+            if stop:
+                # Delete the interpreter on this thread.
+                self.tcl = None
+                return
+
+    def Run(self, item, futures=None):
+        if futures is None:
+            futures = item.futures
+
+        self.current = (item, _monotonic())
+        try:
+            result = item.function(item.cta, *item.args, **item.kwargs)
+
+        except Exception as errmsg:
+            self.current = None
+            if item.merged:
+                # Retry the original config calls one at a time, so that each caller
+                # gets its own result.
+                for original in item.merged:
+                    self.Run(original, [future for future in original.futures if future in futures])
+                return
+
+            for future in futures:
+                future.set_exception(errmsg)
+            return
+
+        self.current = None
+        for index, future in enumerate(futures):
+            if index > 0 and isinstance(result, dict):
+                # Coalesced get calls each get their own copy of a dictionary result.
+                result = dict(result)
+            future.set_result(result)
+
+    def Coalesce(self, items):
+        # Identical get calls, with no other call between them, are made once.
+        # Consecutive config calls on the same handle, with no TclExpr values, are
+        # combined into one call. Everything else is run as it is, in order.
+        coalesced = []
+        gets = {}
+        for item in items:
+            if not item.running:
+                # Skip the callers that have cancelled their Future before anything is
+                # merged, so that their values are never sent.
+                item.futures = [future for future in item.futures if future.set_running_or_notify_cancel()]
+                item.running = True
+                if not item.futures:
+                    continue
+
+            if item.methodname == "get":
+                key = (item.cta, item.args)
+                if key in gets:
+                    gets[key].futures += item.futures
+                    continue
+
+                gets[key] = item
+                coalesced.append(item)
+                continue
+
+            gets = {}
+            previous = coalesced[-1] if coalesced else None
+            if (item.methodname == "config" and previous is not None and previous.methodname == "config"
+                    and previous.cta is item.cta and previous.args == item.args and self.CanMerge(item)):
+                if previous.merged is None:
+                    if not self.CanMerge(previous):
+                        coalesced.append(item)
+                        continue
+
+                    merged = CtaWorkItem("config", previous.function, previous.cta, previous.args, dict(previous.kwargs), None)
+                    merged.futures = list(previous.futures)
+                    merged.merged = [previous]
+                    merged.running = True
+                    coalesced[-1] = previous = merged
+
+                previous.kwargs.update(item.kwargs)
+                previous.futures += item.futures
+                previous.merged.append(item)
+                continue
+
+            coalesced.append(item)
+
+        return coalesced
+
+    def CanMerge(self, item):
+        for value in item.kwargs.values():
+            if isinstance(value, TclExpr) or (isinstance(value, str) and value[:1] == "["):
+                return False
+
+        return True
+
+#==============================================================================
+class CtaWatchdog(threading.Thread):
+    """
+    Reports the Tcl commands that run for longer than a threshold. See 
+    CtaPython.enable_watchdog.
+    """
+    def __init__(self, cta, threshold, interval=None):
+        threading.Thread.__init__(self, name="CtaWatchdog")
+        self.daemon = True
+        self.cta = cta
+        self.threshold = threshold
+        self.interval = interval if interval is not None else max(threshold / 10.0, 0.01)
+
+        # (command, args, start) of the Tcl command being evaluated (set by Exec).
+        self.running = None
+        self.reports = deque(maxlen=100)
+        self.stopped = threading.Event()
+
+    def Stop(self):
+        self.stopped.set()
+        if self is not threading.current_thread():
+            self.join()
+
+    def run(self):
+        reported = None
+        next_report = 0.0
+        while not self.stopped.wait(self.interval):
+            running = self.running
+            if running is None:
+                continue
+
+            seconds = _monotonic() - running[2]
+            if seconds < self.threshold or (running is reported and seconds < next_report):
+                continue
+
+            reported = running
+            next_report = seconds + self.threshold
+
+            command, args = running[0], running[1]
+            if args:
+                command = command + " " + " ".join([_tcl_format(arg) for arg in args])
+            command = str(self.cta.LogText(command))
+
+            logging.warning("Stuck call: %s has been running for %.1f s", command, seconds)
+            self.reports.append({"time": time.time(), "command": command, "seconds": seconds})
+
+###############################################################################
+####
+####    Logging
+####
+###############################################################################
+
+# Log message arguments that are safe to format later, on the log writer thread.
+_IMMUTABLE_TYPES = (str, bytes, int, float, bool, type(None))
+
+if hasattr(logging.handlers, "QueueHandler"):
+    class CtaQueueHandler(logging.handlers.QueueHandler):
+        """
+        Queues log records for the log writer thread (see the log_queue argument).
+
+        The standard QueueHandler formats the message on the calling thread. Here,
+        the message is only formatted on the calling thread when its arguments are
+        mutable (eg: a result dictionary). Tcl commands and results are strings, so
+        the listener's handler formats them.
+        """
+        def prepare(self, record):
+            if record.args and not all([isinstance(arg, _IMMUTABLE_TYPES) for arg in record.args]):
+                # The arguments may be changed by the caller after the record is queued.
+                record.msg = record.getMessage()
+                record.args = None
+            if record.exc_info:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+                record.exc_info = None
+            return record
+
+###############################################################################
+####
+####    Recording
+####
+###############################################################################
+
+class CtaRecorder(object):
+    """
+    Writes the Tcl commands evaluated by CtaPython.Exec to a journal file. See
+    CtaPython.record.
+    """
+    # Handles look like an object type followed by a number (eg: port12).
+    HANDLE_PATTERN = re.compile(r"[A-Za-z_][\w:]*\d\Z")
+
+    # Commands whose results may be new handles.
+    HANDLE_COMMANDS = ("stc::create", "stc::reserve", "stc::connect", "stc::subscribe", "stc::perform", "::cta::resolve")
+
+    # Commands that only read values (left out when 'reads' is False).
+    READ_COMMANDS = ("stc::get", "::cta::getmany", "::cta::tree", "::cta::values")
+
+    # Bookkeeping of the asynchronous command scheduler. The requests are waited
+    # for by the recorded stc::waitUntilCommandIsDone commands instead.
+    SKIPPED_COMMANDS = ("::cta::watch", "::cta::unwatch", "::cta::waitrequests")
+
+    def __init__(self, cta, path, reads=True):
+        self.cta = cta
+        self.path = path
+        self.reads = reads
+        # handle -> variable index (h(N) in the journal)
+        self.handles = {}
+        self.commands = 0
+
+        self.journal = open(path, "w")
+        self.journal.write("# CtaPython session journal\n")
+        self.journal.write("# Recorded " + datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S") + " with API path " + str(cta.api_path) + "\n")
+        self.journal.write("# Run it with CtaPython.replay (or benchmarks/replay.py).\n")
+        self.journal.write("proc ::cta::journal { stoponerror } {\n")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.cta.stop_recording()
+        return False
+
+    def Close(self):
+        if self.journal is not None:
+            self.journal.write("    return " + str(self.commands) + "\n}\n")
+            self.journal.close()
+            self.journal = None
+
+    #==============================================================================
+    def Record(self, command, args, result, error):
+        name = command.split(None, 1)[0] if command else ""
+        if name in self.SKIPPED_COMMANDS or (not self.reads and name in self.READ_COMMANDS):
+            return
+
+        if args:
+            text = " ".join([self.Symbolize(word) for word in (command,) + args])
+        else:
+            # A script (eg: with a TclExpr argument) is recorded as it is.
+            text = command
+
+        self.commands += 1
+        lines = []
+        if error is not None:
+            lines.append("# Failed when recorded: " + " ".join(str(error).split()))
+            lines.append("catch { " + text + " }")
+        else:
+            lines.append("if { [catch { " + text + " } r] } { ::cta::replayerror $stoponerror " + str(self.commands) + " $r }")
+            if args:
+                lines += self.NewHandles(name, args, result)
+
+        self.journal.write("".join(["    " + line + "\n" for line in lines]))
+
+    def NewHandles(self, name, args, result):
+        # Returns the journal lines that keep the new handles in the result.
+        if name == "::cta::batch":
+            # The results of the stc::create commands in the batch.
+            items = self.cta.tcl.splitlist(result)
+            positions = [2 * index + 1 for index, words in enumerate(args[0])
+                         if words and words[0] == "stc::create" and 2 * index + 1 < len(items) and items[2 * index] == "0"]
+        elif name in self.HANDLE_COMMANDS:
+            items = self.cta.tcl.splitlist(result)
+            if len(items) == 1 and items[0] == result:
+                positions = [None]
+                items = [result]
+            elif name == "stc::perform":
+                # The values of the "-key value" pairs.
+                positions = range(1, len(items), 2)
+            else:
+                positions = range(len(items))
+        else:
+            return []
+
+        lines = []
+        for position in positions:
+            handle = items[0] if position is None else items[position]
+            if handle in self.handles or not self.HANDLE_PATTERN.match(handle):
+                continue
+
+            index = len(self.handles) + 1
+            self.handles[handle] = index
+            if position is None:
+                lines.append("set h(" + str(index) + ") $r")
+            else:
+                lines.append("set h(" + str(index) + ") [lindex $r " + str(position) + "]")
+
+        return lines
+
+    def Symbolize(self, value):
+        # Returns the Tcl source for an argument, with the recorded handles replaced by variables.
+        value = _tcl_value(value)
+        if isinstance(value, tuple):
+            words = [self.Symbolize(item) for item in value]
+            if [word for word in words if "$h(" in word]:
+                return "[list " + " ".join(words) + "]"
+            return _tcl_format(value)
+        elif not isinstance(value, str):
+            return str(value)
+
+        index = self.handles.get(value)
+        if index is not None:
+            return "$h(" + str(index) + ")"
+
+        if "." in value:
+            # A DDN path (eg: test3.userprofile).
+            handle, path = value.split(".", 1)
+            index = self.handles.get(handle)
+            if index is not None:
+                return "$h(" + str(index) + ")" + _tcl_escape("." + path)
+
+        return _tcl_quote(value)
+
+###############################################################################
+####
+####    Metrics
+####
+###############################################################################
+
+class CtaHistogram(object):
+    """
+    Counts of observed times (seconds), by bucket upper bound.
+    """
+    __slots__ = ("bounds", "counts", "count", "sum", "max")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # The last count is for times above the largest bound.
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def Observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def Snapshot(self):
+        buckets = []
+        total = 0
+        for bound, count in zip(list(self.bounds) + ["+Inf"], self.counts):
+            total += count
+            buckets.append([bound, total])
+        return {"count": self.count, "sum": self.sum, "max": self.max, "buckets": buckets}
+
+#==============================================================================
+class CtaCallTimes(object):
+    """
+    The phase times of the public method call that is running.
+    """
+    __slots__ = ("start", "encode", "eval", "log")
+
+    def __init__(self, start):
+        self.start = start
+        self.encode = None
+        self.eval = 0.0
+        self.log = 0.0
+
+#==============================================================================
+class CtaMetrics(object):
+    """
+    Timing histograms of the CtaPython calls. See CtaPython.enable_metrics.
+
+    The calls run on the interpreter's thread, one at a time (nested calls, such
+    as the get_many calls of a subscription poll, are timed separately).
+    """
+    # Bucket upper bounds, in seconds.
+    BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+               0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+    PHASES = ("total", "encode", "eval", "decode", "log")
+
+    # The methods that are also timed by their first argument (the command name).
+    COMMAND_METHODS = ("perform", "perform_async")
+
+    def __init__(self, slow_threshold=None, buckets=None):
+        self.slow_threshold = slow_threshold
+        self.buckets = tuple(sorted(buckets)) if buckets is not None else self.BUCKETS
+        self.lock = threading.Lock()
+        # (method, command, phase) -> CtaHistogram
+        self.calls = {}
+        # Tcl command -> CtaHistogram
+        self.evals = {}
+        # (method, command) -> count
+        self.errors = {}
+        # The CtaCallTimes of the running call, if any.
+        self.current = None
+
+    #==============================================================================
+    def Measure(self, cta, methodname, argnames, method, args, kwargs):
+        # Runs a public method (for the _command decorator), and records its phase times.
+        debug = _root_logger.isEnabledFor(logging.DEBUG)
+        outer = self.current
+        times = self.current = CtaCallTimes(_perf_counter())
+        failed = True
+        try:
+            if debug:
+                cta.LogCommand(methodname, argnames, args, kwargs)
+                times.log += _perf_counter() - times.start
+
+            result = method(cta, *args, **kwargs)
+
+            if debug:
+                start = _perf_counter()
+                logging.debug(" - Python result  - %s", cta.LogText(result))
+                times.log += _perf_counter() - start
+
+            failed = False
+            return result
+        finally:
+            end = _perf_counter()
+            self.current = outer
+
+            command = ""
+            if methodname in self.COMMAND_METHODS and args:
+                command = str(args[0])
+            self.Record(methodname, command, times, end, failed)
+
+    def AddLog(self, start):
+        # Called by Exec after writing a DEBUG message.
+        times = self.current
+        if times is not None:
+            times.log += _perf_counter() - start
+
+    def StartEval(self):
+        # Called by Exec before the Tcl evaluation. Returns the start time.
+        start = _perf_counter()
+        times = self.current
+        if times is not None and times.encode is None:
+            times.encode = start - times.start - times.log
+        return start
+
+    def EndEval(self, command, start):
+        # Called by Exec after the Tcl evaluation (whether or not it failed).
+        elapsed = _perf_counter() - start
+        times = self.current
+        if times is not None:
+            times.eval += elapsed
+
+        # The Tcl command name (a script is timed by its first word).
+        name = command.split(None, 1)[0] if command else ""
+        with self.lock:
+            histogram = self.evals.get(name)
+            if histogram is None:
+                histogram = self.evals[name] = CtaHistogram(self.buckets)
+            histogram.Observe(elapsed)
+
+    def Record(self, methodname, command, times, end, failed):
+        total = end - times.start
+        encode = times.encode if times.encode is not None else total - times.eval - times.log
+        decode = max(total - encode - times.eval - times.log, 0.0)
+        phases = (total, encode, times.eval, decode, times.log)
+
+        with self.lock:
+            for phase, value in zip(self.PHASES, phases):
+                key = (methodname, command, phase)
+                histogram = self.calls.get(key)
+                if histogram is None:
+                    histogram = self.calls[key] = CtaHistogram(self.buckets)
+                histogram.Observe(value)
+
+            if failed:
+                self.errors[(methodname, command)] = self.errors.get((methodname, command), 0) + 1
+
+        if self.slow_threshold is not None and total > self.slow_threshold:
+            name = methodname + ("(" + command + ")" if command else "")
+            logging.warning("Slow call: %s took %.3f s (encode %.3f s, eval %.3f s, decode %.3f s, log %.3f s)",
+                            name, total, encode, times.eval, decode, times.log)
+
+    #==============================================================================
+    def Snapshot(self):
+        with self.lock:
+            calls = []
+            for (methodname, command, phase), histogram in sorted(self.calls.items()):
+                entry = histogram.Snapshot()
+                entry.update({"method": methodname, "command": command, "phase": phase})
+                calls.append(entry)
+
+            evals = []
+            for command, histogram in sorted(self.evals.items()):
+                entry = histogram.Snapshot()
+                entry["command"] = command
+                evals.append(entry)
+
+            errors = [{"method": methodname, "command": command, "count": count}
+                      for (methodname, command), count in sorted(self.errors.items())]
+
+        return {"calls": calls, "evals": evals, "errors": errors}
+
+    def Prometheus(self):
+        snapshot = self.Snapshot()
+        lines = []
+
+        lines.append("# HELP cta_call_duration_seconds Time spent in CtaPython calls, by method, perform command and phase.")
+        lines.append("# TYPE cta_call_duration_seconds histogram")
+        for entry in snapshot["calls"]:
+            labels = 'method="' + _prometheus_escape(entry["method"]) + '",command="' + _prometheus_escape(entry["command"]) + \
+                     '",phase="' + entry["phase"] + '"'
+            lines += _prometheus_histogram("cta_call_duration_seconds", labels, entry)
+
+        lines.append("# HELP cta_tcl_eval_seconds Time spent evaluating Tcl commands, by command.")
+        lines.append("# TYPE cta_tcl_eval_seconds histogram")
+        for entry in snapshot["evals"]:
+            labels = 'command="' + _prometheus_escape(entry["command"]) + '"'
+            lines += _prometheus_histogram("cta_tcl_eval_seconds", labels, entry)
+
+        lines.append("# HELP cta_call_errors_total CtaPython calls that raised an exception.")
+        lines.append("# TYPE cta_call_errors_total counter")
+        for entry in snapshot["errors"]:
+            lines.append('cta_call_errors_total{method="' + _prometheus_escape(entry["method"]) + '",command="' +
+                         _prometheus_escape(entry["command"]) + '"} ' + str(entry["count"]))
+
+        return "\n".join(lines) + "\n"
+
+def _prometheus_escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _prometheus_histogram(name, labels, entry):
+    lines = []
+    for bound, count in entry["buckets"]:
+        lines.append(name + "_bucket{" + labels + ',le="' + (bound if bound == "+Inf" else repr(float(bound))) + '"} ' + str(count))
+    lines.append(name + "_sum{" + labels + "} " + repr(entry["sum"]))
+    lines.append(name + "_count{" + labels + "} " + str(entry["count"]))
+    return lines
+
+###############################################################################
+####
+####    Attribute Cache
+####
+###############################################################################
+
+class CtaAttributeCache(object):
+    """
+    An LRU cache of get results, invalidated by the changes that CtaPython reports
+    through NotifyListeners. See CtaPython.enable_cache.
+
+    In threaded mode the cache is only used on the worker thread.
+    """
+    def __init__(self, maxsize=10000, ttl=None, exclude_attributes=(), exclude_handles=(), mutating_commands=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.exclude_attributes = [re.compile(fnmatch.translate(pattern.lower())) for pattern in exclude_attributes]
+        self.exclude_handles = [re.compile(fnmatch.translate(pattern.lower())) for pattern in exclude_handles]
+        if mutating_commands is None:
+            self.mutating_commands = None
+        else:
+            self.mutating_commands = set([command.lower() for command in mutating_commands])
+
+        # (handle, attributes) -> (result, expiry time)
+        self.entries = OrderedDict()
+        # handle -> set of keys, for invalidating one object.
+        self.keys_by_handle = {}
+        # The keys that use a DDN path or DAN attribute path.
+        self.path_keys = set()
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    #==============================================================================
+    def Lookup(self, handle, attributes):
+        # Returns (True, result) on a hit, otherwise (False, None).
+        key = (handle.lower(), tuple([attribute.lower() for attribute in attributes]))
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        result, expiry = entry
+        if expiry is not None and _monotonic() > expiry:
+            self.Remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return False, None
+
+        # Most recently used last (OrderedDict.move_to_end is Python 3 only).
+        self.entries[key] = self.entries.pop(key)
+        self.hits += 1
+
+        if isinstance(result, dict):
+            # The caller may modify the dictionary.
+            return True, dict(result)
+        return True, result
+
+    def Store(self, handle, attributes, result):
+        key = (handle.lower(), tuple([attribute.lower() for attribute in attributes]))
+        if self.IsExcluded(key):
+            return
+
+        if key in self.entries:
+            self.Remove(key)
+
+        expiry = None
+        if self.ttl is not None:
+            expiry = _monotonic() + self.ttl
+
+        if isinstance(result, dict):
+            result = dict(result)
+
+        self.entries[key] = (result, expiry)
+        self.keys_by_handle.setdefault(key[0], set()).add(key)
+        if "." in key[0] or [attribute for attribute in key[1] if "." in attribute]:
+            self.path_keys.add(key)
+        self.stores += 1
+
+        while len(self.entries) > self.maxsize:
+            self.Remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def IsExcluded(self, key):
+        handle, attributes = key
+        for pattern in self.exclude_handles:
+            if pattern.match(handle):
+                return True
+
+        for pattern in self.exclude_attributes:
+            for attribute in attributes:
+                # Match both the full DAN path and the attribute name at its end.
+                if pattern.match(attribute) or pattern.match(attribute.rsplit(".", 1)[-1]):
+                    return True
+
+        return False
+
+    def Remove(self, key):
+        del self.entries[key]
+
+        keys = self.keys_by_handle[key[0]]
+        keys.discard(key)
+        if not keys:
+            del self.keys_by_handle[key[0]]
+
+        self.path_keys.discard(key)
+
+    #==============================================================================
+    def Invalidate(self, handle):
+        # Removes the results for the handle, its DDN ancestors and subtree, and every
+        # result that was retrieved through a DDN or DAN path.
+        handle = handle.lower()
+
+        keys = set(self.path_keys)
+        keys.update(self.keys_by_handle.get(handle, ()))
+
+        # The DDN ancestors (eg: "project1" and "project1.test" for "project1.test.userprofile").
+        parts = handle.split(".")
+        for index in range(1, len(parts)):
+            keys.update(self.keys_by_handle.get(".".join(parts[:index]), ()))
+
+        for key in keys:
+            self.Remove(key)
+
+        self.invalidations += len(keys)
+
+    def Clear(self):
+        self.invalidations += len(self.entries)
+        self.entries.clear()
+        self.keys_by_handle.clear()
+        self.path_keys.clear()
+
+    def ObjectChanged(self, event, handle, details):
+        if event == "config":
+            handle = str(handle)
+            if "." in handle or [key for key in details["attributes"] if "." in key]:
+                # A DDN path or DAN attribute changes an object whose handle is not
+                # known here (eg: project1.test.userprofile is userprofile1).
+                self.Clear()
+            else:
+                self.Invalidate(handle)
+        elif event == "create":
+            # The parent's relations have changed.
+            self.Invalidate(str(details["parent"]))
+        elif event in ("delete", "batch"):
+            # For delete, the parent's relations have changed, and the parent is unknown.
+            self.Clear()
+        elif event == "perform":
+            if self.mutating_commands is None or str(details["command"]).lower() in self.mutating_commands:
+                self.Clear()
+
+    def Statistics(self):
+        return {"size": len(self.entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations}
+
+###############################################################################
+####
+####    Statistics Subscriptions
+####
+###############################################################################
+
+class CtaStatSample(object):
+    """
+    One runtime statistic value, polled from a ResultDataObject.
+    """
+    __slots__ = ("time", "handle", "attribute", "value")
+
+    def __init__(self, time, handle, attribute, value):
+        # The time of the poll (seconds since the epoch).
+        self.time = time
+        self.handle = handle
+        self.attribute = attribute
+        self.value = value
+
+    def __repr__(self):
+        return "CtaStatSample(" + repr(self.time) + ", " + repr(self.handle) + ", " + repr(self.attribute) + ", " + repr(self.value) + ")"
+
+#==============================================================================
+class CtaSubscription(object):
+    """
+    A runtime statistics subscription, and the ring buffer of samples that have
+    not been read yet. See CtaPython.stream.
+    """
+    # Attributes of the ResultDataObjects that are not statistics.
+    IGNORED_ATTRIBUTES = ("handle", "error", "name", "parent", "children")
+
+    def __init__(self, cta, side, viewAttributesList, interval, buffer_size, deltas_only):
+        self.cta = cta
+        self.interval = interval
+        self.deltas_only = deltas_only
+        self.handle = cta.subscribe(side, viewAttributesList)
+
+        self.buffer = deque(maxlen=buffer_size)
+        self.condition = threading.Condition()
+        self.polled = False
+        self.closed = False
+        self.error = None
+
+        # (handle, attribute) -> the last value, for deltas_only.
+        self.values = {}
+        self.next_poll = _monotonic()
+
+        self.polls = 0
+        self.dropped = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        while True:
+            with self.condition:
+                if self.buffer:
+                    return self.buffer.popleft()
+                if self.error is not None:
+                    error, self.error = self.error, None
+                    raise error
+                if self.closed:
+                    raise StopIteration
+                if self.polled:
+                    self.condition.wait()
+                    continue
+
+            delay = self.next_poll - _monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.Poll()
+
+    # Python 2
+    next = __next__
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    #==============================================================================
+    def samples(self):
+        """
+        Returns (and removes) the samples that are in the buffer, without waiting.
+        """
+        with self.condition:
+            samples = list(self.buffer)
+            self.buffer.clear()
+        return samples
+
+    def close(self):
+        """
+        Removes the subscription. Samples already in the buffer can still be read.
+        """
+        with self.condition:
+            if self.closed:
+                return
+            self.closed = True
+            self.condition.notify_all()
+
+        if self.cta.poller is not None:
+            self.cta.poller.Remove(self)
+
+        try:
+            self.cta.unsubscribe(self.handle)
+        except Exception as errmsg:
+            logging.warning("Unable to unsubscribe " + self.handle + ": " + str(errmsg))
+
+        return
+
+    #==============================================================================
+    def Poll(self):
+        # Reads the statistics once, and adds the (changed) values to the buffer.
+        self.next_poll = max(self.next_poll + self.interval, _monotonic())
+        self.polls += 1
+
+        # get_many never uses the attribute cache. Handles have no spaces.
+        objects = self.cta.get_many([self.handle], ["children"])["children"][0].split()
+        columns = self.cta.get_many(objects)
+        now = time.time()
+
+        samples = []
+        values = self.values
+        for attribute in columns:
+            if attribute in self.IGNORED_ATTRIBUTES:
+                continue
+
+            for handle, value in zip(columns["handle"], columns[attribute]):
+                if value is None:
+                    continue
+
+                key = (handle, attribute)
+                if self.deltas_only and key in values and values[key] == value:
+                    continue
+
+                values[key] = value
+                samples.append(CtaStatSample(now, handle, attribute, value))
+
+        with self.condition:
+            overflow = len(self.buffer) + len(samples) - self.buffer.maxlen
+            if overflow > 0:
+                self.dropped += overflow
+            self.buffer.extend(samples)
+            self.condition.notify_all()
+
+        return
+
+    def Fail(self, error):
+        # Called by the poller when a poll fails. The iterator raises the error.
+        with self.condition:
+            self.error = error
+            self.closed = True
+            self.condition.notify_all()
+
+#==============================================================================
+class CtaStatPoller(threading.Thread):
+    """
+    The thread that polls the streaming subscriptions of a threaded CtaPython object.
+    The polls are sent to the CtaWorker thread, like any other call.
+    """
+    def __init__(self):
+        threading.Thread.__init__(self, name="CtaStatPoller")
+        self.daemon = True
+        self.condition = threading.Condition()
+        self.subscriptions = []
+        self.stopped = False
+
+    def Add(self, subscription):
+        with subscription.condition:
+            subscription.polled = True
+
+        with self.condition:
+            self.subscriptions.append(subscription)
+            self.condition.notify()
+
+    def Remove(self, subscription):
+        with self.condition:
+            if subscription in self.subscriptions:
+                self.subscriptions.remove(subscription)
+            self.condition.notify()
+
+    def Stop(self):
+        with self.condition:
+            self.stopped = True
+            subscriptions = list(self.subscriptions)
+            self.condition.notify()
+
+        for subscription in subscriptions:
+            with subscription.condition:
+                subscription.closed = True
+                subscription.condition.notify_all()
+
+        if self is not threading.current_thread():
+            self.join()
+
+    #==============================================================================
+    def run(self):
+        while True:
+            with self.condition:
+                while True:
+                    if self.stopped:
+                        return
+
+                    now = _monotonic()
+                    due = [subscription for subscription in self.subscriptions if subscription.next_poll <= now]
+                    if due:
+                        break
+
+                    if self.subscriptions:
+                        self.condition.wait(min([subscription.next_poll for subscription in self.subscriptions]) - now)
+                    else:
+                        self.condition.wait()
+
+            for subscription in due:
+                try:
+                    subscription.Poll()
+                except Exception as errmsg:
+                    logging.error("Polling the statistics of " + subscription.handle + " failed: " + str(errmsg))
+                    self.Remove(subscription)
+                    subscription.Fail(errmsg)
+
+###############################################################################
+####
+####    Object Proxies
+####
+###############################################################################
+
+class CtaPathCache(object):
+    """
+    The handles of the DDN paths that have been resolved (by CtaPython.ResolvePath).
+    Creating or deleting objects may change which object a path refers to, so the
+    cache is cleared by every change other than config.
+    """
+    def __init__(self):
+        # path (lower case) -> handle
+        self.handles = {}
+        self.resolutions = 0
+
+    def ObjectChanged(self, event, handle, details):
+        if event != "config":
+            self.handles.clear()
+
+#==============================================================================
+class CtaObject(object):
+    """
+    A lazy reference to an object, by handle or DDN path. See CtaPython.object.
+    """
+    # The names start with "_", so they never hide an object type.
+    __slots__ = ("_cta", "_path")
+
+    def __init__(self, cta, path):
+        self._cta = cta
+        self._path = path
+
+    def __getattr__(self, name):
+        if name[:1] == "_":
+            raise AttributeError(name)
+        return CtaObject(self._cta, self._path + "." + name)
+
+    def __call__(self, index):
+        # project.test(2): select the index'th child, instead of the first.
+        if self._path[-1:] == ")" or "." not in self._path:
+            raise TypeError("the index of " + self._path + " has already been given")
+        return CtaObject(self._cta, self._path + "(" + str(index) + ")")
+
+    def __add__(self, suffix):
+        return CtaObject(self._cta, self._path + suffix)
+
+    def __getitem__(self, attribute):
+        return self._cta.get(self.handle, attribute)
+
+    def __setitem__(self, attribute, value):
+        self._cta.config(self.handle, **{attribute: value})
+
+    def __str__(self):
+        return self.handle
+
+    def __repr__(self):
+        return "CtaObject(" + repr(self._path) + ")"
+
+    def __eq__(self, other):
+        if isinstance(other, CtaObject):
+            return self.handle == other.handle
+        return self.handle == other
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.handle)
+
+    #==============================================================================
+    @property
+    def handle(self):
+        """
+        The handle of the object (the DDN path is resolved once, and remembered).
+        """
+        return self._cta.ResolvePath(self._path)
+
+    @property
+    def path(self):
+        """
+        The DDN path (or handle) that the proxy was created with.
+        """
+        return self._path
+
+    @property
+    def parent(self):
+        return CtaObject(self._cta, self._cta.get(self.handle, "parent"))
+
+    def children(self, objecttype=None):
+        """
+        Returns the proxies of the children (of one type, if 'objecttype' is given).
+        """
+        if objecttype is None:
+            children = self._cta.get(self.handle, "children")
+        else:
+            children = self._cta.get(self.handle, "children-" + objecttype)
+        return [CtaObject(self._cta, handle) for handle in children.split()]
+
+    def get(self, *args):
+        return self._cta.get(self.handle, *args)
+
+    def config(self, **kwargs):
+        return self._cta.config(self.handle, **kwargs)
+
+    def create(self, objecttype, **kwargs):
+        return CtaObject(self._cta, self._cta.create(objecttype, self.handle, **kwargs))
+
+    def delete(self):
+        return self._cta.delete(self.handle)
+
+###############################################################################
+####
+####    Object Index
+####
+###############################################################################
+
+class CtaObjectIndex(object):
+    """
+    An index of the objects under a root object. See CtaPython.index.
+
+    Attribute names are case insensitive. Values are kept as the strings that
+    stc::get returns.
+    """
+    def __init__(self, cta, root, attributes=(), mutating_commands=None):
+        self.cta = cta
+        self.root = root
+        self.attributes = ["name"] + [attribute.lower() for attribute in attributes if attribute.lower() != "name"]
+        if mutating_commands is None:
+            self.mutating_commands = None
+        else:
+            self.mutating_commands = set([command.lower() for command in mutating_commands])
+
+        self.lock = threading.RLock()
+        self.stale = True
+        self.reads = 0
+        self.Refresh()
+
+    def __len__(self):
+        with self.lock:
+            self.Refresh()
+            return len(self.parents)
+
+    def __contains__(self, handle):
+        with self.lock:
+            self.Refresh()
+            return str(handle) in self.parents
+
+    def close(self):
+        """
+        Stops updating the index.
+        """
+        self.cta.listeners = [listener for listener in self.cta.listeners if listener is not self]
+
+    #==============================================================================
+    def find(self, objecttype=None, under=None, **attributes):
+        """
+        Description
+            Returns the handles of the indexed objects that match all of the conditions.
+
+        Syntax
+            index.find([<objecttype>], [under=<handle>], [[<attribute>=<value>], [...]])
+
+        Comments
+            'objecttype' is the object type (eg: "userprofile"). 'under' is a handle,
+            DDN path or CtaObject: only its descendants match. The attributes must be
+            "name" or attributes that were given to cta.index. Values are compared as
+            Tcl strings.
+
+        Return Value
+            List of handles, in the order they were indexed.
+
+        Example
+            index.find("userprofile", under=test, name="Profile 1")
+        """
+        conditions = []
+        for key in attributes:
+            attribute = key.lower()
+            if attribute not in self.attributes:
+                raise ValueError("the attribute " + key + " is not indexed")
+            conditions.append((attribute, str(_tcl_value(attributes[key]))))
+
+        if under is not None:
+            under = self.cta.ResolvePath(str(under))
+
+        with self.lock:
+            self.Refresh()
+
+            # Start from the smallest map that applies.
+            names = [value for attribute, value in conditions if attribute == "name"]
+            if names:
+                candidates = self.names.get(names[0], {})
+            elif objecttype is not None:
+                candidates = self.types.get(objecttype.lower(), {})
+            else:
+                candidates = self.parents
+
+            handles = []
+            for handle in candidates:
+                if objecttype is not None and self.types_by_handle[handle] != objecttype.lower():
+                    continue
+                values = self.values[handle]
+                if [attribute for attribute, value in conditions if values.get(attribute) != value]:
+                    continue
+                if under is not None and not self.IsUnder(handle, under):
+                    continue
+                handles.append(handle)
+
+        return handles
+
+    def find_one(self, objecttype=None, under=None, **attributes):
+        """
+        Returns the first handle that find() would return, or None.
+        """
+        handles = self.find(objecttype, under, **attributes)
+        if handles:
+            return handles[0]
+        return None
+
+    def parent(self, handle):
+        """
+        Returns the parent of an indexed object.
+        """
+        with self.lock:
+            self.Refresh()
+            return self.parents[str(handle)]
+
+    def children(self, handle):
+        """
+        Returns the list of children of an indexed object.
+        """
+        with self.lock:
+            self.Refresh()
+            return list(self.children_by_handle[str(handle)])
+
+    def value(self, handle, attribute):
+        """
+        Returns the indexed value of an attribute (None if the object does not have it).
+        """
+        with self.lock:
+            self.Refresh()
+            return self.values[str(handle)].get(attribute.lower())
+
+    #==============================================================================
+    def Refresh(self):
+        # Reads the whole tree again, if it may have changed.
+        if not self.stale:
+            return
+
+        # handle -> parent, children (ordered), type, {attribute: value}
+        self.parents = OrderedDict()
+        self.children_by_handle = {}
+        self.types_by_handle = {}
+        self.values = {}
+        # type -> handles, name -> handles (OrderedDicts, used as ordered sets)
+        self.types = {}
+        self.names = {}
+
+        self.Read(self.root)
+        self.stale = False
+
+    def Read(self, root):
+        # Adds the subtree under 'root' to the index, with one ::cta::tree call.
+        result = self.cta.Exec("::cta::tree", root, tuple(self.attributes))
+        split = self.cta.tcl.splitlist
+        items = split(result)
+        self.reads += 1
+
+        for index in range(0, len(items), 3):
+            handle, parent, values = items[index:index + 3]
+            values = split(values)
+            self.Add(handle, parent, dict(zip([attribute.lower() for attribute in values[0::2]], values[1::2])))
+
+    def Add(self, handle, parent, values):
+        if handle in self.parents:
+            self.Remove(handle)
+
+        objecttype = _HANDLE_COUNTER_PATTERN.sub("", handle).lower()
+        self.parents[handle] = parent
+        self.children_by_handle[handle] = OrderedDict()
+        self.types_by_handle[handle] = objecttype
+        self.values[handle] = values
+        self.types.setdefault(objecttype, OrderedDict())[handle] = None
+        if "name" in values:
+            self.names.setdefault(values["name"], OrderedDict())[handle] = None
+        if parent in self.children_by_handle:
+            self.children_by_handle[parent][handle] = None
+
+    def Remove(self, handle):
+        # Removes an object and its subtree.
+        for child in list(self.children_by_handle.get(handle, ())):
+            self.Remove(child)
+
+        parent = self.parents.pop(handle)
+        if parent in self.children_by_handle:
+            self.children_by_handle[parent].pop(handle, None)
+        del self.children_by_handle[handle]
+        del self.types[self.types_by_handle.pop(handle)][handle]
+        values = self.values.pop(handle)
+        if "name" in values:
+            self.names[values["name"]].pop(handle, None)
+
+    def Update(self, handle):
+        # Reads the indexed attributes of one object again.
+        values = self.values[handle]
+        if "name" in values:
+            self.names[values["name"]].pop(handle, None)
+
+        items = self.cta.tcl.splitlist(self.cta.Exec("::cta::values", handle, tuple(self.attributes)))
+        values = dict(zip([attribute.lower() for attribute in items[0::2]], items[1::2]))
+
+        self.values[handle] = values
+        if "name" in values:
+            self.names.setdefault(values["name"], OrderedDict())[handle] = None
+
+    def IsUnder(self, handle, ancestor):
+        parents = self.parents
+        handle = parents.get(handle)
+        while handle is not None and handle != "":
+            if handle == ancestor:
+                return True
+            handle = parents.get(handle)
+        return False
+
+    #==============================================================================
+    def ObjectChanged(self, event, handle, details):
+        with self.lock:
+            if self.stale:
+                return
+
+            if event == "perform":
+                if self.mutating_commands is None or str(details["command"]).lower() in self.mutating_commands:
+                    self.stale = True
+                return
+
+            if details["failed"] or event == "batch" or "." in str(handle):
+                # The index cannot tell what has changed (a DDN path may no longer
+                # resolve to the object that was changed).
+                self.stale = True
+                return
+
+            handle = str(handle)
+            if event == "create":
+                parent = str(details["parent"])
+                if "." in parent:
+                    self.stale = True
+                elif parent in self.parents:
+                    self.Read(handle)
+            elif event == "delete":
+                if handle in self.parents:
+                    self.Remove(handle)
+            elif event == "config":
+                if handle in self.parents:
+                    if [key for key in details["attributes"] if key.lower() in self.attributes]:
+                        self.Update(handle)
+
+###############################################################################
+####
+####    Snapshots
+####
+###############################################################################
+
+class CtaSnapshot(object):
+    """
+    The attributes of the objects under a root object. See CtaPython.snapshot.
+
+    'objects' is an ordered dictionary of "path: (objectType, attributes)", with
+    the parents before their children. The root has the path "". Attribute names
+    are lower case, and values are the strings that stc::get returns.
+    """
+    # Attributes that describe the tree rather than the object.
+    TREE_ATTRIBUTES = ("parent", "children", "children-*")
+
+    def __init__(self, root, exclude_attributes=None):
+        self.root = root
+        self.exclude_attributes = list(exclude_attributes or ())
+        self.patterns = [re.compile(fnmatch.translate(pattern.lower()))
+                         for pattern in list(self.TREE_ATTRIBUTES) + self.exclude_attributes]
+        self.objects = OrderedDict()
+        # Handles by path (only for snapshots read from a session).
+        self.handles = {}
+
+    def __len__(self):
+        return len(self.objects)
+
+    def __contains__(self, path):
+        return path in self.objects
+
+    def __getitem__(self, path):
+        return self.objects[path]
+
+    def __repr__(self):
+        return "<CtaSnapshot " + self.root + ": " + str(len(self.objects)) + " objects>"
+
+    #==============================================================================
+    def diff(self, other, delete=True):
+        """
+        Returns the changes (see CtaPython.apply_snapshot) that turn this snapshot into 'other'.
+        """
+        changes = []
+        for path in other.objects:
+            objecttype, attributes = other.objects[path]
+            if path not in self.objects:
+                changes.append(("create", path, objecttype, dict(attributes)))
+                continue
+
+            values = self.objects[path][1]
+            changed = dict([(key, attributes[key]) for key in attributes if values.get(key) != attributes[key]])
+            if changed:
+                changes.append(("config", path, changed))
+
+        if delete:
+            deleted = set()
+            for path in self.objects:
+                if path in other.objects:
+                    continue
+
+                # Deleting an object also deletes its children.
+                parent = path.rsplit(".", 1)[0] if "." in path else ""
+                deleted.add(path)
+                if parent not in deleted:
+                    changes.append(("delete", path))
+
+        return changes
+
+    def save(self, path):
+        """
+        Writes the snapshot to a JSON file (compressed if the file name ends with ".gz").
+        """
+        data = {"version": 1,
+                "root": self.root,
+                "exclude_attributes": self.exclude_attributes,
+                "objects": [[key, objecttype, attributes] for key, (objecttype, attributes) in self.objects.items()]}
+        text = json.dumps(data, separators=(",", ":"))
+
+        if path.endswith(".gz"):
+            with gzip.open(path, "wb") as output:
+                output.write(text.encode("utf-8"))
+        else:
+            with open(path, "w") as output:
+                output.write(text)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Reads a snapshot written by save().
+        """
+        if path.endswith(".gz"):
+            with gzip.open(path, "rb") as source:
+                data = json.loads(source.read().decode("utf-8"))
+        else:
+            with open(path) as source:
+                data = json.load(source)
+
+        snapshot = cls(data["root"], data["exclude_attributes"])
+        for key, objecttype, attributes in data["objects"]:
+            snapshot.objects[key] = (objecttype, attributes)
+        return snapshot
 
-    #     tclresult = self.Exec(tclcode)         
-    #     logging.debug(" - Python result  - " + str(tclresult))
-    #     return tclresult
+    #==============================================================================
+    def Read(self, cta):
+        # Reads the objects from the session, with one ::cta::snapshot call.
+        items = cta.tcl.splitlist(cta.Exec("::cta::snapshot", self.root))
 
-    ###############################################################################
-    ####
-    ####    Private Methods
-    ####
-    ###############################################################################
+        paths = {self.root: ""}
+        # Number of children of each type, by parent handle.
+        counts = {}
+        for index in range(0, len(items), 3):
+            handle, parent, values = items[index:index + 3]
 
-    def Exec(self, command):
-        logging.debug(" - Tcl command - " + command)
-        
+            objecttype = _HANDLE_COUNTER_PATTERN.sub("", handle).lower()
+            if index == 0:
+                path = ""
+            else:
+                count = counts.setdefault(parent, {})
+                count[objecttype] = count.get(objecttype, 0) + 1
+                path = objecttype + "(" + str(count[objecttype]) + ")"
+                if paths[parent]:
+                    path = paths[parent] + "." + path
+
+            paths[handle] = path
+            self.handles[path] = handle
+            self.objects[path] = (objecttype, self.Attributes(cta.tcl.splitlist(values)))
+
+    def Attributes(self, items):
+        attributes = {}
+        for index in range(0, len(items) - 1, 2):
+            key = items[index].lower()
+            if key[:1] == "-":
+                key = key[1:]
+
+            if not [pattern for pattern in self.patterns if pattern.match(key)]:
+                attributes[key] = items[index + 1]
+
+        return attributes
+
+###############################################################################
+####
+####    Export
+####
+###############################################################################
+
+class CtaExporter(object):
+    """
+    Streams rows to a CSV, Arrow IPC or Parquet file. See CtaPython.export.
+    """
+    FORMATS = {".csv": "csv", ".arrow": "arrow", ".feather": "arrow", ".ipc": "arrow", ".parquet": "parquet"}
+
+    TYPES = ("str", "int", "float", "bool")
+
+    # The schema of write_samples.
+    SAMPLE_SCHEMA = [("time", "float"), ("handle", "str"), ("attribute", "str"), ("value", "float")]
+
+    def __init__(self, cta, path, format=None, schema=None, append=False, chunk_size=10000):
+        if format is None:
+            format = self.FORMATS.get(os.path.splitext(path)[1].lower())
+            if format is None:
+                raise ValueError("the export format of " + path + " is not known (use format=\"csv\", \"arrow\" or \"parquet\")")
+        elif format not in ("csv", "arrow", "parquet"):
+            raise ValueError("unknown export format: " + str(format))
+
+        self.cta = cta
+        self.format = format
+        self.append = append
+        self.chunk_size = chunk_size
+        self.schema = None
+        if schema is not None:
+            self.SetSchema(schema)
+
+        if format != "csv" and append:
+            # A new part file in the dataset directory.
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            parts = [name for name in os.listdir(path) if name.startswith("part-")]
+            path = os.path.join(path, "part-" + str(len(parts)).zfill(5) + "." + format)
+
+        self.path = path
+        self.rows = []
+        self.writer = None
+        self.output = None
+
+        self.rows_written = 0
+        self.chunks_written = 0
+        self.conversion_errors = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    #==============================================================================
+    def write(self, row):
+        """
+        Adds a row (a dictionary of column values). Columns that are missing from
+        the row are written as empty/null, and columns that are not in the schema
+        are ignored.
+        """
+        self.rows.append(row)
+        if len(self.rows) >= self.chunk_size:
+            self.flush()
+
+    def write_rows(self, rows):
+        """
+        Adds the rows of an iterable (eg: a generator).
+        """
+        for row in rows:
+            self.write(row)
+
+    def write_objects(self, handles, attributes=None, page_size=None):
+        """
+        Reads the attributes of the objects with get_many, a page of handles at a 
+        time, and adds a row for each object (with its "handle"). 'handles' may be
+        an iterable (eg: a generator), so that they are never all in memory.
+        """
+        if page_size is None:
+            page_size = self.chunk_size
+
+        page = []
+        for handle in handles:
+            page.append(handle)
+            if len(page) >= page_size:
+                self.WritePage(page, attributes)
+                page = []
+
+        if page:
+            self.WritePage(page, attributes)
+
+    def write_samples(self, samples):
+        """
+        Adds a row for each CtaStatSample (eg: from CtaSubscription.samples()).
+        """
+        if self.schema is None:
+            self.SetSchema(self.SAMPLE_SCHEMA)
+
+        for sample in samples:
+            self.write({"time": sample.time, "handle": sample.handle, "attribute": sample.attribute, "value": sample.value})
+
+    def flush(self):
+        """
+        Writes the buffered rows as a chunk.
+        """
+        if not self.rows:
+            return
+
+        rows = self.rows
+        self.rows = []
+
+        if self.schema is None:
+            self.SetSchema(self.InferSchema(rows))
+
+        columns = [self.Convert(name, kind, [row.get(name) for row in rows]) for name, kind in self.schema]
+        if self.format == "csv":
+            self.WriteCsv(columns)
+        else:
+            self.WriteArrow(columns)
+
+        self.rows_written += len(rows)
+        self.chunks_written += 1
+
+    def close(self):
+        """
+        Writes the buffered rows and closes the file.
+        """
+        self.flush()
+
+        if self.writer is not None and self.format != "csv":
+            self.writer.close()
+        if self.output is not None:
+            self.output.close()
+
+        self.writer = None
+        self.output = None
+
+    #==============================================================================
+    def WritePage(self, handles, attributes):
+        columns = self.cta.get_many(handles, attributes)
+        names = [name for name in columns if name not in ("handle", "error")]
+
+        for index, handle in enumerate(columns["handle"]):
+            if columns["error"][index] is not None:
+                logging.warning("Export: %s", columns["error"][index])
+                continue
+
+            row = {"handle": handle}
+            for name in names:
+                row[name] = columns[name][index]
+            self.write(row)
+
+    def SetSchema(self, schema):
+        if isinstance(schema, dict):
+            schema = schema.items()
+
+        self.schema = [(str(name), kind) for name, kind in schema]
+        for name, kind in self.schema:
+            if kind not in self.TYPES:
+                raise ValueError("unknown type for column " + name + ": " + str(kind))
+
+    def InferSchema(self, rows):
+        # The columns in the order they were found, with the narrowest type that
+        # holds all of their values.
+        kinds = OrderedDict()
+        for row in rows:
+            for name in row:
+                value = row[name]
+                kind = kinds.get(name)
+                if value is None or value == "" or kind == "str":
+                    kinds.setdefault(name, None)
+                elif isinstance(value, bool):
+                    kinds[name] = "bool" if kind in (None, "bool") else "str"
+                elif isinstance(value, int):
+                    kinds[name] = kind if kind in ("int", "float") else ("int" if kind is None else "str")
+                elif isinstance(value, float):
+                    kinds[name] = "float" if kind in (None, "int", "float") else "str"
+                else:
+                    kinds[name] = "str"
+
+        return [(name, kinds[name] or "str") for name in kinds]
+
+    def Convert(self, name, kind, values):
+        # Converts a column to its type, with None for missing values and values
+        # that cannot be converted.
+        result = []
+        for value in values:
+            if value is None or value == "":
+                result.append(None if kind != "str" else value)
+                continue
+
+            try:
+                if kind == "str":
+                    value = str(value)
+                elif kind == "int":
+                    value = int(value)
+                elif kind == "float":
+                    value = float(value)
+                elif not isinstance(value, bool):
+                    value = str(value).lower() in ("1", "true", "yes", "on")
+            except (TypeError, ValueError):
+                if not self.conversion_errors:
+                    logging.warning("Export: the value %r of column %s is not %s", value, name, kind)
+                self.conversion_errors += 1
+                value = None
+
+            result.append(value)
+
+        return result
+
+    def WriteCsv(self, columns):
+        if self.writer is None:
+            exists = self.append and os.path.exists(self.path) and os.path.getsize(self.path) > 0
+            self.output = io.open(self.path, "a" if self.append else "w", newline="")
+            self.writer = csv.writer(self.output)
+            if not exists:
+                self.writer.writerow([name for name, kind in self.schema])
+
+        self.writer.writerows(zip(*columns))
+        self.output.flush()
+
+    def WriteArrow(self, columns):
+        import pyarrow
+
+        types = {"str": pyarrow.string(), "int": pyarrow.int64(), "float": pyarrow.float64(), "bool": pyarrow.bool_()}
+        schema = pyarrow.schema([(name, types[kind]) for name, kind in self.schema])
+
+        if self.writer is None:
+            if self.format == "parquet":
+                import pyarrow.parquet
+                self.writer = pyarrow.parquet.ParquetWriter(self.path, schema)
+            else:
+                import pyarrow.ipc
+                self.output = pyarrow.OSFile(self.path, "wb")
+                self.writer = pyarrow.ipc.new_file(self.output, schema)
+
+        arrays = [pyarrow.array(column, type=schema.field(index).type) for index, column in enumerate(columns)]
+        batch = pyarrow.RecordBatch.from_arrays(arrays, schema=schema)
+        if self.format == "parquet":
+            self.writer.write_table(pyarrow.Table.from_batches([batch]))
+        else:
+            self.writer.write_batch(batch)
+
+###############################################################################
+####
+####    Reservations
+####
+###############################################################################
+
+class CtaBulkError(CtaError):
+    """
+    Raised by the *_many methods when any of the items fail.
+
+    'results' is the ordered dictionary of all of the results, and 'failures' the
+    ordered dictionary of the CtaError of each item that failed.
+    """
+    def __init__(self, command, results, failures):
+        self.results = results
+        self.failures = failures
+
+        item = list(failures)[0]
+        message = command + " failed for " + str(len(failures)) + " of " + str(len(results)) + " items (" + item + ": " + str(failures[item]) + ")"
+        CtaError.__init__(self, message, command)
+
+#==============================================================================
+class CtaLedger(object):
+    """
+    The chassis and ports held by a CtaPython session, as connected and reserved
+    through its methods.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        # address -> PhysicalChassis handle
+        self.chassis = OrderedDict()
+        # location -> PhysicalPort handle
+        self.ports = OrderedDict()
+
+    def Connected(self, address, handle):
+        with self.lock:
+            self.chassis[address] = handle
+
+    def Disconnected(self, address):
+        # Disconnecting also releases the ports of the chassis.
+        with self.lock:
+            self.chassis.pop(address, None)
+            for location in list(self.ports):
+                if self.Address(location) == address:
+                    del self.ports[location]
+
+    def Reserved(self, location, handle):
+        with self.lock:
+            self.ports[location] = handle
+
+    def Released(self, location):
+        with self.lock:
+            self.ports.pop(location, None)
+
+    def Snapshot(self):
+        with self.lock:
+            return {"chassis": dict(self.chassis), "ports": dict(self.ports)}
+
+    def Address(self, location):
+        # The chassis address of a port location (eg: "//10.1.1.1/1/2" or "10.1.1.1/1/2").
+        return location.lstrip("/").split("/", 1)[0]
+
+#==============================================================================
+class CtaAutoRelease(object):
+    """
+    Releases the ports (and disconnects the chassis) of a session when the block
+    exits. See CtaPython.auto_release.
+    """
+    def __init__(self, cta, disconnect=True, signals=None):
+        self.cta = cta
+        self.disconnect = disconnect
+        if signals is None:
+            signals = [getattr(signal, name) for name in ("SIGTERM", "SIGHUP") if hasattr(signal, name)]
+        self.signals = signals
+        self.handlers = {}
+
+    def __enter__(self):
         try:
-            result = self.tcl.eval(command)
+            for signum in self.signals:
+                self.handlers[signum] = signal.signal(signum, self.Exit)
+        except ValueError:
+            # Signal handlers can only be set by the main thread.
+            self.RestoreHandlers()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.RestoreHandlers()
+        self.Release()
+        return False
+
+    def RestoreHandlers(self):
+        for signum in self.handlers:
+            signal.signal(signum, self.handlers[signum])
+        self.handlers = {}
 
+    def Exit(self, signum, frame):
+        # Unwind the block, so that __exit__ releases the ports.
+        logging.warning("Signal %d received. Releasing the ports...", signum)
+        raise SystemExit(128 + signum)
+
+    def Release(self):
+        try:
+            if self.cta.ledger.ports:
+                self.cta.release_many(strict=False)
+            if self.disconnect and self.cta.ledger.chassis:
+                self.cta.disconnect_many(strict=False)
         except Exception as errmsg:
-            logging.error(errmsg)            
-            raise
-        
-        logging.debug(" - Tcl result  - " + result)
-        return result
+            # Never hide the exception that ended the block.
+            logging.error("Unable to release the ports: %s", errmsg)
+
+###############################################################################
+####
+####    Schema
+####
+###############################################################################
+
+class CtaSchema(object):
+    """
+    The attributes of each object type. See CtaPython.load_schema.
+
+    'types' is a dictionary of "objectType: {attribute: [kind, values, defined]}",
+    with lower case names. 'values' is the list of allowed values of an
+    enumeration (or None), and 'defined' is True for attributes read from the
+    API's metadata or added with define() (whose values are checked).
+    'described' is a dictionary of "objectType: True" for the object types that
+    the API described (their attributes are complete), or False for those that
+    it could not describe.
+    """
+    FORMAT = 2
+
+    # Attributes that describe the tree rather than the object.
+    TREE_ATTRIBUTES = ("parent", "children")
+
+    # The kinds of the API's attribute types (anything else is a "string").
+    METADATA_KINDS = {"bool": "bool", "double": "float", "float": "float",
+                      "u8": "int", "u16": "int", "u32": "int", "u64": "int",
+                      "s8": "int", "s16": "int", "s32": "int", "s64": "int", "int": "int"}
+
+    # Raise for an attribute that is not in the schema, even if the object type was only harvested.
+    strict = False
+
+    # Returns the API's description of an object type (see CtaPython.DescribeType).
+    describe = None
+
+    def __init__(self, types=None, described=None):
+        self.types = types if types is not None else {}
+        self.described = described if described is not None else {}
+        # object type -> {lower case enumeration value: value}, for the defined enumerations.
+        self.enums = {}
+        for objecttype in self.types:
+            for attribute, (kind, values, defined) in self.types[objecttype].items():
+                if values:
+                    self.enums[(objecttype, attribute)] = dict([(str(value).lower(), value) for value in values])
+
+        # handle -> object type
+        self.handle_types = {}
+        # (object type, attribute) of the unknown attributes already logged.
+        self.warned = set()
+        self.cache = None
+        self.key = None
+        self.version = None
+        self.modified = types is None
+
+    def __contains__(self, objecttype):
+        return objecttype.lower() in self.types
+
+    def attributes(self, objecttype):
+        """
+        Returns the sorted attribute names of an object type (empty if the type is not known).
+        """
+        return sorted(self.types.get(objecttype.lower(), {}))
+
+    def define(self, objecttype, attribute, kind="string", values=None):
+        """
+        Adds (or replaces) an attribute. Its values are checked by config and create:
+        'kind' is "int", "float", "bool" or "string", and 'values' optionally lists
+        the allowed values of an enumeration. It is saved in the cache.
+        """
+        objecttype = objecttype.lower()
+        attribute = attribute.lower()
+        values = list(values) if values is not None else None
+
+        self.types.setdefault(objecttype, {})[attribute] = [kind, values, True]
+        if values:
+            self.enums[(objecttype, attribute)] = dict([(str(value).lower(), value) for value in values])
+        else:
+            self.enums.pop((objecttype, attribute), None)
+        self.modified = True
+        self.save()
+
+    def save(self):
+        """
+        Writes the schema to its cache file.
+        """
+        if not self.cache:
+            return
+
+        entries = _read_json_cache(self.cache)
+        entries[self.key] = {"format": self.FORMAT, "version": self.version, "types": self.types, "described": self.described}
+        _write_json_cache(self.cache, entries)
+        self.modified = False
 
     #==============================================================================
-    def List2Dict(self, result):
-        # Converts a Tcl list (which is a string) into a Python dictionary.       
-
-        # Use Tcl to convert the list into a Python-friendly dict string.
-        tclcode =  "proc isnumeric value {                           \n\
-                        if {![catch {expr {abs($value)}}]} {         \n\
-                            return 1                                 \n\
-                        }                                            \n\
-                        set value [string trimleft $value 0]         \n\
-                        if {![catch {expr {abs($value)}}]} {         \n\
-                            return 1                                 \n\
-                        }                                            \n\
-                        return 0                                     \n\
-                    }                                                \n\
-                    proc tclList2Dict { args } {                     \n\
-                        set result $args                             \n\
-                        set output {}                                \n\
-                        foreach {key value} $result {                \n\
-                            regsub {^-} $key {} key                  \n\
-                            if { [isnumeric $value] } {              \n\
-                                append output \"'$key': $value, \"   \n\
-                            } else {                                 \n\
-                                regsub -all {'} $value {\\'} value   \n\
-                                regsub -all {\"} $value {\\\"} value \n\
-                                append output \"'$key': '$value', \" \n\
-                            }                                        \n\
-                        }                                            \n\
-                                                                     \n\
-                        regsub {, $} $output {} output               \n\
-                        set output [list $output]                    \n\
-                        return $output                               \n\
-                    }"
-
-        # This eval instantiates the Tcl procedures.
-        self.tcl.eval(tclcode)
-        # This eval executes the Tcl procedure and returns the result.
-        tclresult = self.tcl.eval("tclList2Dict " + result)
-
-        # This command converts the Tcl string into a dict object.
-        return ast.literal_eval(tclresult)
-
-    #==============================================================================
-    def LogCommand(self):
+    def Learn(self, objecttype, items):
+        # Adds the attributes of an object ("-name value" pairs from stc::get).
+        attributes = self.types.setdefault(objecttype, {})
+        for index in range(0, len(items) - 1, 2):
+            name = items[index].lower().lstrip("-")
+            if name in self.TREE_ATTRIBUTES or name.startswith("children-"):
+                continue
+
+            kind = self.Kind(items[index + 1])
+            entry = attributes.get(name)
+            if entry is None:
+                attributes[name] = [kind, None, False]
+            elif entry[0] != kind and kind is not None:
+                if entry[0] is None:
+                    entry[0] = kind
+                elif set((entry[0], kind)) == set(("int", "float")):
+                    entry[0] = "float"
+                else:
+                    entry[0] = "string"
+
+        self.modified = True
+
+    def Describe(self, objecttype):
+        # Reads the attributes of an object type from the API's metadata, the
+        # first time the object type is seen. Attributes added with define() are kept.
+        text = self.describe(objecttype)
+        self.described[objecttype] = False
+
+        attributes = {}
+        for match in _METADATA_PATTERN.finditer(text):
+            kind = match.group(2).lower()
+            values = match.group(3).split() if match.group(3) else None
+            attributes[match.group(1).lower()] = [self.METADATA_KINDS.get(kind, "string"), values, True]
+
+        if attributes:
+            defined = self.types.get(objecttype, {})
+            for name in defined:
+                if defined[name][2] and name not in attributes:
+                    attributes[name] = defined[name]
+            self.types[objecttype] = attributes
+            for attribute, (kind, values, defined) in attributes.items():
+                if values:
+                    self.enums[(objecttype, attribute)] = dict([(str(value).lower(), value) for value in values])
+            self.described[objecttype] = True
+            logging.info("Read the %d attributes of %s from the API", len(attributes), objecttype)
+
+        self.modified = True
+        self.save()
+
+    def Kind(self, value):
+        # The kind of a value (None for an empty value, which could be anything).
+        if value == "":
+            return None
+        elif value.lower() in ("true", "false"):
+            return "bool"
+
+        match = _NUMBER_PATTERN.match(value)
+        if match is None:
+            return "string"
+        elif match.lastindex == 2:
+            return "float"
+        return "int"
+
+    def ObjectType(self, handle):
+        # The object type of a handle or DDN path (eg: "test3" or "project1.test(2)").
+        objecttype = self.handle_types.get(handle)
+        if objecttype is None:
+            element = handle.rsplit(".", 1)[-1]
+            if "." in handle:
+                objecttype = element.split("(", 1)[0].lower()
+            else:
+                objecttype = _HANDLE_COUNTER_PATTERN.sub("", element).lower()
+            if len(self.handle_types) < 100000:
+                self.handle_types[handle] = objecttype
+        return objecttype
+
+    def Check(self, command, handle, objecttype, kwargs):
+        # Returns the attributes of a config or create call (with the enumeration
+        # values converted), or raises a CtaError for an attribute or value that
+        # the object type does not accept.
+        if objecttype is None:
+            objecttype = self.ObjectType(str(handle))
+        else:
+            objecttype = objecttype.lower()
+
+        if self.describe is not None and objecttype not in self.described:
+            self.Describe(objecttype)
+
+        attributes = self.types.get(objecttype)
+        if attributes is None:
+            return kwargs
+
+        checked = kwargs
+        for key in kwargs:
+            name = key.lower()
+            entry = attributes.get(name)
+            if entry is None:
+                if "." in name:
+                    # A DAN path (eg: userprofile.name).
+                    continue
+
+                message = "invalid attribute \"" + key + "\" for " + objecttype
+                matches = difflib.get_close_matches(name, list(attributes), 3)
+                if matches:
+                    message += " (did you mean " + " or ".join(["\"" + match + "\"" for match in matches]) + "?)"
+                if self.strict or self.described.get(objecttype):
+                    raise CtaInvalidAttributeError(message, command + " " + str(handle if handle is not None else objecttype),
+                                                   ("CTA", "INVALID_ATTRIBUTE", key, objecttype))
+
+                # Only the attributes seen on existing objects are known: let the API decide.
+                if (objecttype, name) not in self.warned:
+                    self.warned.add((objecttype, name))
+                    logging.warning("Unknown attribute, passed to the API: %s", message)
+                continue
+
+            if not entry[2]:
+                continue
+
+            value = self.CheckValue(command, objecttype, key, entry, kwargs[key])
+            if value is not kwargs[key]:
+                if checked is kwargs:
+                    checked = dict(kwargs)
+                checked[key] = value
+
+        return checked
+
+    def CheckValue(self, command, objecttype, key, entry, value):
+        if isinstance(value, TclExpr) or (isinstance(value, str) and value[:1] == "["):
+            return value
+
+        kind = entry[0]
+        enum = self.enums.get((objecttype, key.lower()))
+        if enum is not None:
+            canonical = enum.get(str(value).lower())
+            if canonical is not None:
+                return canonical
+            reason = "must be one of " + ", ".join([str(item) for item in entry[1]])
+        elif kind == "bool":
+            if isinstance(value, bool) or str(value).lower() in ("true", "false", "0", "1"):
+                return value
+            reason = "must be a boolean"
+        elif kind in ("int", "float"):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                if kind == "float" or isinstance(value, int):
+                    return value
+            elif not isinstance(value, bool):
+                match = _NUMBER_PATTERN.match(str(value))
+                if match is not None and (kind == "float" or match.lastindex != 2):
+                    return value
+            reason = "must be " + ("an integer" if kind == "int" else "a number")
+        else:
+            return value
+
+        raise CtaInvalidValueError("invalid value \"" + str(value) + "\" for attribute \"" + key + "\" of " + objecttype + ": " + reason,
+                                   command, ("CTA", "INVALID_VALUE", key, str(value)))
+
+###############################################################################
+####
+####    Asynchronous Commands
+####
+###############################################################################
+
+class CtaRequestTimeout(Exception):
+    """
+    Raised by the Future of an asynchronous command that did not complete in time.
+    """
+
+#==============================================================================
+class CtaScheduler(object):
+    """
+    Tracks the asynchronous commands started by CtaPython.perform_async, and
+    completes their Futures.
+
+    The requests are checked together by the ::cta::checkrequests Tcl proc, which
+    runs from the Tcl event loop while wait_any or wait_all is waiting.
+    """
+    # Request states of commands that have not completed yet.
+    ACTIVE_STATES = ("INIT", "PENDING", "START", "STARTING", "RUNNING", "PAUSED", "PREPARING", "WAITING")
+
+    # Seconds between checks of the pending requests.
+    poll_interval = 0.1
+
+    # The longest time (seconds) that the Tcl event loop is run at once. In threaded
+    # mode, other queued calls run between the waits.
+    max_wait = 1.0
+
+    def __init__(self, cta):
+        self.cta = cta
+        # request id -> (Future, deadline)
+        self.requests = {}
+        self.lock = threading.Lock()
+
+    def Add(self, requestid, command, timeout):
+        future = Future()
+        future.request_id = requestid
+        future.command = command
+        future.set_running_or_notify_cancel()
+
+        deadline = None if timeout is None else _monotonic() + timeout
+        with self.lock:
+            self.requests[requestid] = (future, deadline)
+
+        self.cta.Exec("::cta::watch", requestid)
+        return future
+
+    def Abandon(self, error):
+        # Fails the pending requests (their interpreter has been replaced). The lock
+        # is not taken, since the stuck interpreter may be holding it.
+        requests = self.requests
+        self.requests = {}
+        for future, deadline in list(requests.values()):
+            try:
+                future.set_exception(error)
+            except Exception:
+                # Completed by the old interpreter in the meantime.
+                pass
+
+    #==============================================================================
+    def RunOnce(self, timeout):
+        # Runs the Tcl event loop until a request completes, or the timeout (or the
+        # next request deadline) expires. Then completes the Futures.
+        with self.lock:
+            now = _monotonic()
+            wait = self.max_wait
+            if timeout is not None:
+                wait = min(wait, timeout)
+            for future, deadline in self.requests.values():
+                if deadline is not None:
+                    wait = min(wait, deadline - now)
+
+            if self.requests:
+                # Request ids are handles, which have no spaces.
+                completed = self.cta.Exec("::cta::waitrequests", max(int(wait * 1000), 0),
+                                          max(int(self.poll_interval * 1000), 1), self.ACTIVE_STATES).split()
+            else:
+                completed = ()
+
+            finished = []
+            for requestid in completed:
+                if requestid not in self.requests:
+                    continue
+                future, _ = self.requests.pop(requestid)
+                try:
+                    result = self.cta.waitUntilCommandIsDone(requestid)
+                    finished.append((future, self.cta.List2Dict(result), None))
+                except Exception as errmsg:
+                    finished.append((future, None, errmsg))
+
+            now = _monotonic()
+            for requestid, (future, deadline) in list(self.requests.items()):
+                if deadline is not None and deadline <= now:
+                    del self.requests[requestid]
+                    self.cta.Exec("::cta::unwatch", requestid)
+                    finished.append((future, None, CtaRequestTimeout("the command " + future.command + " (" + requestid + ") did not complete in time")))
+
+        # The callbacks of the Futures run here, outside the lock.
+        for future, result, error in finished:
+            if error is None:
+                future.set_result(result)
+            else:
+                future.set_exception(error)
+
+        return
+
+###############################################################################
+####
+####    Batches
+####
+###############################################################################
+
+class CtaBatchError(CtaError):
+    """
+    Raised when one or more operations of a CtaBatch fail.
+
+    'operation' is the first failed CtaBatchOperation, and 'failures' is the
+    list of all failed operations.
+    """
+    def __init__(self, failures):
+        self.failures = failures
+        self.operation = failures[0]
+
+        message = "batch operation " + str(self.operation.index) + " (" + self.operation.command + ") failed: " + self.operation.error
+        if len(failures) > 1:
+            message += " (and " + str(len(failures) - 1) + " more)"
+
+        CtaError.__init__(self, message)
+
+#==============================================================================
+class CtaBatchOperation(object):
+    """
+    A single operation queued in a CtaBatch.
+
+    Once the batch has been executed, 'result' holds the (decoded) result of the
+    operation, or 'error' holds the Tcl error message.
+    """
+    def __init__(self, batch, index, words, substitutions, decode):
+        self.batch = batch
+        self.index = index
+        self.words = words
+        self.substitutions = substitutions
+        self.decode = decode
+
+        self.executed = False
+        self.result = None
+        self.error = None
+
+    @property
+    def command(self):
+        # The Tcl command of this operation, for logs and error messages.
+        words = [_tcl_format(word) for word in self.words]
+        for position, reference, value in zip(*[iter(self.substitutions)] * 3):
+            if reference < 0:
+                words[position] = value
+            else:
+                words[position] = "${::cta::batch(" + str(reference) + ")}" + _tcl_escape(value)
+
+        return " ".join(words)
+
+    def __add__(self, suffix):
+        # Builds a DDN path from the result of this operation (eg: test + ".userprofile").
+        return CtaBatchReference(self, suffix)
+
+    def __str__(self):
+        if self.executed and self.error is None:
+            return str(self.result)
+
+        return self.command
+
+    def __repr__(self):
+        return "<CtaBatchOperation " + str(self.index) + ": " + self.command + ">"
+
+#==============================================================================
+class CtaBatchReference(object):
+    """
+    A DDN path that starts with the result of an earlier batch operation.
+    """
+    def __init__(self, operation, suffix):
+        self.operation = operation
+        self.suffix = suffix
+
+    def __add__(self, suffix):
+        return CtaBatchReference(self.operation, self.suffix + suffix)
+
+    def __str__(self):
+        return str(self.operation) + self.suffix
+
+#==============================================================================
+class CtaBatch(object):
+    """
+    Queues CtaPython calls and executes them with a single Tcl evaluation.
+    Use CtaPython.batch() to create one.
+    """
+    def __init__(self, cta, stop_on_error=True):
+        self.cta = cta
+        self.stop_on_error = stop_on_error
+        self.operations = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+        else:
+            # Nothing has been sent yet, so just discard the queued operations.
+            self.operations = []
+
+        return False
+
+    def __len__(self):
+        return len(self.operations)
+
+    #==============================================================================
+    def config(self, objecthandle, **kwargs):
         """
-        Log the calling method to the log, including its arguments.
-        """        
-        # Retrieve the args for the command.
-        posname, kwname, args = inspect.getargvalues(inspect.stack()[1][0])[-3:]
-        posargs = args.pop(posname, [])
-        args.update(args.pop(kwname, []))
+        Queues a CtaPython.config call.
+        """
+        if self.cta.schema is not None and isinstance(objecthandle, str):
+            kwargs = self.cta.schema.Check("stc::config", objecthandle, None, kwargs)
 
-        methodname = inspect.currentframe().f_back.f_code.co_name       
+        words = ["stc::config", objecthandle]
+        for key in kwargs:
+            value = kwargs[key]
+            if isinstance(value, str) and value[:1] == "[":
+                # This is a Tcl command (eg: [NULL]).
+                value = TclExpr(value)
 
-        # Output the command in a format that looks like normal Python syntax.
-        logmsg = " - Python command - " + methodname
-        arguments = ""
-        for key in args:            
-            if key != "self":                
-                value = args[key]
-                if value == "":
-                    value = '""'
+            words.append("-" + key)
+            words.append(value)
+
+        return self.Queue(words, None)
 
-                arguments += key + "=\"" + str(value) + "\", "
+    def get(self, objecthandle, *args):
+        """
+        Queues a CtaPython.get call.
+        """
+        words = ["stc::get", objecthandle] + ["-" + key for key in args]
 
-        if arguments != "":
-            # Remove the final comma and space (", ").
-            arguments = arguments[:-2]
+        if len(args) == 0:
+            return self.Queue(words, self.cta.List2Dict)
 
-        logmsg += "(" + arguments + ")"
+        return self.Queue(words, None)
 
-        logging.debug(logmsg)
-        return                
+    def perform(self, command, **kwargs):
+        """
+        Queues a CtaPython.perform call.
+        """
+        words = ["stc::perform", command]
+        for key in kwargs:
+            words.append("-" + key)
+            words.append(kwargs[key])
+
+        return self.Queue(words, self.cta.List2Dict)
+
+    def create(self, objecttype, under, **kwargs):
+        """
+        Queues a CtaPython.create call. The operation can be used as the handle of
+        the new object in later operations.
+        """
+        if self.cta.schema is not None:
+            kwargs = self.cta.schema.Check("stc::create", None, objecttype, kwargs)
+
+        words = ["stc::create", objecttype, "-under", under]
+        for key in kwargs:
+            words.append("-" + key)
+            words.append(kwargs[key])
+
+        return self.Queue(words, None)
+
+    def delete(self, handle):
+        """
+        Queues a CtaPython.delete call.
+        """
+        return self.Queue(["stc::delete", handle], None)
+
+    #==============================================================================
+    def execute(self):
+        """
+        Sends the queued operations to the interpreter as one Tcl command.
+
+        Returns the list of operation results. Raises CtaBatchError if any of the
+        operations failed.
+        """
+        operations = self.operations
+        self.operations = []
+        if not operations:
+            return []
+
+        commands = tuple([operation.words for operation in operations])
+        substitutions = tuple([operation.substitutions for operation in operations])
+
+        failed = True
+        try:
+            result = self.cta.Exec("::cta::batch", commands, substitutions, int(self.stop_on_error))
+            failed = False
+        finally:
+            if self.cta.listeners and [operation for operation in operations if operation.words[0] != "stc::get"]:
+                self.cta.NotifyListeners("batch", None, {"commands": [operation.words for operation in operations], "failed": failed})
+
+        items = self.cta.tcl.splitlist(result)
+
+        failures = []
+        for operation, code, result in zip(operations, items[0::2], items[1::2]):
+            operation.executed = True
+            if code == "1":
+                operation.error = result
+                failures.append(operation)
+            elif operation.decode:
+                operation.result = operation.decode(result)
+            else:
+                operation.result = result
+
+        if failures:
+            raise CtaBatchError(failures)
+
+        return [operation.result for operation in operations]
+
+    #==============================================================================
+    def Queue(self, words, decode):
+        # Converts the words of an operation into Tcl values. References to operations
+        # of this batch that have not been executed yet, and TclExpr values, are
+        # recorded as substitutions that the ::cta::batch proc makes when it runs.
+        substitutions = []
+        for position, value in enumerate(words):
+            if isinstance(value, str):
+                continue
+            elif isinstance(value, CtaBatchReference):
+                operation, suffix = value.operation, value.suffix
+            elif isinstance(value, CtaBatchOperation):
+                operation, suffix = value, ""
+            elif isinstance(value, TclExpr):
+                words[position] = ""
+                substitutions += [position, -1, value.script]
+                continue
+            else:
+                words[position] = _tcl_value(value)
+                continue
+
+            if operation.executed:
+                words[position] = str(operation) + suffix
+            elif operation.batch is not self:
+                raise ValueError("the operation " + repr(operation) + " belongs to another batch that has not been executed")
+            else:
+                words[position] = ""
+                substitutions += [position, operation.index, suffix]
+
+        operation = CtaBatchOperation(self, len(self.operations), tuple(words), tuple(substitutions), decode)
+        self.operations.append(operation)
+        return operation
 
 ###############################################################################
 ####
@@ -0,0 +1,876 @@
+"""
+     Spirent TestCenter Conformance Test Application - session server
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    This module keeps one or more CtaPython sessions loaded in a long-lived
+    server process, and lets short scripts use them over a Unix domain socket.
+    Scripts skip the interpreter start, the package load and (since the server
+    remembers them) the chassis connections and port reservations.
+
+    Start the server:
+
+        python CtaServer.py --api-path <api_path> [--socket <path>] [--sessions 2]
+
+    and change the import of the scripts:
+
+        from CtaServer import CtaClient as CtaPython
+
+        cta = CtaPython()
+        cta.connect("10.1.1.10")
+        test = cta.create("test", under="project1")
+
+    Protocol: each message is a 4 byte length followed by a marshal-encoded
+    (request id, kind, payload) tuple. Requests are answered as they complete,
+    so a client may have many requests in flight on one connection (eg: from
+    several threads, or with submit()).
+
+    Handles created by a client belong to it: other clients cannot use them, and
+    they are deleted when the client disconnects (unless the server was started
+    with cleanup=False). A reserved port also belongs to the client that reserved
+    it: other clients cannot reserve or release it, or disconnect its chassis.
+    Chassis connections and port reservations are kept for the next client.
+
+    The socket is only accessible to the user who started the server. The client
+    and the server must use the same Python version.
+"""
+
+import os
+import sys
+import stat
+import struct
+import socket
+import marshal
+import logging
+import argparse
+import threading
+import itertools
+
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from CtaPython import CtaPython, TclError, CtaError, CtaBulkError, CtaLedger, CtaAutoRelease
+
+# The length prefix of each message.
+_HEADER = struct.Struct("!I")
+
+# Messages larger than this are refused (they can only be a protocol error).
+_MAX_MESSAGE = 1 << 30
+
+# The methods that clients may call.
+_METHODS = ("config", "get", "get_many", "perform", "connect", "create", "delete", "disconnect",
+            "release", "reserve", "subscribe", "unsubscribe", "waitUntilCommandIsDone")
+
+def _error_classes(errorclass):
+    # The CtaError classes (that take just a message) by name.
+    classes = {}
+    if errorclass.__init__ is CtaError.__init__:
+        classes[errorclass.__name__] = errorclass
+    for subclass in errorclass.__subclasses__():
+        classes.update(_error_classes(subclass))
+    return classes
+
+# The exceptions that are raised again, with the same type, by the client.
+_EXCEPTIONS = {"TclError": TclError, "ValueError": ValueError, "TypeError": TypeError, "KeyError": KeyError}
+_EXCEPTIONS.update(_error_classes(CtaError))
+
+def default_socket_path():
+    """
+    Returns the socket path from CTA_SERVER_SOCKET, or ~/Spirent/CTA/cta.sock.
+    """
+    if os.environ.get("CTA_SERVER_SOCKET"):
+        return os.environ["CTA_SERVER_SOCKET"]
+
+    return os.path.join(os.path.expanduser("~"), "Spirent", "CTA", "cta.sock")
+
+class CtaServerError(RuntimeError):
+    """
+    Raised by the client when the server refuses a call, or the connection fails.
+    """
+    pass
+
+###############################################################################
+####
+####    Messages
+####
+###############################################################################
+
+def _send(connection, lock, message):
+    data = marshal.dumps(message)
+    with lock:
+        connection.sendall(_HEADER.pack(len(data)) + data)
+
+def _receive(connection):
+    # Returns the next message, or None if the connection is closed.
+    header = _receive_exactly(connection, _HEADER.size)
+    if header is None:
+        return None
+
+    length = _HEADER.unpack(header)[0]
+    if length > _MAX_MESSAGE:
+        raise CtaServerError("message too large (" + str(length) + " bytes)")
+
+    data = _receive_exactly(connection, length)
+    if data is None:
+        return None
+
+    return marshal.loads(data)
+
+def _receive_exactly(connection, size):
+    chunks = []
+    while size > 0:
+        chunk = connection.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+
+    return b"".join(chunks)
+
+def _plain(value):
+    # Converts a value into types that marshal can encode.
+    if value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return value
+    elif isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    elif isinstance(value, dict):
+        return dict([(str(key), _plain(value[key])) for key in value])
+
+    return str(value)
+
+###############################################################################
+####
+####    Server
+####
+###############################################################################
+
+class CtaServerSession(object):
+    """
+    One CtaPython session of the server, and what its clients have created.
+    """
+    def __init__(self, index, cta):
+        self.index = index
+        self.cta = cta
+        self.lock = threading.Lock()
+        self.clients = 0
+
+        # handle -> client id, for the objects and subscriptions created by the clients.
+        self.owners = {}
+        # The chassis (address -> handle) that the session is connected to, and the
+        # ports (location -> [handle, client id]) that it has reserved. The handle is
+        # None while the reservation is in progress, and the client id is None for
+        # a port kept from a client that has disconnected.
+        self.connected = {}
+        self.reserved = {}
+
+#==============================================================================
+class CtaServerClient(threading.Thread):
+    """
+    Reads the requests of one client connection, and sends the results as the
+    calls complete.
+    """
+    def __init__(self, server, connection, clientid):
+        threading.Thread.__init__(self, name="CtaServerClient" + str(clientid))
+        self.daemon = True
+
+        self.server = server
+        self.connection = connection
+        self.clientid = clientid
+        self.lock = threading.Lock()
+        self.session = None
+        self.handles = []
+        self.calls = 0
+
+    #==============================================================================
+    def run(self):
+        try:
+            while True:
+                message = _receive(self.connection)
+                if message is None:
+                    break
+
+                requestid, kind, payload = message
+                if kind == "hello":
+                    self.Hello(requestid, payload)
+                elif kind == "call":
+                    self.Call(requestid, payload)
+                else:
+                    self.Send(requestid, "error", ("CtaServerError", "unknown request: " + str(kind)))
+
+        except Exception as errmsg:
+            logging.error("CtaServer client %d: %s", self.clientid, errmsg)
+
+        finally:
+            self.Disconnect()
+
+    def Hello(self, requestid, payload):
+        if tuple(payload.get("python", ())) != tuple(sys.version_info[:2]):
+            self.Send(requestid, "error", ("CtaServerError", "the client and the server must use the same Python version (server: " +
+                                           ".".join([str(part) for part in sys.version_info[:2]]) + ")"))
+            return
+
+        try:
+            self.session = self.server.Attach(payload.get("session"))
+        except Exception as errmsg:
+            self.Send(requestid, "error", ("CtaServerError", str(errmsg)))
+            return
+
+        logging.info("CtaServer client %d attached to session %d", self.clientid, self.session.index)
+        self.Send(requestid, "ready", {"client": self.clientid, "session": self.session.index})
+
+    def Call(self, requestid, payload):
+        method, args, kwargs = payload
+        session = self.session
+        if session is None:
+            self.Send(requestid, "error", ("CtaServerError", "the client has not sent hello"))
+            return
+
+        if method not in _METHODS:
+            self.Send(requestid, "error", ("CtaServerError", "the method " + str(method) + " cannot be called through the server"))
+            return
+
+        try:
+            self.CheckHandles(session, method, args, kwargs)
+        except CtaServerError as errmsg:
+            self.Send(requestid, "error", ("CtaServerError", str(errmsg)))
+            return
+
+        self.calls += 1
+        if method in ("connect", "disconnect", "reserve", "release"):
+            try:
+                with session.lock:
+                    done, result = self.Claim(session, method, args[0])
+            except CtaServerError as errmsg:
+                self.Send(requestid, "error", ("CtaServerError", str(errmsg)))
+                return
+
+            if done:
+                self.Send(requestid, "result", result)
+                return
+
+        future = session.cta.submit(method, *args, **kwargs)
+        future.add_done_callback(lambda future: self.Done(requestid, method, args, future))
+
+    def Claim(self, session, method, item):
+        # Checks a connect, disconnect, reserve or release against what the session
+        # holds. Returns (True, result) if there is nothing to send, or (False, None).
+        # Called with the session lock.
+        if method == "connect":
+            if item in session.connected:
+                return True, session.connected[item]
+
+        elif method == "disconnect":
+            for location, (handle, owner) in session.reserved.items():
+                if owner not in (None, self.clientid) and session.cta.ledger.Address(location) == item:
+                    raise CtaServerError("another client has reserved ports on " + item)
+
+        elif method == "reserve":
+            entry = session.reserved.get(item)
+            if entry is None:
+                # Claim the port until the result arrives.
+                session.reserved[item] = [None, self.clientid]
+            elif entry[1] not in (None, self.clientid):
+                raise CtaServerError("the port " + item + " is reserved by another client")
+            elif entry[0] is not None:
+                entry[1] = self.clientid
+                return True, entry[0]
+
+        elif method == "release":
+            entry = session.reserved.get(item)
+            if entry is not None and entry[1] not in (None, self.clientid):
+                raise CtaServerError("the port " + item + " is reserved by another client")
+
+        return False, None
+
+    def Done(self, requestid, method, args, future):
+        # Runs on the worker thread of the session, as each call completes.
+        error = future.exception()
+        if error is not None:
+            if method == "reserve":
+                with self.session.lock:
+                    entry = self.session.reserved.get(args[0])
+                    if entry is not None and entry[0] is None:
+                        del self.session.reserved[args[0]]
+            name = type(error).__name__
+            self.Send(requestid, "error", (name, str(error)))
+            return
+
+        result = future.result()
+        session = self.session
+        with session.lock:
+            if method in ("create", "subscribe"):
+                session.owners[str(result)] = self.clientid
+                self.handles.append((str(result), method))
+            elif method in ("delete", "unsubscribe"):
+                session.owners.pop(str(args[0]), None)
+            elif method == "connect":
+                session.connected[args[0]] = result
+            elif method == "disconnect":
+                # Disconnecting also releases the ports of the chassis.
+                session.connected.pop(args[0], None)
+                for location in list(session.reserved):
+                    if session.cta.ledger.Address(location) == args[0]:
+                        del session.reserved[location]
+            elif method == "reserve":
+                session.reserved[args[0]] = [result, self.clientid]
+            elif method == "release":
+                session.reserved.pop(args[0], None)
+
+        self.Send(requestid, "result", _plain(result))
+
+    def CheckHandles(self, session, method, args, kwargs):
+        # Refuses calls on the handles that belong to other clients.
+        if method in ("config", "get", "delete", "unsubscribe", "create"):
+            handles = list(args[:1])
+            if method == "create":
+                handles = [kwargs.get("under", args[1] if len(args) > 1 else "")]
+        elif method == "get_many":
+            handles = list(args[0]) if args else list(kwargs.get("handles", ()))
+        else:
+            return
+
+        with session.lock:
+            for handle in handles:
+                owner = session.owners.get(str(handle).split(".", 1)[0])
+                if owner is not None and owner != self.clientid:
+                    raise CtaServerError(str(handle) + " belongs to another client")
+
+    def Send(self, requestid, kind, payload):
+        try:
+            _send(self.connection, self.lock, (requestid, kind, payload))
+        except Exception as errmsg:
+            # The client has gone; its requests are finished by Disconnect.
+            logging.debug("CtaServer client %d: %s", self.clientid, errmsg)
+
+    def Disconnect(self):
+        try:
+            self.connection.close()
+        except Exception:
+            pass
+
+        session = self.session
+        if session is None:
+            return
+
+        with session.lock:
+            handles = [(handle, method) for handle, method in self.handles if session.owners.get(handle) == self.clientid]
+            for handle, method in handles:
+                del session.owners[handle]
+            # The reservations are kept for the next client.
+            for entry in session.reserved.values():
+                if entry[1] == self.clientid:
+                    entry[1] = None
+            session.clients -= 1
+
+        if self.server.cleanup:
+            # Newest first, so that children go before their parents.
+            for handle, method in reversed(handles):
+                session.cta.submit("unsubscribe" if method == "subscribe" else "delete", handle)
+
+        logging.info("CtaServer client %d detached (%d calls, %d handles released)", self.clientid, self.calls, len(handles))
+
+#==============================================================================
+class CtaServer(object):
+
+    def __init__(self, socket_path=None, api_path=None, sessions=1, log_path=None, log_level="INFO", cleanup=True):
+        """
+        Load the Conformance API in each session, and listen on the socket.
+
+        'socket_path' optionally specifies the Unix domain socket (see default_socket_path).
+        'api_path', 'log_path' and 'log_level' are passed to CtaPython. Logging is
+                   server-wide: CtaPython logs with the root logger, so all of the
+                   sessions write to the one log file in 'log_path'.
+        'sessions' specifies the number of CtaPython sessions. A client uses the
+                   session it asks for, or the session with the fewest clients.
+        'cleanup' specifies whether the objects created by a client are deleted when
+                   it disconnects.
+
+        Returns None.
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self.cleanup = cleanup
+        self.lock = threading.Lock()
+        self.clientids = itertools.count(1)
+        self.closed = False
+
+        self.sessions = []
+        for index in range(sessions):
+            cta = CtaPython(api_path=api_path, log_path=log_path, log_level=log_level, threaded=True)
+            self.sessions.append(CtaServerSession(index, cta))
+            # The other sessions share the log directory of the first one.
+            log_path = cta.log_path
+
+        directory = os.path.dirname(self.socket_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        if os.path.exists(self.socket_path):
+            # Left by a server that did not exit cleanly.
+            os.remove(self.socket_path)
+
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.socket_path)
+        os.chmod(self.socket_path, stat.S_IRUSR | stat.S_IWUSR)
+        self.listener.listen(64)
+
+        logging.info("CtaServer listening on %s with %d session(s)", self.socket_path, len(self.sessions))
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    ###############################################################################
+    ####
+    ####    Public Methods
+    ####
+    ###############################################################################
+
+    def serve_forever(self):
+        """
+        Accepts client connections until close() is called.
+        """
+        while not self.closed:
+            try:
+                connection, _ = self.listener.accept()
+            except (OSError, socket.error):
+                if self.closed:
+                    return
+                raise
+
+            client = CtaServerClient(self, connection, next(self.clientids))
+            client.start()
+
+    def start(self):
+        """
+        Accepts client connections on a background thread, and returns the thread.
+        """
+        thread = threading.Thread(target=self.serve_forever, name="CtaServer")
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def close(self):
+        """
+        Stops accepting clients, and closes the sessions.
+        """
+        if self.closed:
+            return
+
+        self.closed = True
+        try:
+            self.listener.shutdown(socket.SHUT_RDWR)
+        except (OSError, socket.error):
+            pass
+        self.listener.close()
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+        for session in self.sessions:
+            session.cta.close()
+
+    #==============================================================================
+    def Attach(self, index):
+        # Returns the session for a new client.
+        with self.lock:
+            if index is None:
+                session = min(self.sessions, key=lambda session: session.clients)
+            elif 0 <= index < len(self.sessions):
+                session = self.sessions[index]
+            else:
+                raise CtaServerError("there is no session " + str(index))
+
+            session.clients += 1
+            return session
+
+###############################################################################
+####
+####    Client
+####
+###############################################################################
+
+class CtaClient(object):
+
+    def __init__(self, api_path=None, log_path=None, log_level=None, socket_path=None, session=None, timeout=None, **kwargs):
+        """
+        Connect to a CtaServer. A script can use CtaClient instead of CtaPython with
+        "from CtaServer import CtaClient as CtaPython", if it only uses these methods:
+
+            config, get, get_many, perform, connect, create, delete, disconnect,
+            release, reserve, subscribe, unsubscribe, waitUntilCommandIsDone,
+            connect_many, disconnect_many, reserve_many, release_many, held,
+            auto_release, submit and the submit_<method> shortcuts, and close.
+
+        The other CtaPython methods (eg: batch, perform_async, object, index, stream,
+        snapshot, export) return objects that work with the interpreter of the
+        process, so they raise AttributeError.
+
+        'api_path', 'log_path', 'log_level' and other CtaPython arguments are ignored:
+                   the server has already loaded the API.
+        'socket_path' optionally specifies the server socket (see default_socket_path).
+        'session' optionally specifies the index of the server session to use.
+        'timeout' optionally specifies how long (seconds) to wait for each result.
+
+        Returns None.
+        """
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+
+        self.connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.connection.connect(self.socket_path)
+
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+        self.requestids = itertools.count(1)
+        # requestid -> Future, for the requests in flight.
+        self.pending = {}
+        self.closed = False
+
+        # The chassis and ports held through this client.
+        self.ledger = CtaLedger()
+
+        self.reader = threading.Thread(target=self.Read, name="CtaClient")
+        self.reader.daemon = True
+        self.reader.start()
+
+        ready = self.Request("hello", {"session": session, "python": list(sys.version_info[:2])}).result(timeout)
+        self.client = ready["client"]
+        self.session = ready["session"]
+        return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    ###############################################################################
+    ####
+    ####    Public Methods
+    ####
+    ###############################################################################
+
+    def config(self, objecthandle, **kwargs):
+        """
+        CtaPython.config, in the server session.
+        """
+        return self.call("config", objecthandle, **kwargs)
+
+    def get(self, objecthandle, *args):
+        """
+        CtaPython.get, in the server session.
+        """
+        return self.call("get", objecthandle, *args)
+
+    def get_many(self, handles, attributes=None, numpy=False):
+        """
+        CtaPython.get_many, in the server session (the NumPy arrays are made by the client).
+        """
+        columns = self.call("get_many", list(handles), None if attributes is None else list(attributes))
+        if numpy:
+            for attribute in columns:
+                if attribute not in ("handle", "error"):
+                    columns[attribute] = CtaPython.__dict__["NumericColumn"](self, columns[attribute])
+        return columns
+
+    def perform(self, command, **kwargs):
+        """
+        CtaPython.perform, in the server session.
+        """
+        return self.call("perform", command, **kwargs)
+
+    def connect(self, ipAddress):
+        """
+        CtaPython.connect, in the server session (if the session is already connected, the chassis handle is returned).
+        """
+        return self.call("connect", ipAddress)
+
+    def create(self, objecttype, under, **kwargs):
+        """
+        CtaPython.create, in the server session.
+        """
+        return self.call("create", objecttype, under, **kwargs)
+
+    def delete(self, handle):
+        """
+        CtaPython.delete, in the server session.
+        """
+        return self.call("delete", handle)
+
+    def disconnect(self, ipAddress):
+        """
+        CtaPython.disconnect, in the server session.
+        """
+        return self.call("disconnect", ipAddress)
+
+    def release(self, location):
+        """
+        CtaPython.release, in the server session. Raises CtaServerError if another client
+        has reserved the port.
+        """
+        return self.call("release", location)
+
+    def reserve(self, location):
+        """
+        CtaPython.reserve, in the server session. If the session already holds the port,
+        its handle is returned. Raises CtaServerError if another client has reserved it.
+        """
+        return self.call("reserve", location)
+
+    def subscribe(self, side, viewAttributesList):
+        """
+        CtaPython.subscribe, in the server session.
+        """
+        return self.call("subscribe", side, viewAttributesList)
+
+    def unsubscribe(self, handle):
+        """
+        CtaPython.unsubscribe, in the server session.
+        """
+        return self.call("unsubscribe", handle)
+
+    def waitUntilCommandIsDone(self, requestId=""):
+        """
+        CtaPython.waitUntilCommandIsDone, in the server session.
+        """
+        return self.call("waitUntilCommandIsDone", requestId)
+
+    def connect_many(self, ipAddresses, strict=True):
+        """
+        CtaPython.connect_many, in the server session. The calls are sent together,
+        and the results are collected as they arrive.
+        """
+        return self.Many("connect_many", "connect", ipAddresses, strict)
+
+    def disconnect_many(self, ipAddresses=None, strict=True):
+        """
+        CtaPython.disconnect_many, in the server session (by default, the chassis connected through this client).
+        """
+        if ipAddresses is None:
+            ipAddresses = list(self.ledger.chassis)
+        return self.Many("disconnect_many", "disconnect", ipAddresses, strict)
+
+    def reserve_many(self, locations, skip_held=True, strict=True):
+        """
+        CtaPython.reserve_many, in the server session.
+        """
+        held = self.ledger.Snapshot()["ports"] if skip_held else {}
+        results = self.Many("reserve_many", "reserve", [location for location in locations if location not in held], False)
+        results = OrderedDict([(location, held[location] if location in held else results[location]) for location in locations])
+        return self.CheckResults("reserve_many", results, strict)
+
+    def release_many(self, locations=None, strict=True):
+        """
+        CtaPython.release_many, in the server session (by default, the ports reserved through this client).
+        """
+        if locations is None:
+            locations = list(self.ledger.ports)
+        return self.Many("release_many", "release", locations, strict)
+
+    def held(self):
+        """
+        CtaPython.held: the chassis and ports held through this client.
+        """
+        return self.ledger.Snapshot()
+
+    def auto_release(self, disconnect=True, signals=None):
+        """
+        CtaPython.auto_release, for the ports reserved through this client.
+        """
+        return CtaAutoRelease(self, disconnect, signals)
+
+    #==============================================================================
+    def submit(self, method, *args, **kwargs):
+        """
+        Description
+            Sends a call to the server and returns a Future for its result.
+
+        Syntax
+            cta.submit(<methodName>, [<argument>, ...])
+
+        Comments
+            Any number of calls may be in flight at once. The server runs the calls
+            of a session in order, and sends each result as soon as it is ready.
+
+        Return Value
+            concurrent.futures.Future
+
+        Example
+            futures = [cta.submit("get", port, "status") for port in ports]
+            statuses = [future.result() for future in futures]
+        """
+        future = Future()
+        if method in ("connect", "disconnect", "reserve", "release") and args:
+            # Read updates the ledger before the result is set.
+            future.ledger_update = (method, args[0])
+        return self.Request("call", (method, [_plain(arg) for arg in args], _plain(kwargs)), future)
+
+    def submit_config(self, objecthandle, **kwargs):
+        return self.submit("config", objecthandle, **kwargs)
+
+    def submit_get(self, objecthandle, *args):
+        return self.submit("get", objecthandle, *args)
+
+    def submit_get_many(self, handles, attributes=None):
+        return self.submit("get_many", list(handles), None if attributes is None else list(attributes))
+
+    def submit_perform(self, command, **kwargs):
+        return self.submit("perform", command, **kwargs)
+
+    def submit_connect(self, ipAddress):
+        return self.submit("connect", ipAddress)
+
+    def submit_create(self, objecttype, under, **kwargs):
+        return self.submit("create", objecttype, under, **kwargs)
+
+    def submit_delete(self, handle):
+        return self.submit("delete", handle)
+
+    def submit_disconnect(self, ipAddress):
+        return self.submit("disconnect", ipAddress)
+
+    def submit_release(self, location):
+        return self.submit("release", location)
+
+    def submit_reserve(self, location):
+        return self.submit("reserve", location)
+
+    def call(self, method, *args, **kwargs):
+        """
+        Calls a method in the server session and returns its result.
+        """
+        return self.submit(method, *args, **kwargs).result(self.timeout)
+
+    def close(self):
+        """
+        Disconnects from the server. The objects created by this client are deleted
+        (unless the server was started with cleanup=False).
+        """
+        if self.closed:
+            return
+
+        self.closed = True
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except (OSError, socket.error):
+            pass
+        self.connection.close()
+        self.reader.join()
+
+    def __getattr__(self, name):
+        # Only called for attributes that have not been set.
+        if not name.startswith("_") and hasattr(CtaPython, name):
+            raise AttributeError("CtaClient does not support " + name + "(), which needs the interpreter in this process")
+        raise AttributeError(name)
+
+    #==============================================================================
+    def Many(self, command, method, items, strict):
+        # Sends the calls for all of the items, then collects the results in order.
+        futures = [(item, self.submit(method, item)) for item in items]
+        results = OrderedDict()
+        for item, future in futures:
+            try:
+                results[item] = future.result(self.timeout)
+            except (TclError, CtaServerError) as errmsg:
+                results[item] = errmsg
+
+        return self.CheckResults(command, results, strict)
+
+    def CheckResults(self, command, results, strict):
+        failures = OrderedDict([(item, results[item]) for item in results if isinstance(results[item], Exception)])
+        if strict and failures:
+            raise CtaBulkError(command, results, failures)
+        return results
+
+    def UpdateLedger(self, method, item, result):
+        if method == "connect":
+            self.ledger.Connected(item, result)
+        elif method == "disconnect":
+            self.ledger.Disconnected(item)
+        elif method == "reserve":
+            self.ledger.Reserved(item, result)
+        else:
+            self.ledger.Released(item)
+
+    def Request(self, kind, payload, future=None):
+        if future is None:
+            future = Future()
+        with self.lock:
+            if self.closed:
+                raise CtaServerError("the client is closed")
+
+            requestid = next(self.requestids)
+            self.pending[requestid] = future
+
+        try:
+            _send(self.connection, self.send_lock, (requestid, kind, payload))
+        except Exception as errmsg:
+            with self.lock:
+                self.pending.pop(requestid, None)
+            raise CtaServerError("cannot send to the server: " + str(errmsg))
+
+        return future
+
+    def Read(self):
+        # Receives the results, and completes their Futures.
+        error = "the connection to the server is closed"
+        try:
+            while True:
+                message = _receive(self.connection)
+                if message is None:
+                    break
+
+                requestid, kind, payload = message
+                with self.lock:
+                    future = self.pending.pop(requestid, None)
+                if future is None:
+                    continue
+
+                if kind == "error":
+                    name, text = payload
+                    future.set_exception(_EXCEPTIONS.get(name, CtaServerError)(text))
+                else:
+                    update = getattr(future, "ledger_update", None)
+                    if update is not None:
+                        self.UpdateLedger(update[0], update[1], payload)
+                    future.set_result(payload)
+
+        except Exception as errmsg:
+            error = str(errmsg)
+
+        with self.lock:
+            pending = list(self.pending.values())
+            self.pending = {}
+
+        for future in pending:
+            future.set_exception(CtaServerError(error))
+
+###############################################################################
+####
+####    Main
+####
+###############################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve CtaPython sessions over a Unix domain socket.")
+    parser.add_argument("--api-path", help="The Conformance Application API installation.")
+    parser.add_argument("--socket", help="The socket path (default: $CTA_SERVER_SOCKET or ~/Spirent/CTA/cta.sock).")
+    parser.add_argument("--sessions", type=int, default=1, help="Number of CtaPython sessions.")
+    parser.add_argument("--log-path", help="The CtaPython log directory.")
+    parser.add_argument("--log-level", default="INFO", help="The CtaPython log level.")
+    parser.add_argument("--no-cleanup", action="store_true", help="Keep the objects created by clients when they disconnect.")
+    options = parser.parse_args()
+
+    server = CtaServer(options.socket, options.api_path, options.sessions, options.log_path, options.log_level, not options.no_cleanup)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+    Batch benchmark
+    ~~~~~~~~~~~~~~~
+
+    Builds a project with individual CtaPython calls and with a CtaBatch, using
+    the stand-in stc package in benchmarks/standin, and reports the speedup.
+
+    Each project object is one "create" followed by one "config".
+
+    A batch saves the per-call cost on the Python side of each command: the
+    method call, the Tcl call, logging (at DEBUG) and, with --threaded, the
+    hand-off to the worker thread. It does not save the work of the stc
+    commands themselves, which dominates with the stand-in at INFO.
+
+    Usage:
+        python benchmarks/bench_batch.py [--objects 2000] [--log-level INFO] [--threaded]
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from CtaPython import CtaPython
+
+STANDIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "standin")
+
+def build_individual(cta, objects):
+    for index in range(objects):
+        test = cta.create("test", under="project1", name="Test " + str(index))
+        cta.config(test, description="Test number " + str(index), testType="deviceComplex")
+
+def build_batch(cta, objects):
+    with cta.batch() as batch:
+        for index in range(objects):
+            test = batch.create("test", under="project1", name="Test " + str(index))
+            batch.config(test, description="Test number " + str(index), testType="deviceComplex")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CtaPython batches.")
+    parser.add_argument("--objects", type=int, default=2000, help="Number of objects to create.")
+    parser.add_argument("--log-level", default="INFO", help="CtaPython log level.")
+    parser.add_argument("--threaded", action="store_true", help="Use a threaded CtaPython object.")
+    options = parser.parse_args()
+
+    cta = CtaPython(api_path=STANDIN_PATH, log_path=tempfile.mkdtemp(), log_level=options.log_level, threaded=options.threaded)
+
+    timings = {}
+    for name, build in (("individual", build_individual), ("batch", build_batch)):
+        start = time.time()
+        build(cta, options.objects)
+        timings[name] = time.time() - start
+
+    print("{} objects ({} Tcl commands), log level {}{}:".format(options.objects, options.objects * 2, options.log_level,
+                                                               ", threaded" if options.threaded else ""))
+    print("    individual calls : {:8.3f} s".format(timings["individual"]))
+    print("    one batch        : {:8.3f} s".format(timings["batch"]))
+    print("    speedup          : {:8.1f}x".format(timings["individual"] / timings["batch"]))
+
+    cta.close()
+
+if __name__ == "__main__":
+    main()
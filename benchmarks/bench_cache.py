@@ -0,0 +1,76 @@
+"""
+    Attribute cache benchmark
+    ~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Measures get() with and without the attribute cache (see enable_cache),
+    using the stand-in stc package in benchmarks/standin.
+
+    Before timing anything, it checks that changes made through another name
+    invalidate the cached results (a config with a DDN path, or with a DAN
+    attribute), and exits with status 1 if a stale result is served.
+
+    Usage:
+        python benchmarks/bench_cache.py [--number 20000] [--repeat 5]
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+import timeit
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from CtaPython import CtaPython
+
+STANDIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "standin")
+
+def check_invalidation(cta):
+    # Returns the list of stale results (empty if the cache is consistent).
+    test = cta.create("test", under="project1", name="T")
+    profile = cta.create("userprofile", under=test, name="U")
+
+    stale = []
+    cta.get(profile, "name")
+    cta.config("project1.test.userprofile", name="DDN")
+    if cta.get(profile, "name") != "DDN":
+        stale.append("config with a DDN path")
+
+    cta.get(test, "name")
+    cta.config("project1", **{"test.name": "DAN"})
+    if cta.get(test, "name") != "DAN":
+        stale.append("config with a DAN attribute")
+
+    cta.delete(test)
+    return stale
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CtaPython attribute cache.")
+    parser.add_argument("--number", type=int, default=20000, help="Calls per timing repetition.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timing repetitions.")
+    options = parser.parse_args()
+
+    cta = CtaPython(api_path=STANDIN_PATH, log_path=tempfile.mkdtemp(), log_level="WARNING")
+    cta.enable_cache()
+
+    stale = check_invalidation(cta)
+    for change in stale:
+        print("STALE: the cache was not invalidated by a " + change)
+    if stale:
+        sys.exit(1)
+
+    def measure(function):
+        return min(timeit.repeat(function, number=options.number, repeat=options.repeat)) / options.number * 1e6
+
+    cached = measure(lambda: cta.get("project1", "name"))
+    cta.disable_cache()
+    uncached = measure(lambda: cta.get("project1", "name"))
+
+    print("get() in microseconds:")
+    print("    without cache : {:8.2f}".format(uncached))
+    print("    cache hit     : {:8.2f}".format(cached))
+
+if __name__ == "__main__":
+    main()
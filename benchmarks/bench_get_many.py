@@ -0,0 +1,65 @@
+"""
+    get_many benchmark
+    ~~~~~~~~~~~~~~~~~~
+
+    Reads the same attributes from many objects with individual get calls and
+    with one get_many call, using the stand-in stc package in benchmarks/standin,
+    and reports the speedup.
+
+    Usage:
+        python benchmarks/bench_get_many.py [--objects 2000] [--log-level INFO]
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from CtaPython import CtaPython
+
+STANDIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "standin")
+
+ATTRIBUTES = ["location", "online", "speed"]
+
+def read_individual(cta, handles):
+    columns = dict([(attribute, []) for attribute in ATTRIBUTES])
+    for handle in handles:
+        for attribute in ATTRIBUTES:
+            columns[attribute].append(cta.get(handle, attribute))
+    return columns
+
+def read_get_many(cta, handles):
+    return cta.get_many(handles, ATTRIBUTES)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CtaPython.get_many.")
+    parser.add_argument("--objects", type=int, default=2000, help="Number of objects to read.")
+    parser.add_argument("--log-level", default="INFO", help="CtaPython log level.")
+    options = parser.parse_args()
+
+    cta = CtaPython(api_path=STANDIN_PATH, log_path=tempfile.mkdtemp(), log_level=options.log_level)
+
+    handles = []
+    with cta.batch() as batch:
+        for index in range(options.objects):
+            handles.append(batch.create("port", under="project1", location="//10.1.1.1/1/" + str(index), online="true", speed=1000))
+    handles = [handle.result for handle in handles]
+
+    timings = {}
+    for name, read in (("individual", read_individual), ("get_many", read_get_many)):
+        start = time.time()
+        read(cta, handles)
+        timings[name] = time.time() - start
+
+    print("{} objects x {} attributes, log level {}:".format(options.objects, len(ATTRIBUTES), options.log_level))
+    print("    individual gets : {:8.3f} s".format(timings["individual"]))
+    print("    one get_many    : {:8.3f} s".format(timings["get_many"]))
+    print("    speedup         : {:8.1f}x".format(timings["individual"] / timings["get_many"]))
+
+if __name__ == "__main__":
+    main()
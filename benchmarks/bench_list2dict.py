@@ -0,0 +1,135 @@
+"""
+    List2Dict benchmark
+    ~~~~~~~~~~~~~~~~~~~
+
+    Compares the original List2Dict implementation (Tcl procs that build a
+    Python literal, followed by ast.literal_eval) with the native list
+    decoding now used by CtaPython.List2Dict.
+
+    Only a Tcl interpreter is required; the Conformance Application is not.
+
+    Usage:
+        python benchmarks/bench_list2dict.py [--sizes 10,100,1000] [--repeat 5]
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+import ast
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from CtaPython import CtaPython, Tcl
+
+###############################################################################
+####
+####    The original implementation (for comparison only).
+####
+###############################################################################
+
+LEGACY_PROCS = "proc isnumeric value {                           \n\
+                    if {![catch {expr {abs($value)}}]} {         \n\
+                        return 1                                 \n\
+                    }                                            \n\
+                    set value [string trimleft $value 0]         \n\
+                    if {![catch {expr {abs($value)}}]} {         \n\
+                        return 1                                 \n\
+                    }                                            \n\
+                    return 0                                     \n\
+                }                                                \n\
+                proc tclList2Dict { args } {                     \n\
+                    set result $args                             \n\
+                    set output {}                                \n\
+                    foreach {key value} $result {                \n\
+                        regsub {^-} $key {} key                  \n\
+                        if { [isnumeric $value] } {              \n\
+                            append output \"'$key': $value, \"   \n\
+                        } else {                                 \n\
+                            regsub -all {'} $value {\\'} value   \n\
+                            regsub -all {\"} $value {\\\"} value \n\
+                            append output \"'$key': '$value', \" \n\
+                        }                                        \n\
+                    }                                            \n\
+                                                                 \n\
+                    regsub {, $} $output {} output               \n\
+                    set output [list $output]                    \n\
+                    return $output                               \n\
+                }"
+
+def legacy_list2dict(tcl, result):
+    tcl.eval(LEGACY_PROCS)
+    tclresult = tcl.eval("tclList2Dict " + result)
+    return ast.literal_eval(tclresult)
+
+###############################################################################
+####
+####    Test data
+####
+###############################################################################
+
+def make_result(tcl, size):
+    """
+    Build a "-key value" Tcl list, similar to an "stc::get <handle>" result.
+    """
+    samples = ["1", "0", "1500", "-42", "3.25", "1e5", "0x1F", "true", "project1",
+               "Port 1/1", "10.1.1.1", "", "client", "NONE"]
+    words = []
+    for index in range(size):
+        words.append("-attribute" + str(index))
+        words.append(samples[index % len(samples)])
+
+    return tcl_list(tcl, words)
+
+def tcl_list(tcl, words):
+    """
+    Return the string representation of a Tcl list built from 'words'.
+    """
+    tcl.call("set", "::benchmark_list", tuple(words))
+    return tcl.eval("set ::benchmark_list")
+
+# Values the legacy implementation cannot decode correctly.
+TRICKY_VALUES = ["it's", 'say "hi"', "{braced}", "[clock seconds]", "back\\slash", "007", "a}b"]
+
+###############################################################################
+####
+####    Main
+####
+###############################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CtaPython.List2Dict.")
+    parser.add_argument("--sizes", default="10,100,1000", help="Comma separated number of attributes.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timing repetitions.")
+    options = parser.parse_args()
+
+    # List2Dict only needs the interpreter, so skip loading the Conformance Application.
+    cta = CtaPython.__new__(CtaPython)
+    cta.tcl = Tcl()
+
+    print("{:>8} {:>14} {:>14} {:>10}".format("attrs", "legacy (us)", "native (us)", "speedup"))
+    for size in [int(size) for size in options.sizes.split(",")]:
+        result = make_result(cta.tcl, size)
+        assert legacy_list2dict(cta.tcl, result) == cta.List2Dict(result)
+
+        number = max(1, 20000 // size)
+        legacy = min(timeit.repeat(lambda: legacy_list2dict(cta.tcl, result), number=number, repeat=options.repeat)) / number
+        native = min(timeit.repeat(lambda: cta.List2Dict(result), number=number, repeat=options.repeat)) / number
+
+        print("{:>8} {:>14.1f} {:>14.1f} {:>9.0f}x".format(size, legacy * 1e6, native * 1e6, legacy / native))
+
+    print("")
+    print("Correctness on values with quotes, braces and brackets:")
+    for value in TRICKY_VALUES:
+        result = tcl_list(cta.tcl, ["-value", value])
+        try:
+            legacy = repr(legacy_list2dict(cta.tcl, result)["value"])
+        except Exception as errmsg:
+            legacy = "ERROR: " + str(errmsg).splitlines()[0]
+
+        print("    {:<20} legacy={:<40} native={}".format(repr(value), legacy, repr(cta.List2Dict(result)["value"])))
+
+if __name__ == "__main__":
+    main()
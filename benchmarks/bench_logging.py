@@ -0,0 +1,107 @@
+"""
+    Logging overhead benchmark
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Measures the per-call logging overhead of the public CtaPython methods at
+    each log level, and compares it with the original inspect.stack() based
+    LogCommand.
+
+    The Tcl evaluation is replaced with a no-op, so only the Python-side cost
+    of logging is measured. DEBUG messages are written to os.devnull.
+
+    Usage:
+        python benchmarks/bench_logging.py [--number 20000] [--repeat 5]
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+import timeit
+import inspect
+import logging
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from CtaPython import CtaPython
+
+###############################################################################
+####
+####    The original implementation (for comparison only).
+####
+###############################################################################
+
+def legacy_logcommand():
+    posname, kwname, args = inspect.getargvalues(inspect.stack()[1][0])[-3:]
+    posargs = args.pop(posname, [])
+    args.update(args.pop(kwname, []))
+
+    methodname = inspect.currentframe().f_back.f_code.co_name       
+
+    logmsg = " - Python command - " + methodname
+    arguments = ""
+    for key in args:            
+        if key != "self":                
+            value = args[key]
+            if value == "":
+                value = '""'
+
+            arguments += key + "=\"" + str(value) + "\", "
+
+    if arguments != "":
+        arguments = arguments[:-2]
+
+    logmsg += "(" + arguments + ")"
+    logging.debug(logmsg)
+
+def legacy_config(cta, objecthandle, **kwargs):
+    legacy_logcommand()
+    tclcode = 'stc::config ' + objecthandle + ' '
+    for key in kwargs:
+        tclcode = tclcode + ' ' + '-' + key + ' {' + str(kwargs[key]) + '}'
+
+    logging.debug(" - Tcl command - " + tclcode)
+    result = ""
+    logging.debug(" - Tcl result  - " + result)
+    logging.debug(" - Python result  - " + str(result))
+    return result
+
+###############################################################################
+####
+####    Main
+####
+###############################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CtaPython logging overhead.")
+    parser.add_argument("--number", type=int, default=20000, help="Calls per timing repetition.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timing repetitions.")
+    options = parser.parse_args()
+
+    root = logging.getLogger()
+    root.addHandler(logging.StreamHandler(open(os.devnull, "w")))
+
+    # Skip loading the Conformance Application and replace the Tcl evaluation
+    # with a no-op, so that only the logging cost remains.
+    cta = CtaPython.__new__(CtaPython)
+    cta.Exec = lambda *args: ""
+
+    def measure(function):
+        return min(timeit.repeat(function, number=options.number, repeat=options.repeat)) / options.number * 1e6
+
+    # The undecorated method gives the cost of the call without any logging.
+    unlogged = measure(lambda: CtaPython.config.__wrapped__(cta, "project1", name="Project1", dnsRetries=10))
+
+    print("Per-call logging overhead for config(), in microseconds:")
+    print("{:>10} {:>14} {:>14}".format("level", "legacy", "current"))
+    for level in ("DEBUG", "INFO", "WARNING", "ERROR"):
+        root.setLevel(getattr(logging, level))
+
+        legacy = measure(lambda: legacy_config(cta, "project1", name="Project1", dnsRetries=10))
+        current = measure(lambda: cta.config("project1", name="Project1", dnsRetries=10))
+
+        print("{:>10} {:>14.2f} {:>14.2f}".format(level, legacy - unlogged, current - unlogged))
+
+if __name__ == "__main__":
+    main()
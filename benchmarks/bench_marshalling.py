@@ -0,0 +1,119 @@
+"""
+    Argument marshalling benchmark
+    ~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~
+
+    Compares the original string-building path of config/perform/create (Tcl
+    source built by concatenation and evaluated) with the current path, where
+    the arguments are passed to the Tcl command as Tcl objects.
+
+    Uses the stand-in stc package in benchmarks/standin. Logging is set to
+    WARNING, so only the marshalling and evaluation costs are measured.
+
+    Usage:
+        python benchmarks/bench_marshalling.py [--number 5000] [--repeat 5]
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import re
+import sys
+import timeit
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from CtaPython import CtaPython
+
+STANDIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "standin")
+
+###############################################################################
+####
+####    The original implementation (for comparison only).
+####
+###############################################################################
+
+def legacy_config(cta, objecthandle, **kwargs):
+    tclcode = 'stc::config ' + objecthandle + ' '
+    for key in kwargs:
+        reg = re.compile("\[")
+        if reg.match(str(kwargs[key])):
+            tclcode = tclcode + ' ' + '-' + key + " " + str(kwargs[key])
+        else:
+            tclcode = tclcode + ' ' + '-' + key + ' {' + str(kwargs[key]) + '}'
+
+    return cta.Exec(tclcode)
+
+def legacy_perform(cta, command, **kwargs):
+    tclcode = "stc::perform " + command
+    for key in kwargs:
+        tclcode = tclcode + " " + "-" + key + r" {" + str(kwargs[key]) + r"}"
+
+    return cta.List2Dict(cta.Exec(tclcode))
+
+def legacy_create(cta, objecttype, under, **kwargs):
+    tclcode = "stc::create " + objecttype + " -under " + under
+    for key in kwargs:
+        tclcode = tclcode + " " + "-" + key + " " + str(kwargs[key])
+
+    return cta.Exec(tclcode)
+
+###############################################################################
+####
+####    Main
+####
+###############################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CtaPython argument marshalling.")
+    parser.add_argument("--number", type=int, default=5000, help="Calls per timing repetition.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timing repetitions.")
+    options = parser.parse_args()
+
+    cta = CtaPython(api_path=STANDIN_PATH, log_path=tempfile.mkdtemp(), log_level="WARNING")
+
+    # Each timing starts with a new test object, so that the objects created by
+    # earlier timings do not slow down the later ones.
+    objects = {"test": cta.create("test", under="project1")}
+
+    def reset():
+        cta.delete(objects["test"])
+        objects["test"] = cta.create("test", under="project1")
+
+    # The same calls through both paths. The values are ones the legacy path can handle.
+    # The undecorated methods are used, so that the logging decorator is not measured.
+    config = CtaPython.config.__wrapped__
+    perform = CtaPython.perform.__wrapped__
+    create = CtaPython.create.__wrapped__
+
+    cases = [
+        ("config (3 attributes)",
+            lambda: legacy_config(cta, objects["test"], name="Test1", dnsRetries=10, description="a description"),
+            lambda: config(cta, objects["test"], name="Test1", dnsRetries=10, description="a description")),
+        ("perform (2 arguments)",
+            lambda: legacy_perform(cta, "CtsLoadTestParams", session="session1", fileName="params.xml"),
+            lambda: perform(cta, "CtsLoadTestParams", session="session1", fileName="params.xml")),
+        ("create (2 attributes)",
+            lambda: legacy_create(cta, "userprofile", objects["test"], name="Profile1", dnsRetries=3),
+            lambda: create(cta, "userprofile", under=objects["test"], name="Profile1", dnsRetries=3)),
+    ]
+
+    print("Throughput in calls per second:")
+    print("{:<24} {:>14} {:>14} {:>10}".format("call", "legacy", "current", "change"))
+    for name, legacy, current in cases:
+        # The two paths take turns, so that drift in the machine's speed affects both.
+        legacy_times = []
+        current_times = []
+        for repetition in range(options.repeat):
+            for function, times in ((legacy, legacy_times), (current, current_times)):
+                reset()
+                times.append(timeit.timeit(function, number=options.number))
+
+        legacy_time = min(legacy_times) / options.number
+        current_time = min(current_times) / options.number
+
+        print("{:<24} {:>14.0f} {:>14.0f} {:>+9.0f}%".format(name, 1 / legacy_time, 1 / current_time, (legacy_time / current_time - 1) * 100))
+
+if __name__ == "__main__":
+    main()
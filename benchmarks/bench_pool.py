@@ -0,0 +1,77 @@
+"""
+    Process pool benchmark
+    ~~~~~~~~~~~~~~~~~~~~~~
+
+    Runs the same set of jobs serially in one CtaPython object, and in a CtaPool,
+    using the stand-in stc package in benchmarks/standin.
+
+    Each job builds a small project. The stand-in's per-command latency
+    (--latency, in milliseconds) stands in for the round trip to the real
+    Conformance Application; it is what the workers overlap on a single core.
+
+    Usage:
+        python benchmarks/bench_pool.py [--workers 4] [--jobs 16] [--objects 50] [--latency 1]
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+import time
+import tempfile
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from CtaPython import CtaPython
+from CtaPool import CtaPool
+
+STANDIN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "standin")
+
+def build_project(cta, objects):
+    """
+    The benchmark job: create and configure 'objects' tests.
+    """
+    for index in range(objects):
+        test = cta.create("test", under="project1", name="Test " + str(index))
+        cta.config(test, description="Test number " + str(index))
+
+    return {"objects": objects, "pid": os.getpid()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CtaPool.")
+    parser.add_argument("--workers", type=int, default=4, help="Number of worker processes.")
+    parser.add_argument("--jobs", type=int, default=16, help="Number of jobs.")
+    parser.add_argument("--objects", type=int, default=50, help="Objects created by each job.")
+    parser.add_argument("--latency", type=int, default=1, help="Stand-in latency per command (ms).")
+    options = parser.parse_args()
+
+    # Inherited by the worker processes.
+    os.environ["CTA_STANDIN_LATENCY"] = str(options.latency)
+    log_path = tempfile.mkdtemp()
+
+    cta = CtaPython(api_path=STANDIN_PATH, log_path=os.path.join(log_path, "serial"), log_level="INFO")
+    start = time.time()
+    for index in range(options.jobs):
+        build_project(cta, options.objects)
+    serial = time.time() - start
+
+    start = time.time()
+    pool = CtaPool(workers=options.workers, api_path=STANDIN_PATH, log_path=log_path, log_level="INFO")
+    # Wait for the workers to load the API, so that the start-up is timed separately.
+    pool.map(build_project, [0] * options.workers)
+    startup = time.time() - start
+
+    start = time.time()
+    results = pool.map(build_project, [options.objects] * options.jobs)
+    parallel = time.time() - start
+    pool.close()
+
+    print("{} jobs of {} objects, {} ms latency per command:".format(options.jobs, options.objects, options.latency))
+    print("    serial          : {:8.3f} s  {:8.1f} jobs/s".format(serial, options.jobs / serial))
+    print("    pool ({} workers): {:8.3f} s  {:8.1f} jobs/s  (start-up {:.3f} s, {} processes used)".format(
+        options.workers, parallel, options.jobs / parallel, startup, len(set([result["pid"] for result in results]))))
+    print("    speedup         : {:8.1f}x".format(serial / parallel))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+    Benchmark suite
+    ~~~~~~~~~~~~~~~
+
+    Runs the CtaPython benchmarks against the stand-in stc package in
+    benchmarks/standin and writes the results as JSON, so that they can be
+    kept and compared between versions:
+
+        call_latency  - time per call of each public method (microseconds)
+        list2dict     - List2Dict time for results of several sizes (microseconds)
+        build_out     - time to build a large project, call by call and as a batch (seconds)
+        logging       - per-call logging overhead at each log level (microseconds)
+        metrics       - per-call overhead of enable_metrics (microseconds)
+
+    All of the metrics are times, so lower is better. With --compare, metrics
+    that are slower than the baseline by more than --tolerance are reported,
+    and the exit status is 1.
+
+    The stand-in reads CTA_STANDIN_LATENCY when it is loaded (see standin.tcl);
+    use --latency to set it.
+
+    Usage:
+        python benchmarks/bench_suite.py [--output results.json] [--compare baseline.json]
+                                         [--tolerance 0.25] [--quick] [--latency <ms>]
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+import json
+import time
+import timeit
+import logging
+import platform
+import tempfile
+import argparse
+import subprocess
+
+BENCHMARKS_PATH = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(BENCHMARKS_PATH, "..")))
+
+from CtaPython import CtaPython, Tcl
+
+from bench_list2dict import make_result
+from bench_batch import build_individual, build_batch
+
+STANDIN_PATH = os.path.join(BENCHMARKS_PATH, "standin")
+
+###############################################################################
+####
+####    Benchmarks
+####
+###############################################################################
+
+def measure(function, number, repeat):
+    # Best time per call, in microseconds.
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number * 1e6
+
+def bench_call_latency(cta, number, repeat):
+    test = cta.create("test", under="project1", name="Latency")
+    cta.connect("10.1.1.1")
+
+    ports = iter(range(1, 10 ** 6))
+    def reserve_release():
+        location = "//10.1.1.1/1/" + str(next(ports))
+        cta.reserve(location)
+        cta.release(location)
+
+    calls = [("get", lambda: cta.get(test, "name")),
+             ("get_all", lambda: cta.get(test)),
+             ("config", lambda: cta.config(test, name="Latency", dnsRetries=10)),
+             ("create", lambda: cta.create("userprofile", under=test)),
+             ("perform", lambda: cta.perform("CtsLoadTestParams", session="session1", fileName="params.xml")),
+             ("connect", lambda: cta.connect("10.1.1.1")),
+             ("reserve_release", reserve_release)]
+
+    results = {}
+    for name, call in calls:
+        results["call_latency." + name + "_us"] = measure(call, number, repeat)
+    return results
+
+def bench_list2dict(cta, sizes, repeat):
+    results = {}
+    for size in sizes:
+        result = make_result(cta.tcl, size)
+        number = max(1, 20000 // size)
+        results["list2dict." + str(size) + "_attributes_us"] = measure(lambda: cta.List2Dict(result), number, repeat)
+    return results
+
+def bench_build_out(cta, objects):
+    results = {}
+    for name, build in (("individual", build_individual), ("batch", build_batch)):
+        start = time.time()
+        build(cta, objects)
+        results["build_out." + name + "_" + str(objects) + "_objects_s"] = time.time() - start
+    return results
+
+def bench_logging(cta, number, repeat):
+    # The overhead of the logging in config(), relative to the undecorated method.
+    root = logging.getLogger()
+    level = root.level
+    handler = logging.StreamHandler(open(os.devnull, "w"))
+    root.addHandler(handler)
+
+    test = cta.create("test", under="project1", name="Logging")
+    unlogged = measure(lambda: CtaPython.config.__wrapped__(cta, test, name="Logging", dnsRetries=10), number, repeat)
+
+    results = {}
+    try:
+        for name in ("DEBUG", "INFO", "WARNING"):
+            root.setLevel(getattr(logging, name))
+            logged = measure(lambda: cta.config(test, name="Logging", dnsRetries=10), number, repeat)
+            results["logging." + name.lower() + "_overhead_us"] = max(logged - unlogged, 0.0)
+    finally:
+        root.setLevel(level)
+        root.removeHandler(handler)
+
+    return results
+
+def bench_metrics(cta, number, repeat):
+    test = cta.create("test", under="project1", name="Metrics")
+    plain = measure(lambda: cta.get(test, "name"), number, repeat)
+
+    cta.enable_metrics()
+    try:
+        timed = measure(lambda: cta.get(test, "name"), number, repeat)
+    finally:
+        cta.disable_metrics()
+
+    return {"metrics.get_overhead_us": max(timed - plain, 0.0)}
+
+###############################################################################
+####
+####    Results
+####
+###############################################################################
+
+def environment():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=BENCHMARKS_PATH,
+                                         stderr=open(os.devnull, "w")).decode().strip()
+    except Exception:
+        commit = None
+
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": commit,
+            "python": platform.python_version(),
+            "tcl": Tcl().eval("info patchlevel"),
+            "platform": platform.platform(),
+            "latency": os.environ.get("CTA_STANDIN_LATENCY", "")}
+
+def compare(results, baseline, tolerance):
+    # Returns the metrics that are slower than the baseline by more than 'tolerance'.
+    regressions = []
+    for name in sorted(results):
+        if name in baseline and baseline[name] > 0:
+            change = results[name] / baseline[name] - 1
+            if change > tolerance:
+                regressions.append((name, baseline[name], results[name], change))
+    return regressions
+
+###############################################################################
+####
+####    Main
+####
+###############################################################################
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the CtaPython benchmark suite.")
+    parser.add_argument("--output", help="Write the results to this JSON file (default: standard output).")
+    parser.add_argument("--compare", help="A JSON file of earlier results to compare with.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown before a metric is a regression (0.25 = 25%%).")
+    parser.add_argument("--quick", action="store_true", help="Fewer calls and smaller sizes, for a quick check.")
+    parser.add_argument("--latency", help="Stand-in latency (sets CTA_STANDIN_LATENCY).")
+    options = parser.parse_args()
+
+    if options.latency is not None:
+        os.environ["CTA_STANDIN_LATENCY"] = options.latency
+
+    if options.quick:
+        number, repeat, sizes, objects = 200, 3, [10, 100, 1000], 500
+    else:
+        number, repeat, sizes, objects = 2000, 5, [10, 100, 1000, 10000], 5000
+
+    if os.environ.get("CTA_STANDIN_LATENCY"):
+        # Each call waits for the stand-in latency.
+        number = max(1, number // 100)
+
+    cta = CtaPython(api_path=STANDIN_PATH, log_path=tempfile.mkdtemp(), log_level="WARNING")
+
+    results = {}
+    results.update(bench_call_latency(cta, number, repeat))
+    results.update(bench_list2dict(cta, sizes, repeat))
+    results.update(bench_build_out(cta, objects))
+    results.update(bench_logging(cta, number, repeat))
+    results.update(bench_metrics(cta, number, repeat))
+
+    report = {"environment": environment(), "results": results}
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if options.output:
+        with open(options.output, "w") as output:
+            output.write(text + "\n")
+    else:
+        print(text)
+
+    if options.compare:
+        with open(options.compare) as baseline:
+            regressions = compare(results, json.load(baseline)["results"], options.tolerance)
+
+        for name, before, after, change in regressions:
+            sys.stderr.write("REGRESSION {}: {:.3f} -> {:.3f} (+{:.0%})\n".format(name, before, after, change))
+
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+    Journal replay
+    ~~~~~~~~~~~~~~
+
+    Replays a session journal recorded with CtaPython.record, and writes the
+    timing as JSON. By default the journal runs against the stand-in stc package
+    in benchmarks/standin, so a recorded session can be timed offline (use
+    --latency to add the stand-in's per-command delays).
+
+    Usage:
+        python benchmarks/replay.py <journal.tcl> [--api-path <path>] [--repeat 5]
+                                    [--continue-on-error] [--latency <ms>]
+"""
+
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+import os
+import sys
+import json
+import tempfile
+import argparse
+
+BENCHMARKS_PATH = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(BENCHMARKS_PATH, "..")))
+
+from CtaPython import CtaPython
+
+STANDIN_PATH = os.path.join(BENCHMARKS_PATH, "standin")
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a CtaPython session journal.")
+    parser.add_argument("journal", help="The journal file (recorded with CtaPython.record).")
+    parser.add_argument("--api-path", default=STANDIN_PATH, help="The API installation (default: the stand-in).")
+    parser.add_argument("--repeat", type=int, default=1, help="Number of replays, each in a new interpreter.")
+    parser.add_argument("--continue-on-error", action="store_true", help="Count failed commands instead of stopping.")
+    parser.add_argument("--latency", help="Stand-in latency (sets CTA_STANDIN_LATENCY).")
+    options = parser.parse_args()
+
+    if options.latency is not None:
+        os.environ["CTA_STANDIN_LATENCY"] = options.latency
+
+    log_path = tempfile.mkdtemp()
+    runs = []
+    for _ in range(options.repeat):
+        cta = CtaPython(api_path=options.api_path, log_path=log_path, log_level="WARNING")
+        runs.append(cta.replay(options.journal, stop_on_error=not options.continue_on_error))
+        cta.close()
+
+    seconds = [run["seconds"] for run in runs]
+    report = {"journal": os.path.abspath(options.journal),
+              "api_path": options.api_path,
+              "latency": os.environ.get("CTA_STANDIN_LATENCY", ""),
+              "commands": runs[0]["commands"],
+              "errors": max([run["errors"] for run in runs]),
+              "runs": seconds,
+              "best_seconds": min(seconds),
+              "mean_seconds": sum(seconds) / len(seconds)}
+    print(json.dumps(report, indent=2, sort_keys=True))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,3 @@
+# Stand-in for the Spirent TestCenter Conformance Application package.
+# Point CtaPython's api_path at this directory to load it.
+package ifneeded SpirentTestCenterConformance 0.0.1 [list source [file join $dir standin.tcl]]
@@ -0,0 +1,434 @@
+# Stand-in for the Spirent TestCenter Conformance Application Tcl API.
+#
+# Implements the stc:: commands used by CtaPython against an in-memory object
+# model, so the Python front-end can be exercised and benchmarked without a
+# Conformance Application installation or a chassis.
+#
+# Object handles are the lower case object type followed by a counter (eg:
+# project1, test3). Attribute names are case insensitive and are returned in
+# lower case. Objects may also be given as DDN paths (eg: project1.test(2).
+# userprofile) and attributes as DAN paths (eg: -nfs.dataRandomization), where
+# each element selects the first (or the index'th) child of that type.
+#
+# Set the CTA_STANDIN_LATENCY environment variable to add a delay to the stc::
+# commands, to stand in for the round trip to the real Conformance Application.
+# It is either a number of milliseconds for every command, or a list of
+# "command=milliseconds" settings (eg: "default=1,perform=50,reserve=200").
+#
+# connect, reserve and release keep track of the chassis and ports: reserve
+# fails for a port that is already reserved, or on a chassis that is not
+# connected. connect fails for chassis addresses that start with "unreachable",
+# and for the first N attempts on addresses that start with "flakyN" (eg:
+# flaky2.example.com), to stand in for chassis that do not respond.
+#
+# stc::help describes the object types set in ::stc::metadata (none by default),
+# with one "-Attribute (Type: type, Possible Values: values)" line for each
+# attribute, and fails for any other object type.
+#
+# Errors set ::errorCode to "STC <CLASS> <details>" (eg: STC INVALID_HANDLE
+# test9), which CtaPython uses to classify them.
+
+namespace eval ::stc {
+    # handle -> dict of attribute values
+    variable attributes
+    # handle -> parent handle
+    variable parents
+    # handle -> list of child handles
+    variable children
+    # object type -> last counter used
+    variable counters
+    # ResultDataObject handle -> names of its statistics
+    variable statistics
+    # chassis address -> PhysicalChassis handle
+    variable chassis
+    # port location -> PhysicalPort handle
+    variable reservations
+    # chassis address -> number of failed connection attempts
+    variable attempts
+    # lower case object type -> stc::help description
+    variable metadata
+
+    # Delay, in milliseconds, added to each command (command name -> delay).
+    variable latency [dict create default 0]
+    if { [info exists ::env(CTA_STANDIN_LATENCY)] } {
+        foreach setting [split $::env(CTA_STANDIN_LATENCY) ","] {
+            if { [string is double -strict $setting] } {
+                dict set latency default $setting
+            } elseif { [regexp {^\s*(\w+)\s*=\s*([0-9.]+)\s*$} $setting -> command delay] } {
+                dict set latency [string tolower $command] $delay
+            }
+        }
+    }
+
+    array set attributes {}
+    array set parents    {}
+    array set children   {}
+    array set counters   {}
+    array set statistics {}
+    array set chassis      {}
+    array set reservations {}
+    array set metadata     {}
+}
+
+# Adds the delay of the calling command.
+proc ::stc::Latency {} {
+    variable latency
+    set command [string tolower [namespace tail [lindex [info level -1] 0]]]
+    if { [dict exists $latency $command] } {
+        set delay [dict get $latency $command]
+    } else {
+        set delay [dict get $latency default]
+    }
+    if { $delay > 0 } {
+        after [expr { round($delay) }]
+    }
+}
+
+proc ::stc::NewHandle { type parent } {
+    variable attributes
+    variable parents
+    variable children
+    variable counters
+
+    set type [string tolower $type]
+    set handle $type[incr counters($type)]
+
+    set attributes($handle) [dict create name $handle]
+    set parents($handle)    $parent
+    set children($handle)   {}
+    if { $parent ne "" } {
+        lappend children($parent) $handle
+    }
+    return $handle
+}
+
+# Returns the handle of an object, given its handle or DDN path.
+proc ::stc::CheckHandle { path } {
+    variable attributes
+
+    set elements [split [string tolower $path] .]
+    set handle [lindex $elements 0]
+    if { ![info exists attributes($handle)] } {
+        return -code error -errorcode [list STC INVALID_HANDLE $path] "invalid handle \"$path\""
+    }
+
+    foreach element [lrange $elements 1 end] {
+        set handle [FindChild $handle $element]
+        if { $handle eq "" } {
+            return -code error -errorcode [list STC INVALID_HANDLE $path] "invalid handle \"$path\""
+        }
+    }
+    return $handle
+}
+
+# Returns the child selected by a DDN element (eg: "test" or "test(2)"), or "".
+proc ::stc::FindChild { handle element } {
+    if { ![regexp {^([a-z_][a-z0-9_:]*)(?:\(([0-9]+)\))?$} $element -> type index] } {
+        return ""
+    }
+    if { $index eq "" } {
+        set index 1
+    }
+    return [lindex [ChildrenOfType $handle $type] [expr { $index - 1 }]]
+}
+
+proc ::stc::ChildrenOfType { handle type } {
+    variable children
+    set matches {}
+    foreach child $children($handle) {
+        if { [string trimright $child 0123456789] eq $type } {
+            lappend matches $child
+        }
+    }
+    return $matches
+}
+
+# Splits a DAN path (eg: "nfs.dataRandomization") into the handle of the object
+# and the attribute name.
+proc ::stc::ResolveAttribute { handle key } {
+    set key [string tolower [string trimleft $key -]]
+    set elements [split $key .]
+    if { [llength $elements] > 1 } {
+        set handle [CheckHandle $handle.[join [lrange $elements 0 end-1] .]]
+    }
+    return [list $handle [lindex $elements end]]
+}
+
+proc ::stc::SetAttributes { handle pairs } {
+    variable attributes
+    foreach { key value } $pairs {
+        dict set attributes($handle) [string tolower [string trimleft $key -]] $value
+    }
+}
+
+proc ::stc::create { type args } {
+    Latency
+    set under ""
+    set pairs {}
+    foreach { key value } $args {
+        if { [string equal -nocase $key -under] } {
+            set under [CheckHandle $value]
+        } else {
+            lappend pairs $key $value
+        }
+    }
+
+    set handle [NewHandle $type $under]
+    SetAttributes $handle $pairs
+    return $handle
+}
+
+proc ::stc::config { handle args } {
+    Latency
+    set handle [CheckHandle $handle]
+    if { [llength $args] % 2 } {
+        return -code error -errorcode [list STC INVALID_VALUE [lindex $args end]] "missing value for attribute \"[lindex $args end]\""
+    }
+    foreach { key value } $args {
+        lassign [ResolveAttribute $handle $key] object key
+        SetAttributes $object [list $key $value]
+    }
+    return
+}
+
+proc ::stc::get { handle args } {
+    Latency
+    set handle [CheckHandle $handle]
+
+    if { [llength $args] == 0 } {
+        set result {}
+        dict for { key value } [Values $handle] {
+            lappend result -$key $value
+        }
+        return $result
+    }
+
+    set result {}
+    foreach key $args {
+        lassign [ResolveAttribute $handle $key] object name
+        if { [string match children-* $name] } {
+            # The children of one type (eg: -children-port).
+            set value [ChildrenOfType $object [string range $name 9 end]]
+        } else {
+            set values [Values $object]
+            if { ![dict exists $values $name] } {
+                return -code error -errorcode [list STC INVALID_ATTRIBUTE $name $object] "invalid attribute \"$name\" for \"$object\""
+            }
+            set value [dict get $values $name]
+        }
+        lappend result -[string tolower [string trimleft $key -]] $value
+    }
+
+    if { [llength $args] == 1 } {
+        return [lindex $result 1]
+    }
+    return $result
+}
+
+# Returns the attributes of an object, including its relations.
+proc ::stc::Values { handle } {
+    variable attributes
+    variable parents
+    variable children
+
+    UpdateStatistics $handle
+
+    set values $attributes($handle)
+    dict set values parent   $parents($handle)
+    dict set values children $children($handle)
+    return $values
+}
+
+proc ::stc::help { type } {
+    variable metadata
+    Latency
+    set type [string tolower $type]
+    if { ![info exists metadata($type)] } {
+        return -code error -errorcode [list STC INVALID_TYPE $type] "invalid object type \"$type\""
+    }
+    return $metadata($type)
+}
+
+proc ::stc::delete { handle } {
+    Latency
+    DeleteObject [CheckHandle $handle]
+    return
+}
+
+proc ::stc::DeleteObject { handle } {
+    variable attributes
+    variable parents
+    variable children
+
+    foreach child $children($handle) {
+        DeleteObject $child
+    }
+
+    set parent $parents($handle)
+    if { $parent ne "" && [info exists children($parent)] } {
+        set index [lsearch -exact $children($parent) $handle]
+        set children($parent) [lreplace $children($parent) $index $index]
+    }
+
+    unset attributes($handle) parents($handle) children($handle)
+    unset -nocomplain statistics($handle)
+    return
+}
+
+proc ::stc::perform { command args } {
+    Latency
+    set synchronous 1
+    set duration    0
+    set result [list -Name $command -State COMPLETED]
+    foreach { key value } $args {
+        if { [string equal -nocase $key -executesynchronous] } {
+            set synchronous [string is true $value]
+        } elseif { [string equal -nocase $key -duration] } {
+            set duration $value
+        } else {
+            lappend result $key $value
+        }
+    }
+
+    if { $synchronous } {
+        return $result
+    }
+
+    # Asynchronous commands return a request handle, whose State changes from
+    # RUNNING to COMPLETED (or FAILED, for commands named "Fail*") after the
+    # -Duration milliseconds, in the event loop.
+    set request [NewHandle request ""]
+    SetAttributes $request [list state RUNNING result $result]
+    if { [string match -nocase fail* $command] } {
+        set state FAILED
+    } else {
+        set state COMPLETED
+    }
+    after $duration [list ::stc::SetAttributes $request [list state $state]]
+    return $request
+}
+
+proc ::stc::waitUntilCommandIsDone { {request ""} } {
+    variable attributes
+
+    if { $request eq "" } {
+        return
+    }
+    CheckHandle $request
+    while { [dict get $attributes($request) state] eq "RUNNING" } {
+        vwait ::stc::attributes($request)
+    }
+
+    if { [dict get $attributes($request) state] eq "FAILED" } {
+        return -code error -errorcode [list STC COMMAND_FAILED $request] "command failed: [lindex [dict get $attributes($request) result] 1]"
+    }
+    return [dict get $attributes($request) result]
+}
+
+# Subscriptions create a ResultDataSet with one ResultDataObject, which has an
+# attribute for each statistic (with any "*" removed). Every statistic counts
+# up by one each time the object is read.
+proc ::stc::subscribe { side names } {
+    variable statistics
+    Latency
+
+    set dataset [NewHandle resultdataset project1]
+    set object  [NewHandle resultdataobject $dataset]
+    SetAttributes $object [list side $side]
+    set statistics($object) {}
+    foreach name $names {
+        set name [string tolower [string map {* {}} $name]]
+        SetAttributes $object [list $name 0]
+        lappend statistics($object) $name
+    }
+    return $dataset
+}
+
+proc ::stc::unsubscribe { handle } {
+    Latency
+    DeleteObject [CheckHandle $handle]
+    return
+}
+
+proc ::stc::UpdateStatistics { handle } {
+    variable attributes
+    variable statistics
+    if { [info exists statistics($handle)] } {
+        foreach name $statistics($handle) {
+            dict incr attributes($handle) $name
+        }
+    }
+}
+
+proc ::stc::connect { args } {
+    variable chassis
+    variable attempts
+    Latency
+    set handles {}
+    foreach address $args {
+        if { [string match unreachable* $address] || ([regexp {^flaky([0-9]+)} $address -> failures]
+                                                       && [incr attempts($address)] <= $failures) } {
+            return -code error -errorcode [list STC CHASSIS_UNREACHABLE $address] "unable to connect to chassis $address: connection timed out"
+        }
+        if { ![info exists chassis($address)] } {
+            set chassis($address) [NewHandle physicalchassis physicalchassismanager1]
+            SetAttributes $chassis($address) [list hostname $address]
+        }
+        lappend handles $chassis($address)
+    }
+    return $handles
+}
+
+proc ::stc::disconnect { args } {
+    variable chassis
+    variable reservations
+    Latency
+    foreach address $args {
+        if { [info exists chassis($address)] } {
+            DeleteObject $chassis($address)
+            unset chassis($address)
+            foreach location [array names reservations //$address/*] {
+                unset reservations($location)
+            }
+        }
+    }
+    return
+}
+
+# Locations are "//<chassis address>/<slot>/<port>".
+proc ::stc::reserve { location } {
+    variable chassis
+    variable reservations
+    Latency
+    if { ![regexp {^//([^/]+)/[0-9]+/[0-9]+$} $location -> address] } {
+        return -code error -errorcode [list STC INVALID_VALUE $location] "invalid port location \"$location\""
+    }
+    if { ![info exists chassis($address)] } {
+        return -code error -errorcode [list STC NOT_CONNECTED $address] "chassis $address is not connected"
+    }
+    if { [info exists reservations($location)] } {
+        return -code error -errorcode [list STC PORT_BUSY $location] "port $location is already reserved"
+    }
+
+    set port [NewHandle physicalport $chassis($address)]
+    SetAttributes $port [list location $location]
+    set reservations($location) $port
+    return $port
+}
+
+proc ::stc::release { location } {
+    variable reservations
+    Latency
+    if { ![info exists reservations($location)] } {
+        return -code error -errorcode [list STC PORT_NOT_RESERVED $location] "port $location is not reserved"
+    }
+    DeleteObject $reservations($location)
+    unset reservations($location)
+    return
+}
+
+::stc::NewHandle system  ""
+::stc::NewHandle project system1
+::stc::NewHandle physicalchassismanager system1
+
+package provide SpirentTestCenterConformance 0.0.1